@@ -1,23 +1,502 @@
-"""Utility for persisting memory to disk."""
+"""Utility for persisting memory to disk.
+
+:class:`BackupManager` writes numbered segments to ``<data>/backups``.  A full
+segment holds every entry; the differential segments after it hold only the
+entries changed since the previous backup, as reported by
+:meth:`memory_.Memory.take_changes`.  Every ``full_every``-th backup is full
+again, and runs with no changes write nothing.
+
+Each segment is a compressed JSON Lines file: a header line describing the
+segment followed by :mod:`data.memory_journal` style ``add`` / ``remove``
+records.  Segments are streamed from a worker thread through
+:func:`utils.json_handler.atomic_write`, so serialisation and disk I/O run off
+the event loop (which only waits for the GIL, see the ``loop_lag`` of
+:meth:`BackupManager.backup`) and a crash never leaves a partial segment
+behind.  A ``<segment>.sha256`` file in ``sha256sum`` format is written
+alongside.
+
+:func:`restore` rebuilds a :class:`~memory_.Memory` as of a point in time
+from the last full segment plus the differential ones after it, and
+:func:`verify_backups` checks every segment against its checksum and flags
+differential segments cut off from their full segment by a missing one;
+:func:`missing_segments` lists the missing sequence numbers.  Both are also
+available from the command line::
+
+    python backup.py verify
+    python backup.py restore --until 2024-05-01T12:00 --output memory.mmap
+
+Example
+-------
+>>> manager = BackupManager(Memory(), "data")
+>>> report = asyncio.run(manager.backup())
+>>> report["kind"]
+'full'
+>>> memory, stats = restore("data")
+"""
 
 from __future__ import annotations
 
+import argparse
 import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import re
+import time
+import warnings
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, Sequence, Set, Tuple
 
 from config.settings import settings
-from utils.json_handler import save_json
+from data.memory_journal import _apply
+from utils.json_handler import atomic_write
 from utils.path_resolver import resolve_data_path
 from memory_ import Memory
 
+SEGMENT = re.compile(r"(\d{8})-(full|diff)\.jsonl(\.gz|\.zz)?")
+"""File names of backup segments: sequence number, kind and compression."""
+
+SUFFIXES = {"gzip": ".gz", "zlib": ".zz", "none": ""}
+
+# Records joined into one write call while streaming a segment.
+_BATCH = 1000
+
+# Bytes hashed per read while verifying a segment.
+_HASH_CHUNK = 1 << 20
+
+# Period of the event loop lag probe running while a backup is written.
+_LAG_PROBE = 0.005
+
+
+def list_segments(directory: str | Path) -> List[Tuple[int, str, Path]]:
+    """Return ``(seq, kind, path)`` for every segment in *directory*, oldest first."""
+    found = []
+    directory = Path(directory)
+    if directory.is_dir():
+        for path in directory.iterdir():
+            match = SEGMENT.fullmatch(path.name)
+            if match:
+                found.append((int(match.group(1)), match.group(2), path))
+    return sorted(found)
+
+
+def checksum_path(path: str | Path) -> Path:
+    """Return the checksum file of the segment at *path*."""
+    path = Path(path)
+    return path.with_name(path.name + ".sha256")
+
+
+def verify_segment(path: str | Path) -> bool:
+    """Return ``True`` if the segment at *path* matches its recorded checksum."""
+    try:
+        expected = checksum_path(path).read_text(encoding="utf-8").split()[0]
+    except (OSError, IndexError):
+        return False
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest() == expected
+
+
+def _chain_gaps(segments: Sequence[Tuple[int, str, Path]]) -> Tuple[List[int], Set[int]]:
+    """Return the sequence numbers missing between *segments* and the
+    differential segments they cut off from their full segment."""
+    missing: List[int] = []
+    orphans: Set[int] = set()
+    prev = None
+    broken = True
+    for seq, kind, _ in segments:
+        if prev is not None and seq > prev + 1:
+            missing.extend(range(prev + 1, seq))
+            broken = True
+        if kind == "full":
+            broken = False
+        elif broken:
+            orphans.add(seq)
+        prev = seq
+    return missing, orphans
+
+
+def missing_segments(data_dir: str | Path | None = None) -> List[int]:
+    """Return the sequence numbers missing between the segments under *data_dir*."""
+    return _chain_gaps(list_segments(_backup_dir(data_dir)))[0]
+
+
+def verify_backups(data_dir: str | Path | None = None, workers: int | None = None) -> Dict[Path, bool]:
+    """Check every segment under *data_dir* in parallel worker threads.
+
+    A segment passes if it matches its checksum and, for a differential
+    one, the chain back to its full segment is continuous.
+    """
+    segments = list_segments(_backup_dir(data_dir))
+    _, orphans = _chain_gaps(segments)
+    paths = [path for _, _, path in segments]
+    with ThreadPoolExecutor(workers) as pool:
+        checks = pool.map(verify_segment, paths)
+        return {path: ok and seq not in orphans for (seq, _, path), ok in zip(segments, checks)}
+
+
+def open_segment(path: str | Path) -> BinaryIO:
+    """Open the segment at *path* for reading, decompressing on the fly."""
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".zz":
+        return _ZlibReader(open(path, "rb"))
+    return open(path, "rb")
+
+
+def _backup_dir(data_dir: str | Path | None) -> Path:
+    return resolve_data_path(data_dir or settings.data_path) / "backups"
+
+
+def _lines(header: Dict[str, Any], records: Iterable[Dict[str, Any]]) -> Iterable[bytes]:
+    """Encode *header* and *records* as JSON Lines, :data:`_BATCH` per chunk."""
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    batch = [dumps(header)]
+    for record in records:
+        batch.append(dumps(record))
+        if len(batch) >= _BATCH:
+            yield ("\n".join(batch) + "\n").encode("utf-8")
+            batch.clear()
+    if batch:
+        yield ("\n".join(batch) + "\n").encode("utf-8")
+
+
+# Errors raised while reading a damaged or truncated segment.
+_UNREADABLE = (OSError, EOFError, StopIteration, ValueError, KeyError, TypeError, zlib.error)
+
+
+def _header(path: Path) -> Dict[str, Any]:
+    """Return the header of the segment at *path*; raise ``ValueError`` if unreadable."""
+    try:
+        with open_segment(path) as f:
+            header = json.loads(next(iter(f)))
+        float(header["created"])
+    except _UNREADABLE as exc:
+        raise ValueError(f"unreadable backup segment header {path}: {exc!r}") from exc
+    return header
+
+
+class _ZlibReader:
+    """Line iterator over a zlib stream written by :meth:`BackupManager._compress`."""
+
+    def __init__(self, raw: BinaryIO, chunk_size: int = 1 << 16) -> None:
+        self._raw = raw
+        self._chunk_size = chunk_size
+
+    def __iter__(self):
+        decompressor = zlib.decompressobj()
+        pending = b""
+        while True:
+            chunk = self._raw.read(self._chunk_size)
+            data = decompressor.decompress(chunk) if chunk else decompressor.flush()
+            lines = (pending + data).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line + b"\n"
+            if not chunk:
+                break
+        if pending:
+            yield pending
+
+    def close(self) -> None:
+        self._raw.close()
+
+    def __enter__(self) -> "_ZlibReader":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
 
 class BackupManager:
-    """Persist memory contents at regular intervals."""
+    """Persist memory contents at regular intervals.
 
-    def __init__(self, memory: Memory, data_dir: str | Path | None = None) -> None:
+    Parameters
+    ----------
+    memory:
+        Store to back up.  Only its default namespace is included.
+    data_dir:
+        Base directory; segments go to its ``backups`` subdirectory.
+    full_every:
+        Write a full segment every this many backups, differential ones in
+        between.  ``1`` makes every backup full.
+    compression:
+        ``"gzip"``, ``"zlib"`` or ``"none"``.
+    keep:
+        Number of full segments, each with its differential chain, to retain.
+    """
+
+    def __init__(
+        self,
+        memory: Memory,
+        data_dir: str | Path | None = None,
+        *,
+        full_every: int | None = None,
+        compression: str = "gzip",
+        keep: int = 2,
+    ) -> None:
+        if compression not in SUFFIXES:
+            raise ValueError(f"unknown compression {compression!r}, expected one of {sorted(SUFFIXES)}")
         self.memory = memory
-        self.path = resolve_data_path(data_dir or settings.data_path) / "memory.json"
+        self.directory = _backup_dir(data_dir)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.full_every = max(1, full_every or settings.backup_full_every)
+        self.compression = compression
+        self.keep = max(1, keep)
+        segments = list_segments(self.directory)
+        self._seq = segments[-1][0] if segments else 0
+        self._since_full: int | None = None  # None forces a full segment
+        self._lock = asyncio.Lock()
+        self.last_report: Dict[str, Any] | None = None
+
+    @property
+    def path(self) -> Path:
+        """Deprecated alias of :attr:`directory`.
+
+        Backups used to be a single ``memory.json``; they are now segment
+        files inside :attr:`directory`.
+        """
+        warnings.warn(
+            "BackupManager.path is deprecated, use BackupManager.directory",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return self.directory
+
+    async def backup(self) -> Dict[str, Any]:
+        """Write the next segment off the event loop and return a report.
+
+        The report holds the segment ``kind`` (``"full"``, ``"diff"`` or
+        ``"skipped"``), ``seq``, ``entries``, compressed ``bytes``, total
+        ``seconds`` and ``loop_lag``: the longest delay, in seconds, by which
+        the event loop overslept a short timer while the backup ran.  The
+        worker thread still competes for the GIL, so this is what other
+        coroutines actually felt.
+        """
+        async with self._lock:
+            start = time.perf_counter()
+            worker = asyncio.ensure_future(asyncio.to_thread(self._run))
+            lag = 0.0
+            while not worker.done():
+                asked = time.perf_counter()
+                await asyncio.wait((worker,), timeout=_LAG_PROBE)
+                if not worker.done():
+                    lag = max(lag, time.perf_counter() - asked - _LAG_PROBE)
+            report = worker.result()
+            report["seconds"] = time.perf_counter() - start
+            report["loop_lag"] = lag
+            self.last_report = report
+        logging.info(
+            "Backup %s #%s: %d entries, %d bytes in %.3fs (max loop lag %.1f ms)",
+            report["kind"], report["seq"], report["entries"], report["bytes"],
+            report["seconds"], report["loop_lag"] * 1000,
+        )
+        return report
+
+    def _run(self) -> Dict[str, Any]:
+        """Collect changes and write one segment; runs on a worker thread."""
+        changes, next_id = self.memory.take_changes()
+        full = changes is None or self._since_full is None or self._since_full + 1 >= self.full_every
+        if changes is not None and not changes:
+            return {"kind": "skipped", "seq": self._seq, "entries": 0, "bytes": 0}
+        if full:
+            view = self.memory.snapshot()
+            records = ({"op": "add", "id": eid, "text": text} for eid, text in view.items())
+            count = len(view)
+        else:
+            records = (
+                {"op": "remove", "id": eid} if text is None else {"op": "add", "id": eid, "text": text}
+                for eid, text in sorted(changes.items())
+            )
+            count = len(changes)
+        kind = "full" if full else "diff"
+        seq = self._seq + 1
+        path = self.directory / f"{seq:08d}-{kind}.jsonl{SUFFIXES[self.compression]}"
+        header = {
+            "kind": kind,
+            "seq": seq,
+            "next_id": next_id,
+            "entries": count,
+            "created": time.time(),
+        }
+        try:
+            size = self._write(path, header, records)
+        except BaseException:
+            self._since_full = None  # the taken changes are lost; start over
+            raise
+        self._seq = seq
+        self._since_full = 0 if full else self._since_full + 1
+        if full:
+            self._prune()
+        return {"kind": kind, "seq": seq, "entries": count, "bytes": size, "path": str(path)}
+
+    def _write(self, path: Path, header: Dict[str, Any], records: Iterable[Dict[str, Any]]) -> int:
+        """Stream *header* and *records* to *path* atomically; return its size.
+
+        The checksum file is written once the last chunk has been produced,
+        before the segment is renamed into place, so every segment that
+        exists has one.
+        """
+
+        def chunks() -> Iterable[bytes]:
+            digest = hashlib.sha256()
+            for chunk in self._compress(_lines(header, records)):
+                digest.update(chunk)
+                yield chunk
+            line = f"{digest.hexdigest()}  {path.name}\n"
+            atomic_write(checksum_path(path), (line.encode("utf-8"),))
+
+        atomic_write(path, chunks())
+        return path.stat().st_size
+
+    def _compress(self, data: Iterable[bytes]) -> Iterable[bytes]:
+        """Compress *data* on the fly with :attr:`compression`."""
+        if self.compression == "none":
+            yield from data
+            return
+        if self.compression == "gzip":
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip container
+        else:
+            compressor = zlib.compressobj()
+        for chunk in data:
+            out = compressor.compress(chunk)
+            if out:
+                yield out
+        yield compressor.flush()
+
+    def _prune(self) -> None:
+        """Delete segments older than the last :attr:`keep` full ones."""
+        segments = list_segments(self.directory)
+        fulls = [seq for seq, kind, _ in segments if kind == "full"]
+        if len(fulls) <= self.keep:
+            return
+        oldest = fulls[-self.keep]
+        for seq, _, path in segments:
+            if seq < oldest:
+                path.unlink(missing_ok=True)
+                checksum_path(path).unlink(missing_ok=True)
+
+
+def restore(
+    data_dir: str | Path | None = None,
+    until: float | None = None,
+    *,
+    memory: Memory | None = None,
+    workers: int | None = None,
+) -> Tuple[Memory, Dict[str, Any]]:
+    """Rebuild a :class:`~memory_.Memory` from the backups under *data_dir*.
+
+    The newest full segment created at or before the POSIX timestamp
+    *until* (default: now) is replayed together with the consecutive
+    differential segments up to that time, keeping entry ids.  A missing
+    segment in that chain raises ``ValueError`` naming the missing sequence
+    numbers rather than restoring an older state.  Records are streamed one
+    line at a time while worker threads verify the checksums of the chain;
+    a mismatch, like a segment that cannot be decompressed or parsed,
+    raises ``ValueError`` and leaves *memory* untouched.  Returns the
+    restored store (*memory* or a new one) and a report with ``segments``,
+    ``entries``, ``records``, ``bytes``, ``seconds``,
+    ``records_per_second`` and ``mib_per_second``.
+    """
+    start = time.perf_counter()
+    limit = time.time() if until is None else until
+    chain: List[Tuple[int, str, Path]] = []
+    headers: List[Dict[str, Any]] = []
+    for seq, kind, path in list_segments(_backup_dir(data_dir)):
+        header = _header(path)
+        if header["created"] > limit:
+            break
+        if kind == "full":
+            chain, headers = [], []
+        chain.append((seq, kind, path))
+        headers.append(header)
+    if not chain or chain[0][1] != "full":
+        raise ValueError(f"no full backup created before {datetime.fromtimestamp(limit).isoformat()}")
+    missing, _ = _chain_gaps(chain)
+    if missing:
+        raise ValueError(f"backup chain is broken, missing segments {missing}")
+    paths = [path for _, _, path in chain]
+    state: Dict[int, str] = {}
+    records = 0
+    with ThreadPoolExecutor(workers) as pool:
+        checks = [pool.submit(verify_segment, path) for path in paths]
+        try:
+            for path in paths:
+                with open_segment(path) as f:
+                    lines = iter(f)
+                    next(lines)  # header
+                    for line in lines:
+                        _apply(state, 0, json.loads(line))
+                        records += 1
+        except _UNREADABLE as exc:
+            corrupt = [str(p) for p, check in zip(paths, checks) if not check.result()]
+            if corrupt:
+                raise ValueError(f"backup segments failed verification: {corrupt}") from exc
+            raise ValueError(f"unreadable backup segment {path}: {exc!r}") from exc
+        corrupt = [str(p) for p, check in zip(paths, checks) if not check.result()]
+    if corrupt:
+        raise ValueError(f"backup segments failed verification: {corrupt}")
+    memory = memory if memory is not None else Memory()
+    memory.restore(state, headers[-1]["next_id"])
+    seconds = time.perf_counter() - start
+    size = sum(path.stat().st_size for path in paths)
+    report = {
+        "segments": len(chain),
+        "entries": len(state),
+        "records": records,
+        "bytes": size,
+        "seconds": seconds,
+        "records_per_second": records / seconds if seconds else 0.0,
+        "mib_per_second": size / 2**20 / seconds if seconds else 0.0,
+    }
+    logging.info(
+        "Restored %d entries from %d segments (%d records, %.1f records/s, %.1f MiB/s)",
+        report["entries"], report["segments"], records,
+        report["records_per_second"], report["mib_per_second"],
+    )
+    return memory, report
+
+
+def _timestamp(value: str) -> float:
+    """Parse a POSIX timestamp or an ISO 8601 date."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Verify or restore memory backups.")
+    parser.add_argument("command", choices=("verify", "restore"))
+    parser.add_argument("--data-dir", help="base directory holding backups/")
+    parser.add_argument("--until", type=_timestamp, help="POSIX timestamp or ISO date to restore")
+    parser.add_argument("--output", help="file to save the restored memory to (.json or .mmap)")
+    parser.add_argument("--workers", type=int, help="checksum verification threads")
+    args = parser.parse_args(argv)
+    if args.command == "verify":
+        results = verify_backups(args.data_dir, args.workers)
+        for path, ok in results.items():
+            print(f"{'ok' if ok else 'CORRUPT':>7}  {path.name}")
+        missing = missing_segments(args.data_dir)
+        if missing:
+            print(f"MISSING  segments {missing}")
+        raise SystemExit(0 if all(results.values()) and not missing else 1)
+    memory, report = restore(args.data_dir, args.until, workers=args.workers)
+    if args.output:
+        memory.save(args.output)
+    print(
+        f"restored {report['entries']} entries from {report['segments']} segments in "
+        f"{report['seconds']:.2f}s ({report['records_per_second']:.0f} records/s, "
+        f"{report['mib_per_second']:.1f} MiB/s)"
+    )
+
 
-    async def backup(self) -> None:
-        entries = {eid: entry.text for eid, entry in self.memory._entries.items()}
-        save_json(self.path, entries)
+if __name__ == "__main__":
+    main()
@@ -22,7 +22,11 @@ class Settings:
 
     data_path: str = os.getenv("AIV1_DATA", "./data")
     backup_interval: int = int(os.getenv("AIV1_BACKUP_INTERVAL", "60"))
+    backup_full_every: int = int(os.getenv("AIV1_BACKUP_FULL_EVERY", "10"))
     language: str = os.getenv("AIV1_LANG", "en")
+    memory_backend: str = os.getenv("AIV1_MEMORY_BACKEND", "memory")
+    memory_db: str = os.getenv("AIV1_MEMORY_DB", ":memory:")
+    json_codec: str = os.getenv("AIV1_JSON_CODEC", "json")
 
 
 settings = Settings()
@@ -9,9 +9,14 @@ class ActionScheduler(Scheduler):
     """Convenience wrapper for scheduling named actions."""
 
     def schedule_action(
-        self, name: str, interval: int, coro_func: Callable[[], Awaitable[Any]]
+        self,
+        name: str,
+        interval: int,
+        coro_func: Callable[[], Awaitable[Any]],
+        **options: Any,
     ) -> None:
-        super().schedule(interval, coro_func, name=name)
+        """Schedule *coro_func* as *name*; *options* go to :meth:`Scheduler.schedule`."""
+        super().schedule(interval, coro_func, name=name, **options)
 
     def cancel_action(self, name: str) -> None:
         """Cancel a scheduled action."""
@@ -0,0 +1,284 @@
+"""Approximate nearest neighbour search over dense vectors.
+
+:class:`HNSWIndex` implements a Hierarchical Navigable Small World graph
+(Malkov & Yashunin) for cosine similarity.  Vectors are L2-normalised on
+insertion and stored back to back in a single ``array('f')``, so the index
+holds 4 bytes per dimension plus the neighbour lists.  With NumPy installed
+the similarities of a node's neighbours are computed in one matrix product.
+
+``ef`` is the recall/latency knob: the number of candidates kept while
+searching the bottom layer.  Larger values visit more nodes, find more of the
+true neighbours and take longer.  Deletions are lazy; removed nodes keep
+routing searches until :meth:`HNSWIndex.compact` rebuilds the graph, which
+happens automatically once they outnumber the live ones.
+
+Example
+-------
+>>> index = HNSWIndex()
+>>> index.add(7, [1.0, 0.0]); index.add(8, [0.0, 1.0])
+>>> index.search([0.9, 0.1], k=1)
+[(7, 0.99...)]
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import random
+from array import array
+from operator import mul
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from utils.json_handler import atomic_write
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+_MAGIC = b"HNSW1\n"
+
+
+class HNSWIndex:
+    """Incremental HNSW graph mapping integer ids to vectors.
+
+    Parameters
+    ----------
+    dim:
+        Vector dimension; taken from the first inserted vector when ``None``.
+    m:
+        Neighbours per node on the upper layers (``2 * m`` on the bottom one).
+    ef_construction:
+        Candidate list size while inserting; higher builds a better graph.
+    ef:
+        Default candidate list size of :meth:`search`.
+    """
+
+    def __init__(
+        self,
+        dim: int | None = None,
+        *,
+        m: int = 8,
+        ef_construction: int = 48,
+        ef: int = 32,
+        seed: int = 0,
+    ) -> None:
+        self.dim = dim
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self._rng = random.Random(seed)
+        self._level_mult = 1 / math.log(max(m, 2))
+        self._vectors = array("f")
+        self._ids: List[int | None] = []  # slot -> id, None once deleted
+        self._slots: Dict[int, int] = {}
+        self._links: List[List[List[int]]] = []  # slot -> level -> neighbour slots
+        self._entry: int | None = None
+        self._max_level = -1
+
+    # ------------------------------------------------------------------
+    # Vector helpers
+    # ------------------------------------------------------------------
+
+    def _normalise(self, vector: Sequence[float]) -> List[float]:
+        if self.dim is None:
+            self.dim = len(vector)
+        if len(vector) != self.dim:
+            raise ValueError(f"expected a vector of dimension {self.dim}, got {len(vector)}")
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else [float(v) for v in vector]
+
+    def _vector(self, slot: int) -> array:
+        return self._vectors[slot * self.dim : (slot + 1) * self.dim]
+
+    def _similarities(self, query: Sequence[float], slots: List[int]) -> List[float]:
+        """Return the dot products of *query* with the vectors of *slots*."""
+        if np is not None and len(slots) > 1:
+            matrix = np.frombuffer(self._vectors, dtype=np.float32).reshape(-1, self.dim)
+            result = (matrix[slots] @ np.asarray(query, dtype=np.float32)).tolist()
+            del matrix  # release the buffer so the array may grow again
+            return result
+        return [sum(map(mul, self._vector(slot), query)) for slot in slots]
+
+    # ------------------------------------------------------------------
+    # Graph search
+    # ------------------------------------------------------------------
+
+    def _search_layer(
+        self, query: Sequence[float], entries: List[Tuple[float, int]], ef: int, level: int
+    ) -> List[Tuple[float, int]]:
+        """Return up to *ef* ``(similarity, slot)`` pairs closest to *query*."""
+        visited = {slot for _, slot in entries}
+        candidates = [(-sim, slot) for sim, slot in entries]
+        heapq.heapify(candidates)
+        best = list(entries)
+        heapq.heapify(best)
+        while len(best) > ef:
+            heapq.heappop(best)
+        links = self._links
+        while candidates:
+            negative, slot = heapq.heappop(candidates)
+            if len(best) >= ef and -negative < best[0][0]:
+                break
+            fresh = [n for n in links[slot][level] if n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            for sim, neighbour in zip(self._similarities(query, fresh), fresh):
+                if len(best) < ef or sim > best[0][0]:
+                    heapq.heappush(candidates, (-sim, neighbour))
+                    heapq.heappush(best, (sim, neighbour))
+                    if len(best) > ef:
+                        heapq.heappop(best)
+        return best
+
+    def _descend(self, query: Sequence[float], down_to: int) -> List[Tuple[float, int]]:
+        """Greedily walk from the entry point to layer *down_to*."""
+        entry = self._entry
+        current = [(self._similarities(query, [entry])[0], entry)]
+        for level in range(self._max_level, down_to, -1):
+            current = [max(self._search_layer(query, current, 1, level))]
+        return current
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def add(self, entry_id: int, vector: Sequence[float]) -> None:
+        """Insert *vector* under *entry_id*, replacing a previous one."""
+        if entry_id in self._slots:
+            self.remove(entry_id)
+        query = self._normalise(vector)
+        slot = len(self._ids)
+        self._vectors.extend(query)
+        self._ids.append(entry_id)
+        self._slots[entry_id] = slot
+        level = int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+        self._links.append([[] for _ in range(level + 1)])
+        if self._entry is None:
+            self._entry, self._max_level = slot, level
+            return
+        nearest = self._descend(query, level)
+        for layer in range(min(level, self._max_level), -1, -1):
+            found = self._search_layer(query, nearest, self.ef_construction, layer)
+            limit = 2 * self.m if layer == 0 else self.m
+            chosen = heapq.nlargest(limit, (f for f in found if self._ids[f[1]] is not None))
+            self._links[slot][layer] = [n for _, n in chosen]
+            for _, neighbour in chosen:
+                self._connect(neighbour, slot, layer, limit)
+            nearest = found
+        if level > self._max_level:
+            self._entry, self._max_level = slot, level
+
+    def _connect(self, slot: int, neighbour: int, level: int, limit: int) -> None:
+        """Link *slot* to *neighbour*, pruning back to its *limit* closest links.
+
+        Lists may overshoot by half before pruning so the similarity pass is
+        amortised over several insertions.
+        """
+        links = self._links[slot][level]
+        links.append(neighbour)
+        if len(links) > limit + limit // 2:
+            sims = self._similarities(self._vector(slot), links)
+            keep = heapq.nlargest(limit, zip(sims, links))
+            self._links[slot][level] = [n for _, n in keep]
+
+    def remove(self, entry_id: int) -> None:
+        """Delete *entry_id* if present."""
+        slot = self._slots.pop(entry_id, None)
+        if slot is None:
+            return
+        self._ids[slot] = None
+        if len(self._ids) > 64 and len(self._slots) * 2 < len(self._ids):
+            self.compact()
+
+    def search(
+        self, vector: Sequence[float], k: int = 10, ef: int | None = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to *k* ``(entry_id, similarity)`` pairs, best first.
+
+        *ef* overrides the default candidate list size for this query.
+        """
+        if not self._slots or k <= 0:
+            return []
+        query = self._normalise(vector)
+        nearest = self._descend(query, 0)
+        found = self._search_layer(query, nearest, max(ef or self.ef, k), 0)
+        ids = self._ids
+        hits = [(ids[slot], sim) for sim, slot in found if ids[slot] is not None]
+        return heapq.nsmallest(k, hits, key=lambda h: (-h[1], h[0]))
+
+    def compact(self) -> None:
+        """Rebuild the graph from the live vectors, dropping deleted nodes."""
+        live = [(eid, self._vector(slot)) for eid, slot in sorted(self._slots.items())]
+        self.clear()
+        for entry_id, vector in live:
+            self.add(entry_id, vector)
+
+    def clear(self) -> None:
+        """Remove every vector, keeping the dimension and parameters."""
+        self._vectors = array("f")
+        self._ids.clear()
+        self._slots.clear()
+        self._links.clear()
+        self._entry = None
+        self._max_level = -1
+
+    def ids(self) -> List[int]:
+        """Return the ids currently indexed."""
+        return list(self._slots)
+
+    def __contains__(self, entry_id: object) -> bool:
+        return entry_id in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: str | Path) -> None:
+        """Write the graph and vectors to *path* atomically.
+
+        The file holds a magic line, the length-prefixed JSON header with the
+        parameters and neighbour lists, then the raw float32 vectors.
+        """
+        header = json.dumps({
+            "dim": self.dim,
+            "m": self.m,
+            "ef_construction": self.ef_construction,
+            "ef": self.ef,
+            "entry": self._entry,
+            "max_level": self._max_level,
+            "ids": self._ids,
+            "links": self._links,
+        }).encode("utf-8")
+        atomic_write(path, [_MAGIC, len(header).to_bytes(8, "little"), header, self._vectors.tobytes()])
+
+    @classmethod
+    def load(cls, path: str | Path) -> "HNSWIndex":
+        """Return the index stored at *path* by :meth:`save`."""
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not an HNSW index file")
+            size = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(size))
+            vectors = array("f")
+            vectors.frombytes(f.read())
+        index = cls(
+            header["dim"],
+            m=header["m"],
+            ef_construction=header["ef_construction"],
+            ef=header["ef"],
+        )
+        if header["dim"] is not None and len(vectors) != header["dim"] * len(header["ids"]):
+            raise ValueError(f"{path} is truncated")
+        index._vectors = vectors
+        index._ids = header["ids"]
+        index._slots = {eid: slot for slot, eid in enumerate(index._ids) if eid is not None}
+        index._links = header["links"]
+        index._entry = header["entry"]
+        index._max_level = header["max_level"]
+        return index
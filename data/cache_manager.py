@@ -2,24 +2,49 @@
 from __future__ import annotations
 
 from collections import OrderedDict
+from typing import Any, Dict, Hashable
 
 
 class CacheManager:
-    """Simple LRU cache implementation."""
+    """Simple LRU cache implementation with hit/miss/eviction counters."""
 
     def __init__(self, limit: int = 128) -> None:
         self.limit = limit
-        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._cache: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
-    def get(self, key: str) -> str | None:
+    def get(self, key: Hashable) -> Any | None:
         value = self._cache.pop(key, None)
         if value is not None:
             self._cache[key] = value
+            self.hits += 1
+        else:
+            self.misses += 1
         return value
 
-    def set(self, key: str, value: str) -> None:
+    def set(self, key: Hashable, value: Any) -> None:
         if key in self._cache:
             self._cache.pop(key)
         elif len(self._cache) >= self.limit:
             self._cache.popitem(last=False)
+            self.evictions += 1
         self._cache[key] = value
+
+    def clear(self) -> None:
+        """Drop every cached value, keeping the counters."""
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, miss and eviction counters with the current size."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._cache),
+            "limit": self.limit,
+        }
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -0,0 +1,289 @@
+"""Eviction policies and cold storage for capacity-bounded memories.
+
+A policy tracks the ids stored in a :class:`memory_.Memory` and picks the next
+victim once a capacity budget is exceeded.  Every policy selects a victim in
+O(log N) or better:
+
+``"lru"``
+    Least recently used, where ``touch`` marks an access (reads, search hits).
+``"lfu"``
+    Least frequently used, counted through ``touch``; ties go to the oldest.
+``"oldest"``
+    First in, first out regardless of access.
+
+Evicted entries may spill into a :class:`ColdTier`, an append-only JSON Lines
+file with an in-memory offset table that keeps them retrievable and
+searchable at disk speed.
+
+Example
+-------
+>>> policy = make_policy("lru")
+>>> policy.add(0); policy.add(1); policy.touch(0)
+>>> policy.victim()
+1
+"""
+from __future__ import annotations
+
+import copy
+import heapq
+import itertools
+import json
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Mapping, Tuple, Type, Union
+
+
+class EvictionPolicy:
+    """Interface shared by all eviction policies."""
+
+    def add(self, entry_id: int) -> None:
+        """Start tracking *entry_id*; re-adding an id counts as an access."""
+        raise NotImplementedError
+
+    def touch(self, entry_id: int) -> None:
+        """Record an access to *entry_id* if it is tracked."""
+
+    def remove(self, entry_id: int) -> None:
+        """Stop tracking *entry_id*."""
+        raise NotImplementedError
+
+    def victim(self, protect: int | None = None) -> int | None:
+        """Untrack and return the next id to evict, never *protect*."""
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """Forget every tracked id."""
+        raise NotImplementedError
+
+
+class OldestFirstPolicy(EvictionPolicy):
+    """Evict in insertion order."""
+
+    def __init__(self) -> None:
+        self._order: OrderedDict[int, None] = OrderedDict()
+
+    def add(self, entry_id: int) -> None:
+        self._order.setdefault(entry_id, None)
+
+    def remove(self, entry_id: int) -> None:
+        self._order.pop(entry_id, None)
+
+    def victim(self, protect: int | None = None) -> int | None:
+        for entry_id in self._order:
+            if entry_id != protect:
+                del self._order[entry_id]
+                return entry_id
+        return None
+
+    def clear(self) -> None:
+        self._order.clear()
+
+
+class LRUPolicy(OldestFirstPolicy):
+    """Evict the entry whose last access is oldest."""
+
+    def add(self, entry_id: int) -> None:
+        self._order[entry_id] = None
+        self._order.move_to_end(entry_id)
+
+    def touch(self, entry_id: int) -> None:
+        if entry_id in self._order:
+            self._order.move_to_end(entry_id)
+
+
+class LFUPolicy(EvictionPolicy):
+    """Evict the entry with the fewest accesses using a lazy min-heap."""
+
+    def __init__(self) -> None:
+        self._counts: Dict[int, int] = {}
+        self._heap: List[Tuple[int, int, int]] = []
+        self._seq = itertools.count()
+        self._born: Dict[int, int] = {}
+
+    def add(self, entry_id: int) -> None:
+        if entry_id in self._counts:
+            self.touch(entry_id)
+            return
+        self._counts[entry_id] = 0
+        self._born[entry_id] = next(self._seq)
+        heapq.heappush(self._heap, (0, self._born[entry_id], entry_id))
+
+    def touch(self, entry_id: int) -> None:
+        count = self._counts.get(entry_id)
+        if count is None:
+            return
+        self._counts[entry_id] = count + 1
+        heapq.heappush(self._heap, (count + 1, self._born[entry_id], entry_id))
+        if len(self._heap) > 4 * len(self._counts) + 64:
+            # Drop superseded heap items so touches do not grow it forever.
+            self._heap = [(c, self._born[e], e) for e, c in self._counts.items()]
+            heapq.heapify(self._heap)
+
+    def remove(self, entry_id: int) -> None:
+        self._counts.pop(entry_id, None)
+        self._born.pop(entry_id, None)
+
+    def victim(self, protect: int | None = None) -> int | None:
+        held = None
+        result = None
+        while self._heap:
+            item = heapq.heappop(self._heap)
+            count, _, entry_id = item
+            if self._counts.get(entry_id) != count:
+                continue  # stale item superseded by a later touch or removal
+            if entry_id == protect:
+                held = item
+                continue
+            result = entry_id
+            self.remove(entry_id)
+            break
+        if held is not None:
+            heapq.heappush(self._heap, held)
+        return result
+
+    def clear(self) -> None:
+        self._counts.clear()
+        self._born.clear()
+        self._heap.clear()
+
+
+POLICIES: Dict[str, Type[EvictionPolicy]] = {
+    "lru": LRUPolicy,
+    "lfu": LFUPolicy,
+    "oldest": OldestFirstPolicy,
+}
+
+
+PolicySpec = Union[str, EvictionPolicy, Callable[[], EvictionPolicy]]
+
+
+def make_policy(policy: PolicySpec) -> EvictionPolicy:
+    """Return *policy* itself, the result of calling a policy class or
+    factory, or a new instance of the named policy."""
+    if isinstance(policy, EvictionPolicy):
+        return policy
+    if callable(policy):
+        return policy()
+    try:
+        return POLICIES[policy]()
+    except KeyError:
+        raise ValueError(f"unknown eviction policy {policy!r}, expected one of {sorted(POLICIES)}") from None
+
+
+def policy_factory(policy: PolicySpec) -> PolicySpec:
+    """Return a spec that yields an independent policy on every call.
+
+    Names, classes and factories already do; an instance is turned into a
+    factory of empty copies so that stores never share tracked ids.
+    """
+    if not isinstance(policy, EvictionPolicy):
+        return policy
+
+    def factory() -> EvictionPolicy:
+        clone = copy.deepcopy(policy)
+        clone.clear()
+        return clone
+
+    return factory
+
+
+class ColdTier:
+    """Append-only on-disk store for evicted entries.
+
+    An existing file is reopened with its entries.  Removals are appended
+    as tombstone records so they survive a reopen.  A torn trailing line
+    left by a crash is truncated away, like the journal does, so appends
+    stay parseable.  :attr:`next_id` is one past the highest id ever
+    spilled, which a reopening store must not hand out again.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._offsets: Dict[int, int] = {}
+        self.next_id = 0
+        if self.path.exists():
+            offset = 0
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line) if line.endswith(b"\n") else None
+                    except ValueError:
+                        record = None
+                    if record is None:
+                        break
+                    entry_id = record["id"]
+                    if record.get("removed"):
+                        self._offsets.pop(entry_id, None)
+                    else:
+                        self._offsets[entry_id] = offset
+                    self.next_id = max(self.next_id, entry_id + 1)
+                    offset += len(line)
+            if offset != self.path.stat().st_size:
+                with open(self.path, "r+b") as f:
+                    f.truncate(offset)
+
+    def _write(self, record: dict) -> int:
+        """Append *record* as one line and return its offset."""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            f.write(line.encode("utf-8"))
+        return offset
+
+    def append(self, entry_id: int, text: str) -> None:
+        """Spill *text* stored under *entry_id* to disk."""
+        self._offsets[entry_id] = self._write({"id": entry_id, "text": text})
+        self.next_id = max(self.next_id, entry_id + 1)
+
+    def get(self, entry_id: int) -> str:
+        """Return the spilled text of *entry_id* or raise ``KeyError``."""
+        offset = self._offsets[entry_id]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())["text"]
+
+    def discard(self, entry_id: int) -> None:
+        """Forget *entry_id* and record the removal with a tombstone.
+
+        Its bytes stay on disk until :meth:`clear`.
+        """
+        if self._offsets.pop(entry_id, None) is not None:
+            self._write({"id": entry_id, "removed": True})
+
+    def items(self) -> Iterator[Tuple[int, str]]:
+        """Stream ``(entry_id, text)`` for every live spilled entry."""
+        if not self._offsets:
+            return
+        live = self._offsets
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn by a crash during append
+                record = json.loads(line)
+                if live.get(record["id"]) == offset:  # skips tombstones too
+                    yield record["id"], record["text"]
+                offset += len(line)
+
+    def search(self, query: Mapping[str, int], limit: int) -> List[Tuple[int, float]]:
+        """Return the best Jaccard matches for *query* among spilled entries."""
+        query_len = sum(query.values())
+        scored = []
+        for entry_id, text in self.items():
+            tokens = Counter(text.lower().split())
+            shared = sum((tokens & query).values())
+            if shared:
+                scored.append((entry_id, shared / (query_len + sum(tokens.values()) - shared)))
+        return heapq.nsmallest(limit, scored, key=lambda s: (-s[1], s[0]))
+
+    def clear(self) -> None:
+        """Delete every spilled entry."""
+        self._offsets.clear()
+        self.next_id = 0
+        self.path.unlink(missing_ok=True)
+
+    def __contains__(self, entry_id: object) -> bool:
+        return entry_id in self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
@@ -1,12 +1,40 @@
-"""Aggregate logs from various sources."""
+"""Aggregate logs from various sources.
+
+Without a *path* entries are simply kept in :attr:`LogCollector.logs`.  With
+one they are appended to a JSON Lines file (gzipped for ``.gz``) every
+*batch* entries, so memory stays bounded however long the process runs, and
+consumers stream them back with :meth:`LogCollector.read`, resuming from the
+offset they last saw.
+"""
 from __future__ import annotations
 
+from pathlib import Path
+from typing import Any, Iterator, Tuple
+
+from utils.json_handler import iter_jsonl, write_jsonl
+
 
 class LogCollector:
     """Store strings representing log entries."""
 
-    def __init__(self) -> None:
+    def __init__(self, path: str | Path | None = None, batch: int = 1000) -> None:
         self.logs: list[str] = []
+        self.path = Path(path) if path else None
+        self.batch = batch
 
     def add(self, entry: str) -> None:
         self.logs.append(entry)
+        if self.path is not None and len(self.logs) >= self.batch:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append the buffered entries to :attr:`path` and drop them."""
+        if self.path is not None and self.logs:
+            write_jsonl(self.path, self.logs, append=True)
+            self.logs.clear()
+
+    def read(self, offset: int = 0) -> Iterator[Tuple[int, Any]]:
+        """Yield ``(next_offset, entry)`` for persisted entries after *offset*."""
+        if self.path is None:
+            return iter(())
+        return iter_jsonl(self.path, offset, with_offsets=True)
@@ -0,0 +1,452 @@
+"""Index structures backing :class:`memory_.Memory` retrieval.
+
+The :class:`InvertedIndex` maps every token to a posting list of the entries
+containing it together with the token count inside that entry.  Scoring a
+query then only touches entries that share at least one token with it instead
+of every stored entry.  :class:`MinHashLSH` plays the same role for raw text
+similarity by bucketing entries on MinHash signatures of character shingles,
+and :class:`TrigramIndex` narrows regular expression scans down to entries
+containing the literal trigrams a pattern requires.
+
+Example
+-------
+>>> from collections import Counter
+>>> index = InvertedIndex()
+>>> index.add(0, Counter("hello world".split()))
+>>> index.jaccard_scores(Counter(["hello"]))
+{0: 0.5}
+"""
+from __future__ import annotations
+
+import heapq
+import random
+import threading
+import zlib
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
+
+try:
+    from re import _constants as sre_constants, _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_constants  # type: ignore
+    import sre_parse  # type: ignore
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+class TokenVocabulary:
+    """Intern tokens as dense integer ids shared by many entries.
+
+    Known tokens are looked up without locking; new ones are assigned under
+    a lock, so concurrent callers never give two tokens the same id.
+    """
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._tokens: List[str] = []
+        self._lock = threading.Lock()
+
+    def id(self, token: str) -> int:
+        """Return the id of *token*, assigning the next free one if new."""
+        token_id = self._ids.get(token)
+        if token_id is None:
+            with self._lock:
+                token_id = self._ids.get(token)
+                if token_id is None:
+                    token_id = len(self._tokens)
+                    self._tokens.append(token)  # before the id is published
+                    self._ids[token] = token_id
+        return token_id
+
+    def token(self, token_id: int) -> str:
+        """Return the interned token string for *token_id*."""
+        return self._tokens[token_id]
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+
+class InvertedIndex:
+    """Token → posting list mapping with per-entry token totals."""
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: Dict[int, int] = {}
+        # Lower bound on the length of entries in each posting list.  It is
+        # not raised on removal, which keeps it a valid (if looser) bound.
+        self._min_lengths: Dict[str, int] = {}
+
+    def add(self, entry_id: int, tokens: Mapping[str, int]) -> None:
+        """Index *tokens* (token → count) under *entry_id*."""
+        postings = self._postings
+        min_lengths = self._min_lengths
+        length = self._lengths[entry_id] = sum(tokens.values())
+        for token, count in tokens.items():
+            posting = postings.get(token)
+            if posting is None:
+                posting = postings[token] = {}
+                min_lengths[token] = length
+            elif length < min_lengths[token]:
+                min_lengths[token] = length
+            posting[entry_id] = count
+
+    def remove(self, entry_id: int, tokens: Iterable[str]) -> None:
+        """Drop *entry_id* from the posting lists of *tokens*."""
+        postings = self._postings
+        for token in tokens:
+            posting = postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(entry_id, None)
+            if not posting:
+                del postings[token]
+                del self._min_lengths[token]
+        self._lengths.pop(entry_id, None)
+
+    def clear(self) -> None:
+        """Forget every indexed entry."""
+        self._postings.clear()
+        self._lengths.clear()
+        self._min_lengths.clear()
+
+    def entry_count(self) -> int:
+        """Return the number of indexed entries."""
+        return len(self._lengths)
+
+    def posting(self, token: str) -> Mapping[int, int]:
+        """Return the posting list (entry id → count) for *token*."""
+        return self._postings.get(token, {})
+
+    def candidates(self, tokens: Iterable[str]) -> Set[int]:
+        """Return ids of entries containing at least one of *tokens*."""
+        result: Set[int] = set()
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting:
+                result.update(posting)
+        return result
+
+    def jaccard_scores(self, query: Mapping[str, int]) -> Dict[int, float]:
+        """Return the multiset Jaccard score of every candidate entry.
+
+        Entries sharing no token with *query* score ``0`` and are omitted.
+        The arithmetic mirrors :meth:`memory_.Memory._jaccard` so results
+        are bit-for-bit identical to a full scan.
+        """
+        query_len = sum(query.values())
+        overlap: Dict[int, int] = {}
+        for token, wanted in query.items():
+            posting = self._postings.get(token)
+            if not posting:
+                continue
+            for entry_id, count in posting.items():
+                overlap[entry_id] = overlap.get(entry_id, 0) + (
+                    count if count < wanted else wanted
+                )
+        lengths = self._lengths
+        return {
+            entry_id: shared / (query_len + lengths[entry_id] - shared)
+            for entry_id, shared in overlap.items()
+        }
+
+    def iter_top(self, query: Mapping[str, int], limit: int) -> Iterator[Tuple[int, float]]:
+        """Yield the *limit* best ``(entry_id, score)`` pairs in rank order.
+
+        A term-at-a-time MaxScore traversal.  Terms are visited by descending
+        query count; an entry first met at term ``i`` shares at most ``b``
+        tokens with the query, ``b`` being the query counts of term ``i`` and
+        all later terms, and is at least as long as the shortest entry of the
+        posting list, which bounds its Jaccard score.  Posting lists and
+        entries whose bound falls below the current top-*limit* threshold are
+        never scored.  An entry is yielded as soon as it beats every bound
+        still outstanding, so leading results arrive before the traversal
+        ends.  Ordering matches :meth:`jaccard_scores` ranked by descending
+        score, then id.
+        """
+        if limit <= 0:
+            return
+        query_len = sum(query.values())
+        postings = self._postings
+        terms = [(wanted, token) for token, wanted in query.items() if token in postings]
+        terms.sort(key=lambda t: (-t[0], len(postings[t[1]])))
+        shares = [0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            shares[i] = shares[i + 1] + terms[i][0]
+
+        def cap(share: int, length: int) -> float:
+            """Best Jaccard score sharing <= *share* tokens at length >= *length*."""
+            if length <= share:
+                return share / query_len
+            return share / (query_len + length - share)
+
+        bounds = [cap(shares[i], self._min_lengths[t]) for i, (_, t) in enumerate(terms)]
+        outstanding = [0.0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            outstanding[i] = max(bounds[i], outstanding[i + 1])
+
+        lengths = self._lengths
+        # Entries of skipped posting lists may resurface under later terms,
+        # so overlaps are always taken across every query term.
+        scored = [(wanted, postings[t]) for wanted, t in terms]
+        best: List[Tuple[float, int]] = []  # min-heap of (score, -id)
+        found: List[Tuple[float, int]] = []  # max-heap of (-score, id)
+        seen: Set[int] = set()
+        emitted = 0
+        for i, (_, token) in enumerate(terms):
+            full = len(best) >= limit
+            if full and outstanding[i] < best[0][0]:
+                break
+            if not full or bounds[i] >= best[0][0]:
+                share = shares[i]
+                for entry_id in postings[token]:
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    length = lengths[entry_id]
+                    if full and cap(share, length) < best[0][0]:
+                        continue
+                    shared = 0
+                    for wanted, posting in scored:
+                        count = posting.get(entry_id, 0)
+                        shared += count if count < wanted else wanted
+                    score = shared / (query_len + length - shared)
+                    if full:
+                        heapq.heappushpop(best, (score, -entry_id))
+                    else:
+                        heapq.heappush(best, (score, -entry_id))
+                        full = len(best) >= limit
+                    heapq.heappush(found, (-score, entry_id))
+            while found and -found[0][0] > outstanding[i + 1]:
+                score, entry_id = heapq.heappop(found)
+                yield entry_id, -score
+                emitted += 1
+                if emitted >= limit:
+                    return
+        while found and emitted < limit:
+            score, entry_id = heapq.heappop(found)
+            yield entry_id, -score
+            emitted += 1
+
+    def __contains__(self, token: object) -> bool:
+        return token in self._postings
+
+    def __len__(self) -> int:
+        """Return the number of distinct indexed tokens."""
+        return len(self._postings)
+
+
+class MinHashLSH:
+    """Locality-sensitive hashing over character shingles.
+
+    Each text is reduced to ``bands * rows`` MinHash values; two texts become
+    candidates when all *rows* values of any band agree.  The probability of
+    that is ``1 - (1 - J**rows)**bands`` for shingle Jaccard ``J``, so more
+    bands raise recall and more rows raise precision.
+
+    Parameters
+    ----------
+    bands, rows:
+        Banding layout of the signature.
+    shingle:
+        Length of the character shingles.
+    seed:
+        Seed for the hash permutations; fixed so results are reproducible.
+    """
+
+    def __init__(self, bands: int = 32, rows: int = 2, shingle: int = 3, seed: int = 1) -> None:
+        if bands < 1 or rows < 1 or shingle < 1:
+            raise ValueError("bands, rows and shingle must be positive")
+        self.bands = bands
+        self.rows = rows
+        self.shingle = shingle
+        rng = random.Random(seed)
+        self._perms: List[Tuple[int, int]] = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(_MERSENNE_PRIME))
+            for _ in range(bands * rows)
+        ]
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[int]] = {}
+        self._keys: Dict[int, List[Tuple[int, Tuple[int, ...]]]] = {}
+
+    def shingles(self, text: str) -> Set[int]:
+        """Return the hashed character shingles of lower-cased *text*."""
+        text = text.lower()
+        k = self.shingle
+        if len(text) <= k:
+            return {zlib.crc32(text.encode("utf-8"))} if text else set()
+        return {zlib.crc32(text[i:i + k].encode("utf-8")) for i in range(len(text) - k + 1)}
+
+    def signature(self, text: str) -> List[int]:
+        """Return the MinHash signature of *text* (empty for empty text)."""
+        hashes = self.shingles(text)
+        if not hashes:
+            return []
+        prime = _MERSENNE_PRIME
+        return [min((a * h + b) % prime for h in hashes) for a, b in self._perms]
+
+    def _band_keys(self, text: str) -> List[Tuple[int, Tuple[int, ...]]]:
+        sig = self.signature(text)
+        rows = self.rows
+        return [(band, tuple(sig[band * rows:(band + 1) * rows])) for band in range(self.bands)] if sig else []
+
+    def add(self, entry_id: int, text: str) -> None:
+        """Bucket *text* under *entry_id*, replacing any previous text."""
+        self.remove(entry_id)
+        keys = self._band_keys(text)
+        for key in keys:
+            self._buckets.setdefault(key, set()).add(entry_id)
+        self._keys[entry_id] = keys
+
+    def remove(self, entry_id: int) -> None:
+        """Drop *entry_id* from its buckets if indexed."""
+        for key in self._keys.pop(entry_id, ()):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def clear(self) -> None:
+        """Forget every indexed entry."""
+        self._buckets.clear()
+        self._keys.clear()
+
+    def candidates(self, text: str) -> Set[int]:
+        """Return ids sharing at least one band with *text*."""
+        result: Set[int] = set()
+        for key in self._band_keys(text):
+            bucket = self._buckets.get(key)
+            if bucket:
+                result.update(bucket)
+        return result
+
+    def __len__(self) -> int:
+        """Return the number of indexed entries."""
+        return len(self._keys)
+
+
+# A trigram query is a list of AND-ed clauses; each clause is either a
+# trigram or a list of alternative sub-queries of which one must hold.  An
+# empty query places no constraint on the text.
+TrigramQuery = List[Union[str, List["TrigramQuery"]]]
+
+_REPEATS = tuple(
+    getattr(sre_constants, name)
+    for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_constants, name)
+)
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the distinct lower-cased character trigrams of *text*."""
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def regex_trigram_query(pattern: str, flags: int = 0) -> TrigramQuery:
+    """Return the trigrams any match of *pattern* must contain.
+
+    Only literal runs are analysed: concatenated literals, groups, repeats
+    with a positive minimum and alternations.  Everything else (classes,
+    wildcards, lookarounds, back references) breaks the run, so the result
+    is a necessary condition, never a sufficient one.  Trigrams are lower
+    cased to match the case-folded index, which keeps ``re.IGNORECASE``
+    patterns correct as well.
+    """
+    return _sequence_query(sre_parse.parse(pattern, flags))
+
+
+def _sequence_query(items) -> TrigramQuery:
+    clauses: TrigramQuery = []
+    run: List[str] = []
+
+    def flush() -> None:
+        clauses.extend("".join(run[i:i + 3]) for i in range(len(run) - 2))
+        run.clear()
+
+    for op, av in items:
+        if op is sre_constants.LITERAL:
+            char = chr(av).lower()
+            if len(char) == 1:
+                run.append(char)
+                continue
+        flush()
+        if op is sre_constants.SUBPATTERN:
+            clauses.extend(_sequence_query(av[-1]))
+        elif op is _ATOMIC_GROUP:
+            clauses.extend(_sequence_query(av))
+        elif op in _REPEATS and av[0] >= 1:
+            clauses.extend(_sequence_query(av[2]))
+        elif op is sre_constants.BRANCH:
+            alternatives = [_sequence_query(branch) for branch in av[1]]
+            if all(alternatives):
+                clauses.append(alternatives)
+    flush()
+    return clauses
+
+
+def trigram_count(query: TrigramQuery) -> int:
+    """Return the number of trigrams referenced by *query*."""
+    return sum(1 if isinstance(c, str) else sum(map(trigram_count, c)) for c in query)
+
+
+class TrigramIndex:
+    """Trigram → entry ids mapping over lower-cased entry text."""
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, Set[int]] = {}
+
+    def add(self, entry_id: int, text: str) -> None:
+        """Index the trigrams of *text* under *entry_id*."""
+        postings = self._postings
+        for gram in trigrams(text):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = set()
+            posting.add(entry_id)
+
+    def remove(self, entry_id: int, text: str) -> None:
+        """Drop *entry_id*, previously indexed with *text*."""
+        postings = self._postings
+        for gram in trigrams(text):
+            posting = postings.get(gram)
+            if posting is not None:
+                posting.discard(entry_id)
+                if not posting:
+                    del postings[gram]
+
+    def clear(self) -> None:
+        """Forget every indexed entry."""
+        self._postings.clear()
+
+    def evaluate(self, query: TrigramQuery) -> Optional[Set[int]]:
+        """Return candidate ids for *query*, or ``None`` if unconstrained."""
+        result: Optional[Set[int]] = None
+        grams = sorted(
+            (c for c in query if isinstance(c, str)),
+            key=lambda g: len(self._postings.get(g, ())),
+        )
+        for gram in grams:
+            posting = self._postings.get(gram, set())
+            result = set(posting) if result is None else result & posting
+            if not result:
+                return result
+        for clause in query:
+            if isinstance(clause, str):
+                continue
+            ids: Optional[Set[int]] = set()
+            for alternative in clause:
+                sub = self.evaluate(alternative)
+                if sub is None:
+                    ids = None
+                    break
+                ids |= sub
+            if ids is None:
+                continue
+            result = ids if result is None else result & ids
+            if not result:
+                return result
+        return result
+
+    def __len__(self) -> int:
+        """Return the number of distinct indexed trigrams."""
+        return len(self._postings)
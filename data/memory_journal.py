@@ -0,0 +1,237 @@
+"""Append-only write-ahead journal for :class:`memory_.Memory` autosave.
+
+Instead of rewriting the whole store after every mutation, each change is
+appended as one compact JSON line to ``<snapshot>.wal``.  ``fsync`` calls are
+batched by record count and elapsed time, and once the journal grows past a
+threshold it is rotated to ``<snapshot>.wal.1`` and folded into the snapshot
+on a background thread together with the next free entry id, which is kept
+in ``<snapshot>.meta`` so ids of deleted entries are never handed out again.
+:func:`replay` rebuilds the state from the snapshot
+followed by both journal files and ignores a torn trailing record left behind
+by a crash.
+
+Example
+-------
+>>> journal = MemoryJournal("memory.json")
+>>> journal.append("add", 0, "hello")
+>>> journal.close()
+>>> replay("memory.json")
+({0: 'hello'}, 1)
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+from utils.json_handler import load_json, save_json
+
+
+def journal_paths(path: str | Path) -> Tuple[Path, Path]:
+    """Return the active and the rotated journal path for snapshot *path*."""
+    path = Path(path)
+    active = path.with_name(path.name + ".wal")
+    return active, active.with_name(active.name + ".1")
+
+
+def meta_path(path: str | Path) -> Path:
+    """Return the file holding the folded ``next_id`` for snapshot *path*."""
+    path = Path(path)
+    return path.with_name(path.name + ".meta")
+
+
+def _records(path: Path) -> Iterator[Tuple[int, dict]]:
+    """Yield ``(end_offset, record)`` for every intact line of *path*.
+
+    Iteration stops at the first line lacking its newline or failing to
+    parse, which is what an interrupted append leaves behind.
+    """
+    if not path.exists():
+        return
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return
+            offset += len(line)
+            yield offset, record
+
+
+def _apply(state: Dict[int, str], next_id: int, record: dict) -> int:
+    op = record["op"]
+    if op == "clear":
+        state.clear()
+        return 0
+    entry_id = record["id"]
+    if op == "remove":
+        state.pop(entry_id, None)
+    else:
+        state[entry_id] = record["text"]
+    return max(next_id, entry_id + 1)
+
+
+def _load(path: Path) -> Tuple[Dict[int, str], int]:
+    """Return the snapshot entries at *path* and its persisted ``next_id``."""
+    state: Dict[int, str] = {}
+    if path.exists():
+        state = {int(eid): text for eid, text in load_json(path).items()}
+    next_id = max(state, default=-1) + 1
+    meta = meta_path(path)
+    if meta.exists():
+        next_id = max(next_id, load_json(meta)["next_id"])
+    return state, next_id
+
+
+def replay(path: str | Path) -> Tuple[Dict[int, str], int]:
+    """Return ``(entries, next_id)`` from the snapshot at *path* and journals."""
+    path = Path(path)
+    state, next_id = _load(path)
+    for journal in reversed(journal_paths(path)):
+        for _, record in _records(journal):
+            next_id = _apply(state, next_id, record)
+    return state, next_id
+
+
+def fold(path: str | Path, journal: Path) -> None:
+    """Merge *journal* into the snapshot at *path* and delete it.
+
+    The snapshot is written before ``next_id``; a crash between the two
+    leaves *journal* in place, so :func:`replay` still sees every id.
+    """
+    path = Path(path)
+    state, next_id = _load(path)
+    for _, record in _records(journal):
+        next_id = _apply(state, next_id, record)
+    save_json(path, state)
+    save_json(meta_path(path), {"next_id": next_id})
+    journal.unlink(missing_ok=True)
+
+
+class MemoryJournal:
+    """Write-ahead log sitting next to a JSON snapshot.
+
+    Parameters
+    ----------
+    path:
+        Snapshot location; the journal lives at ``<path>.wal``.
+    sync_every:
+        ``fsync`` after this many unsynced records.
+    sync_interval:
+        ``fsync`` when the oldest unsynced record is this many seconds old.
+    compact_after:
+        Fold the journal into the snapshot in the background after this many
+        records.  ``None`` disables automatic compaction.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        sync_every: int = 100,
+        sync_interval: float = 1.0,
+        compact_after: int | None = 10_000,
+    ) -> None:
+        self.path = Path(path)
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_after = compact_after
+        self._active, self._rotated = journal_paths(self.path)
+        self._lock = threading.Lock()
+        self._compactor: threading.Thread | None = None
+        self._repair()
+        self._file = open(self._active, "ab")
+        self._records = sum(1 for _ in _records(self._active))
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _repair(self) -> None:
+        """Truncate a torn trailing record so new appends stay parseable."""
+        if not self._active.exists():
+            return
+        good = 0
+        for good, _ in _records(self._active):
+            pass
+        if good != self._active.stat().st_size:
+            with open(self._active, "r+b") as f:
+                f.truncate(good)
+
+    def append(
+        self,
+        op: str,
+        entry_id: int | None = None,
+        text: str | None = None,
+        *,
+        sync: bool = True,
+    ) -> None:
+        """Append one mutation record and sync if a batch is due.
+
+        ``sync=False`` defers syncing to an explicit :meth:`sync` call, which
+        bulk writers use to persist a whole batch at once.
+        """
+        record: dict = {"op": op}
+        if entry_id is not None:
+            record["id"] = entry_id
+        if text is not None:
+            record["text"] = text
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line.encode("utf-8"))
+            self._records += 1
+            self._unsynced += 1
+            if sync and (
+                self._unsynced >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval
+            ):
+                self._sync()
+        if self.compact_after is not None and self._records >= self.compact_after:
+            self.compact(wait=False)
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self) -> None:
+        """Flush and ``fsync`` all pending records."""
+        with self._lock:
+            self._sync()
+
+    def compact(self, wait: bool = True) -> None:
+        """Rotate the journal and fold it into the snapshot.
+
+        Appends continue into a fresh journal while the fold runs; with
+        ``wait=False`` the fold happens on a background thread.
+        """
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                compactor = self._compactor
+            else:
+                if self._rotated.exists():
+                    # A previous fold was interrupted; finish it first.
+                    fold(self.path, self._rotated)
+                self._sync()
+                self._file.close()
+                os.replace(self._active, self._rotated)
+                self._file = open(self._active, "ab")
+                self._records = 0
+                compactor = self._compactor = threading.Thread(
+                    target=fold, args=(self.path, self._rotated), daemon=True
+                )
+                compactor.start()
+        if wait:
+            compactor.join()
+
+    def close(self) -> None:
+        """Sync pending records, wait for compaction and close the file."""
+        self.sync()
+        if self._compactor is not None:
+            self._compactor.join()
+        self._file.close()
@@ -0,0 +1,352 @@
+"""Memory-mapped binary snapshots for fast :class:`memory_.Memory` cold starts.
+
+:func:`write_snapshot` stores entries together with their prebuilt token
+index; :class:`MemorySnapshot` maps such a file with :mod:`mmap` and answers
+lookups straight from the mapping, so opening it costs O(1) regardless of
+the number of entries.  Texts are decoded only when accessed.
+
+Layout (native byte order, every section 8-byte aligned)::
+
+    magic    b"AIMSNAP1"
+    header   8 x uint64: entries, tokens, postings, next_id,
+             text bytes, vocabulary bytes, byte order, reserved
+    ids      int64[entries]        ascending entry ids
+    offsets  uint64[entries + 1]   text boundaries in the text blob
+    lengths  uint32[entries]       token totals per entry
+    vocab    uint64[tokens + 1]    token boundaries in the vocabulary blob
+    starts   uint64[tokens + 1]    posting boundaries per token
+    post_ids int64[postings]       entry ids, ascending per token
+    counts   uint32[postings]      token counts
+    texts    UTF-8 blob
+    tokens   UTF-8 blob, tokens sorted by their encoded bytes
+
+:class:`SnapshotEntries` and :class:`SnapshotIndex` overlay a snapshot with
+in-memory changes and stand in for the entry dictionary and
+:class:`~data.memory_index.InvertedIndex` of a loaded
+:class:`~memory_.Memory`.
+
+Example
+-------
+>>> write_snapshot("memory.mmap", [(0, "hello world")], next_id=1)
+>>> MemorySnapshot("memory.mmap").text(0)
+'hello world'
+"""
+from __future__ import annotations
+
+import bisect
+import heapq
+import mmap
+import struct
+import sys
+from array import array
+from collections import Counter
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from data.memory_index import InvertedIndex
+from utils.json_handler import atomic_write
+
+MAGIC = b"AIMSNAP1"
+_HEADER = struct.Struct("<8Q")
+_BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+
+
+def _pad(size: int) -> int:
+    return -size % 8
+
+
+def write_snapshot(path: str | Path, items: Iterable[Tuple[int, str]], next_id: int) -> None:
+    """Write ``(entry_id, text)`` *items* as a snapshot at *path* atomically."""
+    entries = sorted(items)
+    ids = array("q")
+    offsets = array("Q", [0])
+    lengths = array("I")
+    texts = bytearray()
+    postings: Dict[bytes, List[Tuple[int, int]]] = {}
+    for entry_id, text in entries:
+        ids.append(entry_id)
+        texts += text.encode("utf-8")
+        offsets.append(len(texts))
+        tokens = Counter(text.lower().split())
+        lengths.append(sum(tokens.values()))
+        for token, count in tokens.items():
+            postings.setdefault(token.encode("utf-8"), []).append((entry_id, count))
+    vocab = array("Q", [0])
+    starts = array("Q", [0])
+    post_ids = array("q")
+    counts = array("I")
+    blob = bytearray()
+    for token in sorted(postings):
+        blob += token
+        vocab.append(len(blob))
+        for entry_id, count in postings[token]:
+            post_ids.append(entry_id)
+            counts.append(count)
+        starts.append(len(post_ids))
+    header = _HEADER.pack(
+        len(ids), len(postings), len(post_ids), next_id, len(texts), len(blob), _BYTE_ORDER, 0
+    )
+
+    def chunks() -> Iterator[bytes]:
+        yield MAGIC + header
+        for section in (ids, offsets, lengths, vocab, starts, post_ids, counts, texts, blob):
+            data = section.tobytes() if isinstance(section, array) else bytes(section)
+            yield data
+            yield b"\0" * _pad(len(data))
+
+    atomic_write(path, chunks())
+
+
+class MemorySnapshot:
+    """Read-only view of a snapshot file mapped into memory."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a memory snapshot")
+        start = len(MAGIC)
+        (n, tokens, postings, self.next_id, text_size, vocab_size, order, _) = _HEADER.unpack_from(
+            self._map, start
+        )
+        if order != _BYTE_ORDER:
+            raise ValueError(f"{self.path} was written with a different byte order")
+        self.size = len(self._map)
+        view = memoryview(self._map)
+        position = start + _HEADER.size
+
+        def section(size: int, fmt: str | None) -> memoryview:
+            nonlocal position
+            chunk = view[position : position + size]
+            position += size + _pad(size)
+            return chunk.cast(fmt) if fmt else chunk
+
+        self._ids = section(8 * n, "q")
+        self._offsets = section(8 * (n + 1), "Q")
+        self._lengths = section(4 * n, "I")
+        self._vocab = section(8 * (tokens + 1), "Q")
+        self._starts = section(8 * (tokens + 1), "Q")
+        self._post_ids = section(8 * postings, "q")
+        self._counts = section(4 * postings, "I")
+        self._texts_at = position
+        position += text_size + _pad(text_size)
+        self._vocab_at = position
+        self.tokens = tokens
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def index_of(self, entry_id: int) -> Optional[int]:
+        """Return the position of *entry_id* or ``None`` when absent."""
+        i = bisect.bisect_left(self._ids, entry_id)
+        return i if i < len(self._ids) and self._ids[i] == entry_id else None
+
+    def entry_id(self, i: int) -> int:
+        return self._ids[i]
+
+    def text(self, i: int) -> str:
+        """Decode the text of the entry at position *i*."""
+        at = self._texts_at
+        return self._map[at + self._offsets[i] : at + self._offsets[i + 1]].decode("utf-8")
+
+    def length(self, i: int) -> int:
+        return self._lengths[i]
+
+    def items(self) -> Iterator[Tuple[int, str]]:
+        """Yield ``(entry_id, text)`` for every entry in id order."""
+        for i in range(len(self._ids)):
+            yield self._ids[i], self.text(i)
+
+    def _token(self, slot: int) -> bytes:
+        at = self._vocab_at
+        return self._map[at + self._vocab[slot] : at + self._vocab[slot + 1]]
+
+    def _slot(self, token: str) -> Optional[int]:
+        """Binary search the sorted vocabulary for *token*."""
+        key = token.encode("utf-8")
+        lo, hi = 0, self.tokens
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._token(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.tokens and self._token(lo) == key else None
+
+    def posting(self, token: str) -> Iterator[Tuple[int, int]]:
+        """Yield ``(entry_id, count)`` pairs of the entries containing *token*."""
+        slot = self._slot(token)
+        if slot is None:
+            return iter(())
+        a, b = self._starts[slot], self._starts[slot + 1]
+        return zip(self._post_ids[a:b], self._counts[a:b])
+
+    def vocabulary(self) -> Iterator[str]:
+        """Yield every indexed token."""
+        for slot in range(self.tokens):
+            yield self._token(slot).decode("utf-8")
+
+
+class SnapshotEntries(MutableMapping):
+    """``{entry_id: entry}`` mapping over a snapshot plus in-memory changes.
+
+    Iteration follows id order for snapshot entries, then the entries added
+    afterwards in insertion order, matching a dictionary filled the same way.
+    """
+
+    def __init__(self, snapshot: MemorySnapshot, factory: Callable[[str], Any]) -> None:
+        self._base: MemorySnapshot | None = snapshot
+        self._factory = factory
+        self._live: Dict[int, Any] = {}
+        self._hidden: Set[int] = set()  # snapshot ids removed or replaced
+
+    def _base_index(self, entry_id: int) -> Optional[int]:
+        if self._base is None or entry_id in self._hidden:
+            return None
+        return self._base.index_of(entry_id)
+
+    def __getitem__(self, entry_id: int) -> Any:
+        entry = self._live.get(entry_id)
+        if entry is not None:
+            return entry
+        i = self._base_index(entry_id)
+        if i is None:
+            raise KeyError(entry_id)
+        return self._factory(self._base.text(i))
+
+    def __setitem__(self, entry_id: int, entry: Any) -> None:
+        if self._base is not None and self._base.index_of(entry_id) is not None:
+            self._hidden.add(entry_id)
+        self._live[entry_id] = entry
+
+    def __delitem__(self, entry_id: int) -> None:
+        if entry_id in self._live:
+            del self._live[entry_id]
+        elif self._base_index(entry_id) is None:
+            raise KeyError(entry_id)
+        if self._base is not None and self._base.index_of(entry_id) is not None:
+            self._hidden.add(entry_id)
+
+    def __contains__(self, entry_id: object) -> bool:
+        return entry_id in self._live or (
+            isinstance(entry_id, int) and self._base_index(entry_id) is not None
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        base = self._base
+        live = self._live
+        if base is not None:
+            hidden = self._hidden
+            for i in range(len(base)):
+                entry_id = base.entry_id(i)
+                if entry_id in live or entry_id not in hidden:
+                    yield entry_id
+        for entry_id in list(live):
+            if base is None or base.index_of(entry_id) is None:
+                yield entry_id
+
+    def __len__(self) -> int:
+        base = len(self._base) - len(self._hidden) if self._base is not None else 0
+        return base + len(self._live)
+
+    def clear(self) -> None:
+        self._base = None
+        self._live.clear()
+        self._hidden.clear()
+
+
+class SnapshotIndex:
+    """:class:`~data.memory_index.InvertedIndex` API over a snapshot plus changes."""
+
+    def __init__(self, snapshot: MemorySnapshot) -> None:
+        self._base: MemorySnapshot | None = snapshot
+        self._hidden: Set[int] = set()
+        self._live = InvertedIndex()
+
+    def _in_base(self, entry_id: int) -> bool:
+        return self._base is not None and self._base.index_of(entry_id) is not None
+
+    def add(self, entry_id: int, tokens: Mapping[str, int]) -> None:
+        if self._in_base(entry_id):
+            self._hidden.add(entry_id)
+        self._live.add(entry_id, tokens)
+
+    def remove(self, entry_id: int, tokens: Iterable[str]) -> None:
+        self._live.remove(entry_id, tokens)
+        if self._in_base(entry_id):
+            self._hidden.add(entry_id)
+
+    def clear(self) -> None:
+        self._base = None
+        self._hidden.clear()
+        self._live.clear()
+
+    def entry_count(self) -> int:
+        base = len(self._base) - len(self._hidden) if self._base is not None else 0
+        return base + self._live.entry_count()
+
+    def posting(self, token: str) -> Dict[int, int]:
+        posting: Dict[int, int] = {}
+        if self._base is not None:
+            hidden = self._hidden
+            posting = {eid: count for eid, count in self._base.posting(token) if eid not in hidden}
+        posting.update(self._live.posting(token))
+        return posting
+
+    def _length(self, entry_id: int) -> int:
+        length = self._live._lengths.get(entry_id)
+        if length is None:
+            length = self._base.length(self._base.index_of(entry_id))
+        return length
+
+    def candidates(self, tokens: Iterable[str]) -> Set[int]:
+        result: Set[int] = set()
+        for token in tokens:
+            result.update(self.posting(token))
+        return result
+
+    def jaccard_scores(self, query: Mapping[str, int]) -> Dict[int, float]:
+        query_len = sum(query.values())
+        overlap: Dict[int, int] = {}
+        for token, wanted in query.items():
+            for entry_id, count in self.posting(token).items():
+                overlap[entry_id] = overlap.get(entry_id, 0) + (count if count < wanted else wanted)
+        return {
+            entry_id: shared / (query_len + self._length(entry_id) - shared)
+            for entry_id, shared in overlap.items()
+        }
+
+    def iter_top(self, query: Mapping[str, int], limit: int) -> Iterator[Tuple[int, float]]:
+        scores = self.jaccard_scores(query)
+        key = lambda s: (-s[1], s[0])  # noqa: E731
+        if limit < 0:
+            return iter(sorted(scores.items(), key=key))
+        return iter(heapq.nsmallest(limit, scores.items(), key=key))
+
+    @property
+    def _lengths(self) -> Dict[int, int]:
+        lengths: Dict[int, int] = {}
+        if self._base is not None:
+            for i in range(len(self._base)):
+                entry_id = self._base.entry_id(i)
+                if entry_id not in self._hidden:
+                    lengths[entry_id] = self._base.length(i)
+        lengths.update(self._live._lengths)
+        return lengths
+
+    @property
+    def _postings(self) -> Dict[str, Dict[int, int]]:
+        """Every posting list; a full decode used for TF-IDF norms."""
+        tokens = set(self._live._postings)
+        if self._base is not None:
+            tokens.update(self._base.vocabulary())
+        postings = {token: self.posting(token) for token in tokens}
+        return {token: posting for token, posting in postings.items() if posting}
+
+    def __contains__(self, token: object) -> bool:
+        return isinstance(token, str) and bool(self.posting(token))
+
+    def __len__(self) -> int:
+        return len(self._postings)
@@ -0,0 +1,313 @@
+"""Process-sharded facade over :class:`memory_.Memory`.
+
+:class:`ShardedMemory` spreads entries over ``N`` worker processes, each owning
+a regular :class:`~memory_.Memory`.  Entry ``i`` lives on shard ``i % N`` under
+the local id ``i // N``; because ids are handed out sequentially every shard
+assigns exactly those local ids itself, so no id tables are needed.
+
+Searches are scattered to all shards at once over :func:`multiprocessing.Pipe`
+connections and the per-shard top-k lists are merged.  Each shard ranks its
+own entries with the same ``(-score, id)`` order, so the merged result equals
+what a single :class:`~memory_.Memory` holding every entry would return.
+
+Example
+-------
+>>> with ShardedMemory(shards=2) as memory:
+...     ident = memory.add("hello world")
+...     memory.search("hello", limit=1)
+[(0, 1.0)]
+"""
+from __future__ import annotations
+
+import heapq
+import multiprocessing
+import os
+import threading
+import weakref
+from collections.abc import Iterable, Iterator, Mapping
+from itertools import islice
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Sequence, Tuple
+
+from memory_ import Memory, _is_jsonl, _read_texts
+from utils.json_handler import write_json_object, write_jsonl
+
+# Texts distributed per round trip by :meth:`ShardedMemory.add_many`.
+_CHUNK = 10_000
+
+
+def _serve(conn, options: Dict[str, Any]) -> None:
+    """Worker loop answering ``(method, args)`` requests for one shard."""
+    memory = Memory(**options)
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        method, args = request
+        try:
+            result = getattr(memory, method)(*args)
+            if isinstance(result, MappingProxyType):
+                result = dict(result)  # proxies cannot be pickled
+            conn.send((True, result))
+        except Exception as exc:  # forwarded to the caller
+            conn.send((False, exc))
+    memory.close()
+    conn.close()
+
+
+def _stop(processes: Sequence, connections: Sequence) -> None:
+    """Ask every worker to exit and reap it."""
+    for conn in connections:
+        try:
+            conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():  # pragma: no cover - unresponsive worker
+            process.terminate()
+
+
+class ShardedMemory:
+    """:class:`~memory_.Memory` API backed by *shards* worker processes.
+
+    Parameters
+    ----------
+    shards:
+        Number of worker processes, defaulting to :func:`os.cpu_count`.
+    **options:
+        Keyword arguments for each shard's :class:`~memory_.Memory`, e.g.
+        ``compact`` or ``cache_size``.  Autosave is handled by :meth:`save`
+        on the facade instead.
+    """
+
+    def __init__(self, shards: int | None = None, **options: Any) -> None:
+        self.shards = shards or os.cpu_count() or 1
+        context = multiprocessing.get_context("spawn")
+        self._connections = []
+        self._processes = []
+        for _ in range(self.shards):
+            parent, child = context.Pipe()
+            process = context.Process(target=_serve, args=(child, options), daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+        self._lock = threading.Lock()
+        # Ids map to shards by position, so an id must reach its shard before
+        # the next one is handed out; held across allocation and delivery.
+        self._id_lock = threading.RLock()
+        self._next_id = 0
+        self._finalizer = weakref.finalize(self, _stop, self._processes, self._connections)
+
+    # ------------------------------------------------------------------
+    # Transport
+    # ------------------------------------------------------------------
+
+    def _call(self, shard: int, method: str, *args: Any) -> Any:
+        """Run *method* on one shard and return its result."""
+        with self._lock:
+            conn = self._connections[shard]
+            conn.send((method, args))
+            return self._result(conn)
+
+    def _scatter(self, requests: Sequence[Tuple[str, tuple] | None]) -> List[Any]:
+        """Send ``requests[i]`` to shard ``i`` in parallel and gather results.
+
+        ``None`` skips a shard; its result is ``None`` as well.
+        """
+        with self._lock:
+            for conn, request in zip(self._connections, requests):
+                if request is not None:
+                    conn.send(request)
+            results = []
+            error = None
+            for conn, request in zip(self._connections, requests):
+                if request is None:
+                    results.append(None)
+                    continue
+                try:
+                    results.append(self._result(conn))
+                except Exception as exc:  # drain the other shards first
+                    error = error or exc
+                    results.append(None)
+        if error is not None:
+            raise error
+        return results
+
+    def _broadcast(self, method: str, *args: Any) -> List[Any]:
+        return self._scatter([(method, args)] * self.shards)
+
+    @staticmethod
+    def _result(conn) -> Any:
+        ok, value = conn.recv()
+        if not ok:
+            raise value
+        return value
+
+    def _locate(self, entry_id: int) -> Tuple[int, int]:
+        return entry_id % self.shards, entry_id // self.shards
+
+    def _global(self, shard: int, local_id: int) -> int:
+        return local_id * self.shards + shard
+
+    # ------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------
+
+    def add(self, text: str) -> int:
+        """Add a new memory entry and return its identifier."""
+        with self._id_lock:
+            entry_id = self._next_id
+            shard, _ = self._locate(entry_id)
+            self._call(shard, "add", text)
+            self._next_id += 1
+            return entry_id
+
+    def add_many(self, texts: Iterable[str]) -> range:
+        """Add every text of *texts*, loading all shards in parallel."""
+        with self._id_lock:
+            start = self._next_id
+            texts = iter(texts)
+            while True:
+                chunk = list(islice(texts, _CHUNK * self.shards))
+                if not chunk:
+                    break
+                first = self._next_id
+                parts: List[List[str]] = [[] for _ in range(self.shards)]
+                for offset, text in enumerate(chunk):
+                    parts[(first + offset) % self.shards].append(text)
+                self._scatter([("add_many", (part,)) if part else None for part in parts])
+                self._next_id += len(chunk)
+            return range(start, self._next_id)
+
+    def get(self, entry_id: int) -> str:
+        """Return the text for *entry_id* or raise ``KeyError``."""
+        shard, local_id = self._locate(entry_id)
+        try:
+            return self._call(shard, "get", local_id)
+        except KeyError:
+            raise KeyError(entry_id) from None
+
+    def update(self, entry_id: int, text: str) -> None:
+        """Replace the text at *entry_id* with a new value."""
+        shard, local_id = self._locate(entry_id)
+        self._call(shard, "update", local_id, text)
+
+    def remove(self, entry_id: int) -> None:
+        """Delete the entry identified by *entry_id* if present."""
+        shard, local_id = self._locate(entry_id)
+        self._call(shard, "remove", local_id)
+
+    def clear(self) -> None:
+        """Remove all stored entries."""
+        with self._id_lock:
+            self._broadcast("clear")
+            self._next_id = 0
+
+    def remove_matching(self, pattern: str) -> int:
+        """Remove all entries matching *pattern* and return the count."""
+        return sum(self._broadcast("remove_matching", pattern))
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def save(self, path: str | Path) -> None:
+        """Serialise all entries to JSON, or JSON Lines for ``.jsonl``, at *path*."""
+        if _is_jsonl(Path(path)):
+            write_jsonl(path, ({"id": eid, "text": text} for eid, text in self.snapshot().items()))
+        else:
+            write_json_object(path, self.snapshot().items())
+
+    def load(self, path: str | Path) -> None:
+        """Replace the contents with the entries of a JSON or JSON Lines file.
+
+        The file is parsed before the shards are cleared, so a missing or
+        malformed file raises and leaves the contents untouched.
+        """
+        texts = _read_texts(Path(path))
+        with self._id_lock:
+            self.clear()
+            self.add_many(texts)
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        self._finalizer()
+
+    def __enter__(self) -> "ShardedMemory":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _merge(self, per_shard: Sequence[List[Tuple[int, float]]], limit: int) -> List[Tuple[int, float]]:
+        """Merge per-shard rankings into the global top *limit*."""
+        hits = [
+            (self._global(shard, local_id), score)
+            for shard, ranked in enumerate(per_shard)
+            for local_id, score in ranked
+        ]
+        key = lambda s: (-s[1], s[0])  # noqa: E731
+        if 0 <= limit < len(hits):
+            return heapq.nsmallest(limit, hits, key=key)
+        return sorted(hits, key=key)
+
+    def _ids(self, per_shard: Sequence[List[int]]) -> List[int]:
+        return sorted(
+            self._global(shard, local_id) for shard, ids in enumerate(per_shard) for local_id in ids
+        )
+
+    def search(self, query: str, limit: int = 3, exhaustive: bool = False) -> List[Tuple[int, float]]:
+        """Return entry ids sorted by similarity to the query."""
+        return self._merge(self._broadcast("search", query, limit, exhaustive), limit)
+
+    def search_synonyms(self, query: str, limit: int = 3) -> List[Tuple[int, float]]:
+        """Search *query* expanding tokens with :data:`memory_.SYNONYMS`."""
+        return self._merge(self._broadcast("search_synonyms", query, limit), limit)
+
+    def search_many(
+        self, queries: Iterable[str], limit: int = 3, weighting: str = "jaccard"
+    ) -> List[List[Tuple[int, float]]]:
+        """Run :meth:`search` for every query of *queries* in one batch."""
+        queries = list(queries)
+        per_shard = self._broadcast("search_many", queries, limit, weighting)
+        return [self._merge([ranked[i] for ranked in per_shard], limit) for i in range(len(queries))]
+
+    def search_regex(self, pattern: str) -> List[int]:
+        """Return entry ids whose text matches the regex *pattern*."""
+        return self._ids(self._broadcast("search_regex", pattern))
+
+    def find_similar(self, text: str, cutoff: float = 0.6, exact: bool = False) -> List[int]:
+        """Return ids of entries whose raw text is similar to ``text``."""
+        return self._ids(self._broadcast("find_similar", text, cutoff, exact))
+
+    def summarise(self, word_limit: int = 30) -> str:
+        """Return a naive concatenated summary of stored entries."""
+        words = (" ".join(text.split()[:word_limit]) for text in self)
+        return "\n".join(words)
+
+    def snapshot(self) -> Mapping[int, str]:
+        """Return an immutable ``{entry_id: text}`` view across all shards."""
+        merged = {
+            self._global(shard, local_id): text
+            for shard, view in enumerate(self._broadcast("snapshot"))
+            for local_id, text in view.items()
+        }
+        return MappingProxyType(dict(sorted(merged.items())))
+
+    def __len__(self) -> int:
+        """Return the number of stored entries."""
+        return sum(self._broadcast("__len__"))
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over stored entry texts in insertion order."""
+        return iter(self.snapshot().values())
@@ -0,0 +1,363 @@
+"""SQLite FTS5 storage backend for :class:`memory_.Memory`.
+
+:class:`SQLiteStore` keeps entries in a SQLite database instead of Python
+dictionaries, so a store backed by a file can outgrow RAM and survives
+restarts without JSON rewrites.  It exposes three adapters that slot into the
+places :class:`~memory_.Memory` uses its in-memory structures:
+
+:meth:`SQLiteStore.entries`
+    A mutable mapping ``{entry_id: entry}`` over the ``entries`` table.
+:meth:`SQLiteStore.index`
+    The :class:`~data.memory_index.InvertedIndex` API over an FTS5 table of
+    whitespace tokens.  Jaccard scores and the top-k selection are computed
+    in SQL from the ``fts5vocab`` instance table.
+:meth:`SQLiteStore.trigram_index`
+    The :class:`~data.memory_index.TrigramIndex` API over an FTS5 table using
+    the ``trigram`` tokenizer; :meth:`SQLiteStore.filter_regex` then applies
+    the regular expression inside SQLite.
+
+Tokens are stored hex encoded so FTS5 sees exactly the tokens produced by
+``text.lower().split()``, punctuation included.  Writes go through one open
+transaction that :meth:`SQLiteStore.commit` ends; file databases use WAL
+journaling, which keeps those commits cheap.
+
+Example
+-------
+>>> from collections import Counter
+>>> index = SQLiteStore().index()
+>>> index.add(0, Counter("hello world".split()))
+>>> index.jaccard_scores(Counter(["hello"]))
+{0: 0.5}
+"""
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from data.memory_index import TrigramQuery
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries(id INTEGER PRIMARY KEY, text TEXT NOT NULL);
+CREATE VIRTUAL TABLE IF NOT EXISTS tokens USING fts5(terms, length UNINDEXED);
+CREATE VIRTUAL TABLE IF NOT EXISTS token_instances USING fts5vocab(tokens, 'instance');
+CREATE VIRTUAL TABLE IF NOT EXISTS token_rows USING fts5vocab(tokens, 'row');
+CREATE VIRTUAL TABLE IF NOT EXISTS trigrams USING fts5(text, tokenize='trigram case_sensitive 1');
+"""
+
+# Shared token counts of every entry matching at least one query token.
+_SHARED = """
+WITH q(term, want) AS (SELECT key, value FROM json_each(?)),
+hits AS (
+    SELECT doc, term, count(*) AS have FROM token_instances
+    WHERE term IN (SELECT term FROM q) GROUP BY doc, term
+),
+shared AS (SELECT doc, sum(min(have, want)) AS n FROM hits JOIN q USING (term) GROUP BY doc)
+SELECT doc, n * 1.0 / (? + t.length - n) AS score
+FROM shared JOIN tokens t ON t.rowid = shared.doc
+"""
+
+# Rows fetched per round trip when iterating a table.
+_PAGE = 1000
+
+
+def _hex(token: str) -> str:
+    return token.encode("utf-8").hex()
+
+
+def _unhex(term: str) -> str:
+    return bytes.fromhex(term).decode("utf-8")
+
+
+def _regexp(pattern: str, text: str) -> bool:
+    return re.search(pattern, text) is not None
+
+
+def _quote(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _match_expression(query: TrigramQuery) -> Optional[str]:
+    """Translate a trigram query into an FTS5 ``MATCH`` expression.
+
+    Returns ``None`` when *query* does not constrain the candidates.
+    """
+    clauses = []
+    for clause in query:
+        if isinstance(clause, str):
+            clauses.append(_quote(clause))
+            continue
+        alternatives = [_match_expression(alternative) for alternative in clause]
+        if all(alternatives):
+            clauses.append("(" + " OR ".join(alternatives) + ")")
+    return " AND ".join(clauses) or None
+
+
+class SQLiteStore:
+    """Entries, token index and trigram index in one SQLite database.
+
+    Parameters
+    ----------
+    path:
+        Database file, or ``":memory:"`` for a private in-memory database.
+    """
+
+    def __init__(self, path: str | Path = ":memory:") -> None:
+        self.path = str(path)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.RLock()
+        self._trigrams: SQLiteTrigramIndex | None = None
+        self._db.create_function("regexp", 2, _regexp, deterministic=True)
+        self._db.create_function("pylower", 1, str.lower, deterministic=True)
+        if self.path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    @property
+    def persistent(self) -> bool:
+        """``True`` when the database outlives this connection."""
+        return self.path != ":memory:"
+
+    # ------------------------------------------------------------------
+    # Statement helpers
+    # ------------------------------------------------------------------
+
+    def _query(self, sql: str, params: Iterable[Any] = ()) -> List[tuple]:
+        with self._lock:
+            return self._db.execute(sql, tuple(params)).fetchall()
+
+    def _write(self, sql: str, params: Iterable[Any] = ()) -> None:
+        with self._lock:
+            if not self._db.in_transaction:
+                self._db.execute("BEGIN")
+            self._db.execute(sql, tuple(params))
+
+    def _pages(self, sql: str) -> Iterator[tuple]:
+        """Yield the rows of *sql* page by page.
+
+        *sql* takes ``(after, limit)`` parameters and selects the id first.
+        """
+        after = -1
+        while True:
+            rows = self._query(sql, (after, _PAGE))
+            yield from rows
+            if len(rows) < _PAGE:
+                return
+            after = rows[-1][0]
+
+    def commit(self) -> None:
+        """Commit the pending write transaction, if any."""
+        with self._lock:
+            if self._db.in_transaction:
+                self._db.execute("COMMIT")
+
+    def rollback(self) -> None:
+        """Discard the pending write transaction, if any."""
+        with self._lock:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+
+    def close(self) -> None:
+        """Commit and close the database connection."""
+        with self._lock:
+            self.commit()
+            self._db.close()
+
+    # ------------------------------------------------------------------
+    # Entries
+    # ------------------------------------------------------------------
+
+    def entries(self, factory: Callable[[str], Any]) -> "SQLiteEntries":
+        """Return a mapping view creating entries with *factory*."""
+        return SQLiteEntries(self, factory)
+
+    def next_id(self) -> int:
+        """Return one past the largest stored id."""
+        return self._query("SELECT coalesce(max(id) + 1, 0) FROM entries")[0][0]
+
+    def texts(self) -> Iterator[Tuple[int, str]]:
+        """Stream ``(entry_id, text)`` pairs in id order."""
+        return self._pages("SELECT id, text FROM entries WHERE id > ? ORDER BY id LIMIT ?")
+
+    def filter_regex(self, pattern: str, ids: Optional[List[int]] = None) -> List[int]:
+        """Return ids among *ids* (all when ``None``) whose text matches *pattern*."""
+        if ids is None:
+            sql = "SELECT id FROM entries WHERE text REGEXP ? ORDER BY id"
+            return [eid for eid, in self._query(sql, (pattern,))]
+        sql = (
+            "SELECT id FROM entries WHERE id IN (SELECT value FROM json_each(?)) "
+            "AND text REGEXP ? ORDER BY id"
+        )
+        return [eid for eid, in self._query(sql, (json.dumps(ids), pattern))]
+
+    # ------------------------------------------------------------------
+    # Indexes
+    # ------------------------------------------------------------------
+
+    def index(self) -> "SQLiteIndex":
+        """Return the token index adapter."""
+        return SQLiteIndex(self)
+
+    def trigram_index(self) -> "SQLiteTrigramIndex":
+        """Return the trigram index adapter, rebuilding the table once.
+
+        The table is only maintained while an adapter is in use, so it is
+        refilled from the entries on the first call of each session.
+        """
+        with self._lock:
+            if self._trigrams is None:
+                self._write("DELETE FROM trigrams")
+                self._write("INSERT INTO trigrams(rowid, text) SELECT id, pylower(text) FROM entries")
+                self.commit()
+                self._trigrams = SQLiteTrigramIndex(self)
+            return self._trigrams
+
+
+class SQLiteEntries(MutableMapping):
+    """``{entry_id: entry}`` mapping stored in the ``entries`` table."""
+
+    def __init__(self, store: SQLiteStore, factory: Callable[[str], Any]) -> None:
+        self._store = store
+        self._factory = factory
+
+    def __getitem__(self, entry_id: int) -> Any:
+        rows = self._store._query("SELECT text FROM entries WHERE id = ?", (entry_id,))
+        if not rows:
+            raise KeyError(entry_id)
+        return self._factory(rows[0][0])
+
+    def __setitem__(self, entry_id: int, entry: Any) -> None:
+        self._store._write("INSERT OR REPLACE INTO entries(id, text) VALUES (?, ?)", (entry_id, entry.text))
+
+    def __delitem__(self, entry_id: int) -> None:
+        if self.pop(entry_id, None) is None:
+            raise KeyError(entry_id)
+
+    def pop(self, entry_id: int, *default: Any) -> Any:
+        with self._store._lock:
+            try:
+                entry = self[entry_id]
+            except KeyError:
+                if default:
+                    return default[0]
+                raise
+            self._store._write("DELETE FROM entries WHERE id = ?", (entry_id,))
+            return entry
+
+    def __contains__(self, entry_id: object) -> bool:
+        return bool(self._store._query("SELECT 1 FROM entries WHERE id = ?", (entry_id,)))
+
+    def __iter__(self) -> Iterator[int]:
+        return (eid for eid, in self._store._pages("SELECT id FROM entries WHERE id > ? ORDER BY id LIMIT ?"))
+
+    def __len__(self) -> int:
+        return self._store._query("SELECT count(*) FROM entries")[0][0]
+
+    def items(self) -> Iterator[Tuple[int, Any]]:  # type: ignore[override]
+        return ((eid, self._factory(text)) for eid, text in self._store.texts())
+
+    def values(self) -> Iterator[Any]:  # type: ignore[override]
+        return (self._factory(text) for _, text in self._store.texts())
+
+    def clear(self) -> None:
+        self._store._write("DELETE FROM entries")
+
+
+class SQLiteIndex:
+    """:class:`~data.memory_index.InvertedIndex` API over the FTS5 token table."""
+
+    def __init__(self, store: SQLiteStore) -> None:
+        self._store = store
+
+    def add(self, entry_id: int, tokens: Mapping[str, int]) -> None:
+        terms = " ".join(_hex(token) for token in tokens for _ in range(tokens[token]))
+        self._store._write(
+            "INSERT INTO tokens(rowid, terms, length) VALUES (?, ?, ?)",
+            (entry_id, terms, sum(tokens.values())),
+        )
+
+    def remove(self, entry_id: int, tokens: Mapping[str, int]) -> None:
+        self._store._write("DELETE FROM tokens WHERE rowid = ?", (entry_id,))
+
+    def clear(self) -> None:
+        self._store._write("DELETE FROM tokens")
+
+    def entry_count(self) -> int:
+        """Return the number of indexed entries."""
+        return self._store._query("SELECT count(*) FROM tokens")[0][0]
+
+    def posting(self, token: str) -> Dict[int, int]:
+        sql = "SELECT doc, count(*) FROM token_instances WHERE term = ? GROUP BY doc"
+        return dict(self._store._query(sql, (_hex(token),)))
+
+    def candidates(self, tokens: Iterable[str]) -> Set[int]:
+        expression = " OR ".join(_quote(_hex(token)) for token in tokens)
+        if not expression:
+            return set()
+        return {eid for eid, in self._store._query("SELECT rowid FROM tokens WHERE tokens MATCH ?", (expression,))}
+
+    def _shared(self, query: Mapping[str, int], suffix: str = "", extra: tuple = ()) -> List[tuple]:
+        wanted = json.dumps({_hex(token): count for token, count in query.items()})
+        return self._store._query(_SHARED + suffix, (wanted, sum(query.values())) + extra)
+
+    def jaccard_scores(self, query: Mapping[str, int]) -> Dict[int, float]:
+        return dict(self._shared(query)) if query else {}
+
+    def iter_top(self, query: Mapping[str, int], limit: int) -> Iterator[Tuple[int, float]]:
+        if not query or limit == 0:
+            return iter(())
+        if limit < 0:
+            return iter(self._shared(query, " ORDER BY score DESC, doc"))
+        return iter(self._shared(query, " ORDER BY score DESC, doc LIMIT ?", (limit,)))
+
+    @property
+    def _lengths(self) -> Dict[int, int]:
+        return dict(self._store._query("SELECT rowid, length FROM tokens"))
+
+    @property
+    def _postings(self) -> Dict[str, Dict[int, int]]:
+        """Every posting list; a full scan used for TF-IDF norms."""
+        postings: Dict[str, Dict[int, int]] = {}
+        rows = self._store._query("SELECT term, doc, count(*) FROM token_instances GROUP BY term, doc")
+        for term, doc, count in rows:
+            postings.setdefault(_unhex(term), {})[doc] = count
+        return postings
+
+    def __contains__(self, token: object) -> bool:
+        if not isinstance(token, str):
+            return False
+        return bool(self._store._query("SELECT 1 FROM token_rows WHERE term = ?", (_hex(token),)))
+
+    def __len__(self) -> int:
+        return self._store._query("SELECT count(*) FROM token_rows")[0][0]
+
+
+class SQLiteTrigramIndex:
+    """:class:`~data.memory_index.TrigramIndex` API over the FTS5 trigram table."""
+
+    def __init__(self, store: SQLiteStore) -> None:
+        self._store = store
+
+    def add(self, entry_id: int, text: str) -> None:
+        self._store._write("INSERT INTO trigrams(rowid, text) VALUES (?, ?)", (entry_id, text.lower()))
+
+    def remove(self, entry_id: int, text: str) -> None:
+        self._store._write("DELETE FROM trigrams WHERE rowid = ?", (entry_id,))
+
+    def clear(self) -> None:
+        self._store._write("DELETE FROM trigrams")
+
+    def evaluate(self, query: TrigramQuery) -> Optional[Set[int]]:
+        expression = _match_expression(query)
+        if expression is None:
+            return None
+        rows = self._store._query("SELECT rowid FROM trigrams WHERE trigrams MATCH ?", (expression,))
+        return {eid for eid, in rows}
+
+    def __len__(self) -> int:
+        return self._store._query("SELECT count(*) FROM trigrams")[0][0]
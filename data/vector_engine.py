@@ -0,0 +1,223 @@
+"""Batch scoring engine for :meth:`memory_.Memory.search_many`.
+
+When NumPy is installed the :class:`VectorEngine` turns the posting lists of an
+:class:`~data.memory_index.InvertedIndex` into column-major sparse term
+vectors and scores a whole batch of queries with array operations, selecting
+the top hits with :func:`numpy.argpartition`.  Without NumPy it still offers
+the TF-IDF weighting as pure Python score dictionaries so callers can fall
+back to the regular ranking path.
+
+Two weightings are supported:
+
+``"jaccard"``
+    The multiset Jaccard score used by :meth:`memory_.Memory.search`.
+``"tfidf"``
+    Cosine similarity of smoothed TF-IDF vectors,
+    ``idf = log((1 + N) / (1 + df)) + 1``.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+from data.memory_index import InvertedIndex
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+WEIGHTINGS = ("jaccard", "tfidf")
+
+# Upper bound on the number of cells of one batch score matrix.
+_BATCH_CELLS = 1 << 24
+
+
+class VectorEngine:
+    """Score batches of token queries against an :class:`InvertedIndex`.
+
+    Derived arrays are cached per store *generation* and rebuilt lazily after
+    the owning :class:`memory_.Memory` changes.  The caches are guarded by a
+    lock because several reader threads may search at once.
+    """
+
+    def __init__(self, index: InvertedIndex) -> None:
+        self.index = index
+        self._generation = -1
+        self._ids = None
+        self._lengths = None
+        self._norms: Dict[int, float] | None = None
+        self._columns: Dict[str, Tuple[object, object]] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def vectorized(self) -> bool:
+        """``True`` when NumPy is available for batch scoring."""
+        return np is not None
+
+    def _refresh(self, generation: int) -> None:
+        if generation == self._generation:
+            return
+        self._generation = generation
+        self._norms = None
+        self._columns.clear()
+        if np is not None:
+            lengths = self.index._lengths
+            self._ids = np.fromiter(sorted(lengths), dtype=np.int64, count=len(lengths))
+            self._lengths = np.fromiter(
+                (lengths[eid] for eid in self._ids.tolist()), dtype=np.float64, count=len(lengths)
+            )
+
+    def idf(self, token: str) -> float:
+        """Return the smoothed inverse document frequency of *token*."""
+        total = self.index.entry_count()
+        return math.log((1 + total) / (1 + len(self.index.posting(token)))) + 1
+
+    def _entry_norms(self) -> Dict[int, float]:
+        """Return the TF-IDF vector norm of every entry (one full pass)."""
+        if self._norms is None:
+            squares: Dict[int, float] = dict.fromkeys(self.index._lengths, 0.0)
+            for token, posting in self.index._postings.items():
+                weight = self.idf(token)
+                for entry_id, count in posting.items():
+                    squares[entry_id] += (count * weight) ** 2
+            self._norms = {eid: math.sqrt(value) for eid, value in squares.items()}
+        return self._norms
+
+    def tfidf_scores(self, query: Mapping[str, int], generation: int) -> Dict[int, float]:
+        """Return cosine TF-IDF scores of entries sharing a token with *query*."""
+        with self._lock:
+            self._refresh(generation)
+            return self._tfidf_scores(query)
+
+    def _tfidf_scores(self, query: Mapping[str, int]) -> Dict[int, float]:
+        weights = {token: count * self.idf(token) for token, count in query.items()}
+        query_norm = math.sqrt(sum(w * w for w in weights.values()))
+        if not query_norm:
+            return {}
+        norms = self._entry_norms()
+        dots: Dict[int, float] = {}
+        for token, weight in weights.items():
+            idf = self.idf(token)
+            for entry_id, count in self.index.posting(token).items():
+                dots[entry_id] = dots.get(entry_id, 0.0) + weight * count * idf
+        return {eid: dot / (query_norm * norms[eid]) for eid, dot in dots.items()}
+
+    # ------------------------------------------------------------------
+    # NumPy batch path
+    # ------------------------------------------------------------------
+
+    def _column(self, token: str):
+        """Return ``(columns, counts)`` arrays of *token*'s posting list."""
+        cached = self._columns.get(token)
+        if cached is None:
+            posting = self.index.posting(token)
+            ids = np.fromiter(posting.keys(), dtype=np.int64, count=len(posting))
+            counts = np.fromiter(posting.values(), dtype=np.float64, count=len(posting))
+            cached = self._columns[token] = (np.searchsorted(self._ids, ids), counts)
+        return cached
+
+    def search_many(
+        self,
+        queries: Sequence[Mapping[str, int]],
+        limit: int,
+        weighting: str,
+        generation: int,
+    ) -> List[List[Tuple[int, float]]]:
+        """Return the ranked ``(entry_id, score)`` lists for *queries*.
+
+        Rankings follow :meth:`memory_.Memory.search`: descending score, ties
+        (including the zero scores padding short result lists) by ascending
+        id.  Requires NumPy; see :attr:`vectorized`.
+        """
+        if np is None:
+            raise RuntimeError("numpy is required for vectorized search")
+        with self._lock:
+            self._refresh(generation)
+            return self._search_many(queries, limit, weighting)
+
+    def _search_many(
+        self, queries: Sequence[Mapping[str, int]], limit: int, weighting: str
+    ) -> List[List[Tuple[int, float]]]:
+        results: List[List[Tuple[int, float]]] = []
+        batch: List[Mapping[str, int]] = []
+        width = 0  # upper bound on the candidate columns of the batch
+        for query in queries:
+            batch.append(query)
+            width += sum(len(self.index.posting(t)) for t in query)
+            if len(batch) * width >= _BATCH_CELLS:
+                results.extend(self._search_batch(batch, limit, weighting))
+                batch, width = [], 0
+        if batch:
+            results.extend(self._search_batch(batch, limit, weighting))
+        return results
+
+    def _search_batch(self, batch: Sequence[Mapping[str, int]], limit: int, weighting: str):
+        """Score *batch* on the union of its candidate columns only."""
+        by_token: Dict[str, List[Tuple[int, int]]] = {}
+        for row, query in enumerate(batch):
+            for token, count in query.items():
+                if token in self.index:
+                    by_token.setdefault(token, []).append((row, count))
+        columns = {token: self._column(token) for token in by_token}
+        if columns:
+            candidates = np.unique(np.concatenate([cols for cols, _ in columns.values()]))
+        else:
+            candidates = np.zeros(0, dtype=np.int64)
+        scores = np.zeros((len(batch), len(candidates)), dtype=np.float64)
+        tfidf = weighting == "tfidf"
+        for token, users in by_token.items():
+            cols, counts = columns[token]
+            cols = np.searchsorted(candidates, cols)
+            rows = np.array([r for r, _ in users])
+            wanted = np.array([c for _, c in users], dtype=np.float64)
+            if tfidf:
+                idf = self.idf(token)
+                scores[rows[:, None], cols[None, :]] += (wanted * idf)[:, None] * (counts * idf)[None, :]
+            else:
+                scores[rows[:, None], cols[None, :]] += np.minimum(wanted[:, None], counts[None, :])
+        if tfidf:
+            norms = self._entry_norms()
+            entry_norms = np.fromiter(
+                (norms[eid] for eid in self._ids[candidates].tolist()),
+                dtype=np.float64,
+                count=len(candidates),
+            )
+            query_norms = np.array([
+                math.sqrt(sum((c * self.idf(t)) ** 2 for t, c in q.items())) for q in batch
+            ])
+            denominator = query_norms[:, None] * entry_norms[None, :]
+            np.divide(scores, denominator, out=scores, where=denominator > 0)
+        else:
+            query_lengths = np.array([sum(q.values()) for q in batch], dtype=np.float64)
+            union = query_lengths[:, None] + self._lengths[candidates][None, :] - scores
+            np.divide(scores, union, out=scores, where=union > 0)
+        return [self._top(row, candidates, limit) for row in scores]
+
+    def _top(self, row, candidates, limit: int) -> List[Tuple[int, float]]:
+        """Select the top *limit* hits of *row* honouring the id tie-break.
+
+        *row* scores the columns *candidates*; when fewer than *limit* of them
+        are positive the remaining slots are zero-score entries in id order.
+        """
+        total = len(self._ids)
+        k = total if limit < 0 else min(limit, total)
+        if k <= 0:
+            return []
+        positive = np.flatnonzero(row > 0)
+        if len(positive) > k:
+            values = row[positive]
+            threshold = values[np.argpartition(-values, k - 1)[k - 1]]
+            above = positive[values > threshold]
+            ties = positive[values == threshold][: k - len(above)]
+            positive = np.concatenate((above, ties))
+        order = positive[np.lexsort((positive, -row[positive]))]
+        ranked = list(zip(self._ids[candidates[order]].tolist(), row[order].tolist()))
+        missing = k - len(ranked)
+        if missing > 0:
+            taken = np.zeros(total, dtype=bool)
+            taken[candidates[order]] = True
+            head = np.flatnonzero(~taken[: k])[:missing]
+            ranked.extend((eid, 0.0) for eid in self._ids[head].tolist())
+        return ranked[:limit] if limit < 0 else ranked
@@ -0,0 +1,462 @@
+"""Micro benchmarks for :class:`memory_.Memory`.
+
+The synthetic corpus follows Heaps' law: the vocabulary grows with the square
+root of the entry count, which is how natural text behaves and what keeps
+posting lists shorter than the store itself.
+
+Example
+-------
+$ python -m devtools.memory_benchmark search --sizes 10000 100000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import heapq
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+from pathlib import Path
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Sequence
+
+from backup import BackupManager, restore
+from data.memory_snapshot import write_snapshot
+from data.sharded_memory import ShardedMemory
+from memory_ import Memory
+from utils.json_handler import CODECS, load_json, save_json, write_json_object
+
+BENCHMARKS: Dict[str, Callable[[Sequence[int]], None]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark under *name* for the command line runner."""
+
+    def decorator(func: Callable[[Sequence[int]], None]):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+def corpus(n: int, words_per_entry: int = 8, seed: int = 0, zipf: bool = False) -> Iterator[str]:
+    """Yield *n* synthetic entries with a ``~sqrt(n)`` sized vocabulary.
+
+    Words are uniform over the vocabulary, or roughly Zipf distributed (a
+    few very common words, a long tail of rare ones) with ``zipf=True``.
+    """
+    rng = random.Random(seed)
+    vocab = max(100, int(20 * n ** 0.5))
+    for _ in range(n):
+        if zipf:
+            ranks = (int(vocab ** rng.random()) for _ in range(words_per_entry))
+        else:
+            ranks = (rng.randrange(vocab) for _ in range(words_per_entry))
+        yield " ".join(_word(rank) for rank in ranks)
+
+
+def _word(index: int) -> str:
+    """Return a deterministic pseudo word derived from *index*."""
+    rng = random.Random(index)
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+
+
+def build(n: int, zipf: bool = False, **kwargs) -> Memory:
+    """Return a :class:`Memory` filled with ``corpus(n, zipf=zipf)``."""
+    memory = Memory(**kwargs)
+    memory.add_many(corpus(n, zipf=zipf))
+    return memory
+
+
+def timed(func: Callable[[], object], repeat: int) -> float:
+    """Return the mean wall time of *func* in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def _scan(memory: Memory, query: str, limit: int = 3) -> List[tuple]:
+    """Reference full-scan search used before the inverted index."""
+    tokens = Counter(query.lower().split())
+    scores = [(eid, memory._jaccard(tokens, e.tokens)) for eid, e in memory._entries.items()]
+    return sorted(scores, key=lambda s: s[1], reverse=True)[:limit]
+
+
+@benchmark("search")
+def bench_search(sizes: Sequence[int]) -> None:
+    """Indexed :meth:`Memory.search` latency against a full scan."""
+    print(f"{'entries':>10} {'indexed ms':>11} {'scan ms':>9}")
+    for n in sizes:
+        memory = build(n)
+        queries = list(corpus(20, words_per_entry=2, seed=1))
+        indexed = timed(lambda: [memory.search(q) for q in queries], 1) / len(queries)
+        scan = "-"
+        if n <= 100_000:
+            scan = f"{timed(lambda: [_scan(memory, q) for q in queries[:3]], 1) / 3:9.2f}"
+        print(f"{n:>10} {indexed:>11.3f} {scan:>9}")
+
+
+@benchmark("topk")
+def bench_topk(sizes: Sequence[int]) -> None:
+    """MaxScore top-k :meth:`Memory.search` against exhaustive scoring."""
+    print(f"{'entries':>10} {'top-k ms':>9} {'exhaustive ms':>14} {'first hit ms':>13}")
+    for n in sizes:
+        memory = build(n, zipf=True)
+        queries = list(corpus(50, words_per_entry=4, seed=4, zipf=True))
+        topk = timed(lambda: [memory.search(q) for q in queries], 3) / len(queries)
+        full = timed(lambda: [memory.search(q, exhaustive=True) for q in queries], 3) / len(queries)
+        first = timed(lambda: [next(memory.iter_search(q, 100)) for q in queries], 3) / len(queries)
+        print(f"{n:>10} {topk:>9.3f} {full:>14.3f} {first:>13.3f}")
+
+
+@benchmark("cache")
+def bench_cache(sizes: Sequence[int]) -> None:
+    """Repeated-query latency with and without the result cache."""
+    rng = random.Random(5)
+    print(f"{'entries':>10} {'uncached ms':>12} {'cached ms':>10} {'hit rate':>9}")
+    for n in sizes:
+        hot = list(corpus(20, words_per_entry=3, seed=5, zipf=True))
+        traffic = [rng.choice(hot) for _ in range(500)]
+        row = []
+        for cache_size in (0, 256):
+            memory = Memory(cache_size=cache_size)
+            memory.add_many(corpus(n, zipf=True))
+            row.append(timed(lambda: [memory.search(q) for q in traffic], 1) / len(traffic))
+        stats = memory.cache_stats()
+        rate = stats["hits"] / (stats["hits"] + stats["misses"])
+        print(f"{n:>10} {row[0]:>12.3f} {row[1]:>10.4f} {rate:>9.2%}")
+
+
+@benchmark("eviction")
+def bench_eviction(sizes: Sequence[int]) -> None:
+    """Insert throughput of an unbounded store versus one capped at 10%."""
+    print(f"{'entries':>10} {'policy':>8} {'ms/1k adds':>11} {'evictions':>10} {'MiB est':>8}")
+    for n in sizes:
+        texts = list(corpus(n, zipf=True))
+        for policy in (None, "lru", "lfu", "oldest"):
+            memory = Memory(cache_size=0) if policy is None else Memory(
+                cache_size=0, max_entries=max(1, n // 10), eviction=policy
+            )
+            ms = timed(lambda: memory.add_many(texts), 1)
+            stats = memory.capacity_stats()
+            print(
+                f"{n:>10} {policy or '-':>8} {ms * 1000 / n:>11.2f} "
+                f"{stats['evictions']:>10} {stats['bytes'] / 2**20:>8.1f}"
+            )
+
+
+@benchmark("namespaces")
+def bench_namespaces(sizes: Sequence[int]) -> None:
+    """Search latency of one tenant in a shared store versus its namespace."""
+    print(f"{'entries':>10} {'tenants':>8} {'shared ms':>10} {'namespace ms':>13}")
+    for n in sizes:
+        tenants = 100
+        shared = Memory(cache_size=0)
+        split = Memory(cache_size=0)
+        for i, text in enumerate(corpus(n, zipf=True)):
+            shared.add(f"tenant{i % tenants} {text}")
+            split.add(text, namespace=f"tenant{i % tenants}")
+        query = "tenant7 " + next(corpus(1, seed=3))
+        ms_shared = timed(lambda: shared.search(query, 10), 20)
+        ms_split = timed(lambda: split.search(query, 10, namespace="tenant7"), 20)
+        print(f"{n:>10} {tenants:>8} {ms_shared:>10.2f} {ms_split:>13.2f}")
+
+
+@benchmark("similar")
+def bench_similar(sizes: Sequence[int]) -> None:
+    """LSH :meth:`Memory.find_similar` latency and recall against exact mode."""
+    rng = random.Random(2)
+    print(f"{'entries':>10} {'lsh ms':>8} {'exact ms':>9} {'recall':>7}")
+    for n in sizes:
+        memory = build(n)
+        queries = []
+        for _ in range(10):
+            words = memory.get(rng.randrange(n)).split()
+            words[rng.randrange(len(words))] = "typo"
+            queries.append(" ".join(words))
+        memory.find_similar(queries[0])  # build the index outside the timing
+        lsh = timed(lambda: [memory.find_similar(q) for q in queries], 1) / len(queries)
+        exact_hits = [set(memory.find_similar(q, exact=True)) for q in queries]
+        exact = timed(lambda: memory.find_similar(queries[0], exact=True), 1)
+        found = sum(len(set(memory.find_similar(q)) & hits) for q, hits in zip(queries, exact_hits))
+        total = sum(len(hits) for hits in exact_hits)
+        print(f"{n:>10} {lsh:>8.2f} {exact:>9.2f} {found / total if total else 1.0:>7.3f}")
+
+
+@benchmark("semantic")
+def bench_semantic(sizes: Sequence[int]) -> None:
+    """Recall@10 and latency of :meth:`Memory.search_semantic` per ``ef``."""
+    from operator import mul
+
+    from nlp.thought_vectorizer import hash_vectorize
+
+    print(f"{'entries':>10} {'build s':>8} {'ef':>5} {'recall':>7} {'ms/query':>9}")
+    for n in sizes:
+        memory = build(n)
+        queries = list(corpus(50, words_per_entry=3, seed=9))
+        start = time.perf_counter()
+        memory.search_semantic(queries[0])
+        built = time.perf_counter() - start
+        vectors = {eid: hash_vectorize(text) for eid, text in memory.snapshot().items()}
+        truth = []
+        for query in queries:
+            q = hash_vectorize(query)
+            scores = ((sum(map(mul, v, q)), eid) for eid, v in vectors.items())
+            truth.append({eid for _, eid in heapq.nlargest(10, scores)})
+        for ef in (10, 32, 100, 300):
+            found = []
+            ms = timed(lambda: found.extend(memory.search_semantic(q, 10, ef=ef) for q in queries), 1)
+            hits = sum(len(t & {eid for eid, _ in f}) for t, f in zip(truth, found))
+            print(f"{n:>10} {built:>8.1f} {ef:>5} {hits / (10 * len(queries)):>7.2%} {ms / len(queries):>9.2f}")
+
+
+@benchmark("autosave")
+def bench_autosave(sizes: Sequence[int]) -> None:
+    """Ingestion throughput with full-rewrite autosave against the journal."""
+    print(f"{'entries':>10} {'rewrite/s':>10} {'journal/s':>10}")
+    for n in sizes:
+        texts = list(corpus(n))
+        rates = []
+        for journal in (False, True):
+            if not journal and n > 5_000:
+                rates.append("-")
+                continue
+            with tempfile.TemporaryDirectory() as tmp:
+                memory = Memory(Path(tmp) / "memory.json", journal=journal)
+                start = time.perf_counter()
+                for text in texts:
+                    memory.add(text)
+                memory.close()
+                rates.append(f"{n / (time.perf_counter() - start):.0f}")
+        print(f"{n:>10} {rates[0]:>10} {rates[1]:>10}")
+
+
+@benchmark("backup")
+def bench_backup(sizes: Sequence[int]) -> None:
+    """Backup time, size and event-loop lag: full versus 1% changed.
+
+    The ``json`` row is a synchronous :func:`save_json` called on the loop,
+    which therefore lags for the whole write.
+    """
+    print(f"{'entries':>10} {'kind':>8} {'seconds':>8} {'loop lag ms':>12} {'KiB':>9}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            memory = build(n)
+            manager = BackupManager(memory, tmp, full_every=10)
+            start = time.perf_counter()
+            save_json(Path(tmp) / "memory.json", dict(memory.snapshot()))
+            elapsed = time.perf_counter() - start
+            size = (Path(tmp) / "memory.json").stat().st_size / 1024
+            print(f"{n:>10} {'json':>8} {elapsed:>8.2f} {elapsed * 1000:>12.1f} {size:>9.0f}")
+            for changed in (0, n // 100, 0):  # the first run is always full
+                for i in range(changed):
+                    memory.update(i * 100 % n, f"changed {i}")
+                report = asyncio.run(manager.backup())
+                print(
+                    f"{n:>10} {report['kind']:>8} {report['seconds']:>8.2f} "
+                    f"{report['loop_lag'] * 1000:>12.1f} {report['bytes'] / 1024:>9.0f}"
+                )
+            _, report = restore(tmp)
+            print(
+                f"{n:>10} {'restore':>8} {report['seconds']:>8.2f} {'-':>12} "
+                f"{report['bytes'] / 1024:>9.0f}  {report['records_per_second']:.0f} records/s"
+            )
+
+
+@benchmark("codecs")
+def bench_codecs(sizes: Sequence[int]) -> None:
+    """Encode/decode time and size of every installed codec on real payloads.
+
+    Shapes: a Memory snapshot (id -> text), a productivity task list and GUI
+    preferences.  ``stream`` rows write the snapshot with
+    :func:`~utils.json_handler.write_json_object` instead of building it.
+    """
+    print(f"{'entries':>10} {'payload':>9} {'codec':>8} {'dump ms':>8} {'load ms':>8} {'KiB':>8}")
+    for n in sizes:
+        texts = list(corpus(n))
+        payloads = {
+            "snapshot": {i: text for i, text in enumerate(texts)},
+            "tasks": [
+                {"id": i, "title": text, "done": i % 3 == 0, "tags": text.split()[:2]}
+                for i, text in enumerate(texts)
+            ],
+            "prefs": {"theme": "dark", "voice_enabled": True, "language": "en"},
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "payload"
+            for payload, data in payloads.items():
+                repeat = 1 if payload != "prefs" else 1000
+                for codec in sorted(CODECS):
+                    dump = timed(lambda: save_json(path, data, codec=codec), repeat)
+                    load = timed(lambda: load_json(path), repeat)
+                    size = path.stat().st_size / 1024
+                    print(f"{n:>10} {payload:>9} {codec:>8} {dump:>8.2f} {load:>8.2f} {size:>8.1f}")
+            items = payloads["snapshot"].items()
+            for codec in sorted(c for c in CODECS if CODECS[c].json):
+                dump = timed(lambda: write_json_object(path, items, codec=codec), 1)
+                print(f"{n:>10} {'stream':>9} {codec:>8} {dump:>8.2f} {'-':>8} {path.stat().st_size / 1024:>8.1f}")
+
+
+@benchmark("batch")
+def bench_batch(sizes: Sequence[int]) -> None:
+    """Per-query time of :meth:`Memory.search_many` against looped searches."""
+    print(f"{'entries':>10} {'loop ms':>8} {'jaccard ms':>11} {'tfidf ms':>9}")
+    for n in sizes:
+        memory = build(n)
+        queries = list(corpus(200, words_per_entry=3, seed=3))
+        loop = timed(lambda: [memory.search(q) for q in queries], 1) / len(queries)
+        memory.search_many(queries[:1], weighting="tfidf")  # warm cached norms
+        jaccard = timed(lambda: memory.search_many(queries), 1) / len(queries)
+        tfidf = timed(lambda: memory.search_many(queries, weighting="tfidf"), 1) / len(queries)
+        print(f"{n:>10} {loop:>8.3f} {jaccard:>11.3f} {tfidf:>9.3f}")
+
+
+@benchmark("sharded")
+def bench_sharded(sizes: Sequence[int]) -> None:
+    """Speedup of :class:`ShardedMemory` over one store, up to the core count."""
+    cores = os.cpu_count() or 1
+    counts = sorted({1, cores} | {2**i for i in range(1, cores.bit_length()) if 2**i <= cores})
+    queries = list(corpus(200, words_per_entry=3, seed=3))
+    scan_pattern = r"(\w+ ){8}\w+"  # no literal trigrams: scans every entry
+    print(f"{cores} cores")
+    print(f"{'entries':>10} {'shards':>7} {'batch ms':>9} {'regex ms':>9} {'speedup':>8}")
+    for n in sizes:
+        memory = build(n)
+        base = timed(lambda: memory.search_many(queries), 1)
+        regex = timed(lambda: memory.search_regex(scan_pattern), 1)
+        print(f"{n:>10} {'-':>7} {base:>9.1f} {regex:>9.1f} {1:>8.2f}")
+        for shards in counts:
+            with ShardedMemory(shards=shards) as sharded:
+                sharded.add_many(corpus(n))
+                batch = timed(lambda: sharded.search_many(queries), 1)
+                scan = timed(lambda: sharded.search_regex(scan_pattern), 1)
+            speedup = (base + regex) / (batch + scan)
+            print(f"{n:>10} {shards:>7} {batch:>9.1f} {scan:>9.1f} {speedup:>8.2f}")
+
+
+@benchmark("backend")
+def bench_backend(sizes: Sequence[int]) -> None:
+    """Throughput of the in-memory store against the SQLite FTS5 backend."""
+    queries = list(corpus(200, words_per_entry=3, seed=3))
+    print(f"{'entries':>10} {'backend':>8} {'bulk/s':>9} {'add/s':>7} {'search/s':>9} {'regex/s':>8}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            for backend in ("memory", "sqlite"):
+                memory = Memory(backend=backend, db_path=Path(tmp) / "memory.db", cache_size=0)
+                bulk = timed(lambda: memory.add_many(corpus(n)), 1)
+                singles = list(corpus(200, seed=1))
+                add = timed(lambda: [memory.add(t) for t in singles], 1)
+                search = timed(lambda: [memory.search(q) for q in queries], 1)
+                regex = timed(lambda: [memory.search_regex(p) for p in ("a[a-z]+e ", "^ra")], 1)
+                print(
+                    f"{n:>10} {backend:>8} {n / bulk * 1000:>9.0f} {len(singles) / add * 1000:>7.0f} "
+                    f"{len(queries) / search * 1000:>9.0f} {2 / regex * 1000:>8.1f}"
+                )
+
+
+@benchmark("regex")
+def bench_regex(sizes: Sequence[int]) -> None:
+    """Trigram-filtered :meth:`Memory.search_regex` against a full scan."""
+    import re
+
+    print(f"{'entries':>10} {'indexed ms':>11} {'scan ms':>9} {'selectivity':>12}")
+    for n in sizes:
+        memory = build(n)
+        words = memory.get(n // 2).split()
+        pattern = f"{words[0]} {words[1]}|{words[2]}.*{words[3]}"
+        _, stats = memory.search_regex(pattern, with_stats=True)  # builds the index untimed
+        indexed = timed(lambda: memory.search_regex(pattern), 5)
+        regex = re.compile(pattern)
+        scan = timed(lambda: [e for e, v in memory._entries.items() if regex.search(v.text)], 1)
+        print(f"{n:>10} {indexed:>11.3f} {scan:>9.2f} {stats['selectivity']:>12.5f}")
+
+
+def _child(target: Callable[..., object], args: tuple, queue) -> None:
+    start = time.perf_counter()
+    result = target(*args)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is reported in KiB on Linux.
+    queue.put((result, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def in_fresh_process(target: Callable[..., object], *args) -> tuple:
+    """Run ``target(*args)`` in a spawned interpreter.
+
+    Returns ``(result, seconds, peak_rss_mib)`` so memory figures are not
+    polluted by the benchmark driver itself.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    child = ctx.Process(target=_child, args=(target, args, queue))
+    child.start()
+    outcome = queue.get()
+    child.join()
+    return outcome
+
+
+def _load(path: str) -> int:
+    memory = Memory()
+    memory.load(path)
+    return len(memory)
+
+
+@benchmark("load")
+def bench_load(sizes: Sequence[int]) -> None:
+    """Bulk :meth:`Memory.load` time and peak RSS in a fresh interpreter.
+
+    ``mmap`` opens a :mod:`data.memory_snapshot` file; its time is the cold
+    start before the first query, as entries are decoded on access.
+    """
+    print(f"{'entries':>10} {'format':>6} {'seconds':>8} {'peak MiB':>9} {'file MiB':>9}")
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            for suffix in (".json", ".jsonl", ".mmap"):
+                path = Path(tmp) / f"memory{suffix}"
+                if suffix == ".mmap":
+                    write_snapshot(path, enumerate(corpus(n)), n)
+                else:
+                    with open(path, "w", encoding="utf-8") as f:
+                        if suffix == ".json":
+                            f.write("{")
+                            for i, text in enumerate(corpus(n)):
+                                f.write(f'{"," if i else ""}"{i}": {json.dumps(text)}')
+                            f.write("}")
+                        else:
+                            f.writelines(json.dumps(text) + "\n" for text in corpus(n))
+                count, elapsed, peak = in_fresh_process(_load, str(path))
+                size = path.stat().st_size / 2**20
+                print(f"{count:>10} {suffix[1:]:>6} {elapsed:>8.2f} {peak:>9.1f} {size:>9.1f}")
+
+
+def _footprint(n: int, compact: bool) -> float:
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    memory = Memory(compact=compact)
+    memory.add_many(corpus(n))
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024
+
+
+@benchmark("footprint")
+def bench_footprint(sizes: Sequence[int]) -> None:
+    """Resident memory growth of default against compact entries."""
+    print(f"{'entries':>10} {'default MiB':>12} {'compact MiB':>12}")
+    for n in sizes:
+        default = in_fresh_process(_footprint, n, False)[0]
+        compact = in_fresh_process(_footprint, n, True)[0]
+        print(f"{n:>10} {default:>12.1f} {compact:>12.1f}")
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.name](args.sizes)
+
+
+if __name__ == "__main__":
+    main()
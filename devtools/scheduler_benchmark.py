@@ -0,0 +1,205 @@
+"""Micro benchmarks for :class:`scheduler.Scheduler`.
+
+Each run happens in a fresh interpreter (see
+:func:`devtools.memory_benchmark.in_fresh_process`) so peak RSS reflects the
+scheduler alone.
+
+Example
+-------
+$ python -m devtools.scheduler_benchmark jobs --sizes 1000 100000
+$ python -m devtools.scheduler_benchmark drift --sizes 100
+$ python -m devtools.scheduler_benchmark lag --sizes 5
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import resource
+import time
+from typing import Callable, Dict, Sequence
+
+from devtools.memory_benchmark import in_fresh_process
+from scheduler import Scheduler
+
+BENCHMARKS: Dict[str, Callable[[Sequence[int]], None]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark under *name* for the command line runner."""
+
+    def decorator(func: Callable[[Sequence[int]], None]):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+async def _noop() -> None:
+    pass
+
+
+async def _legacy(interval: float, coro_func, delay: float) -> None:
+    """The former design: one sleeping task per job."""
+    await asyncio.sleep(delay)
+    while True:
+        await coro_func()
+        await asyncio.sleep(interval)
+
+
+def _rss_mib() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+def _idle(n: int, mode: str, window: float) -> tuple:
+    """Schedule *n* jobs and measure the first *window* seconds.
+
+    Jobs have 60-600 s periods and first runs spread over the first 60 s,
+    like per-user reminders.  Returns ``(schedule_seconds, cpu_seconds,
+    rss_mib)`` where CPU covers the window and RSS is measured at its end.
+    """
+    rng = random.Random(0)
+
+    async def main() -> tuple:
+        start = time.perf_counter()
+        if mode == "heap":
+            scheduler = Scheduler()
+            for i in range(n):
+                scheduler.schedule(
+                    rng.uniform(60, 600), _noop, name=f"job-{i}", delay=rng.uniform(0, 60)
+                )
+        else:
+            tasks = [
+                asyncio.create_task(_legacy(rng.uniform(60, 600), _noop, rng.uniform(0, 60)))
+                for _ in range(n)
+            ]
+        scheduled = time.perf_counter() - start
+        cpu = time.process_time()
+        await asyncio.sleep(window)
+        cpu = time.process_time() - cpu
+        rss = _rss_mib()
+        if mode == "heap":
+            scheduler.stop()
+        else:
+            for task in tasks:
+                task.cancel()
+        return scheduled, cpu, rss
+
+    return asyncio.run(main())
+
+
+@benchmark("jobs")
+def bench_jobs(sizes: Sequence[int]) -> None:
+    """Memory and CPU of N periodic jobs: one task per job versus the timer heap."""
+    window = 10.0
+    print(f"{'jobs':>10} {'mode':>6} {'schedule s':>11} {'cpu s/10s':>10} {'RSS MiB':>8}")
+    for n in sizes:
+        for mode in ("tasks", "heap"):
+            (scheduled, cpu, rss), _, _ = in_fresh_process(_idle, n, mode, window)
+            print(f"{n:>10} {mode:>6} {scheduled:>11.2f} {cpu:>10.2f} {rss:>8.1f}")
+
+
+def _drift(runs: int, interval: float, work: float, **options) -> tuple:
+    """Run a job taking *work* seconds *runs* times and compare with the grid.
+
+    Returns ``(drift, max_deviation)``: how far the last start lies behind
+    ``first + (runs - 1) * interval`` and the largest deviation from the
+    planned fire time the scheduler recorded.
+    """
+
+    async def main() -> tuple:
+        starts: list[float] = []
+        done = asyncio.Event()
+
+        async def job() -> None:
+            starts.append(time.monotonic())
+            if len(starts) == runs:
+                done.set()
+            time.sleep(work)
+
+        scheduler = Scheduler()
+        task = scheduler.schedule(interval, job, name="job", **options)
+        await done.wait()
+        scheduler.stop()
+        return starts[-1] - starts[0] - (runs - 1) * interval, task.max_deviation
+
+    return asyncio.run(main())
+
+
+@benchmark("drift")
+def bench_drift(sizes: Sequence[int]) -> None:
+    """Drift of a 50 ms job running every 100 ms: fixed delay versus fixed rate."""
+    modes = {
+        "fixed delay": {"fixed_rate": False},
+        "fixed rate": {},
+        "rate+jitter": {"jitter": 0.02},
+    }
+    print(f"{'runs':>10} {'mode':>12} {'drift ms':>9} {'max dev ms':>11}")
+    for n in sizes:
+        for mode, options in modes.items():
+            drift, deviation = _drift(n, 0.1, 0.05, **options)
+            print(f"{n:>10} {mode:>12} {drift * 1000:>9.1f} {deviation * 1000:>11.1f}")
+
+
+def _cpu_job() -> None:
+    sum(i * i for i in range(1_000_000))
+
+
+def _io_job() -> None:
+    time.sleep(0.1)
+
+
+def _lag(seconds: int, job: Callable[[], None], executor: str | None) -> tuple:
+    """Probe event loop lag for *seconds* while *job* runs every 200 ms.
+
+    A probe sleeps 10 ms in a loop; lag is how much later than asked it
+    wakes up.  Returns ``(p50, max)`` in seconds.
+    """
+
+    async def main() -> tuple:
+        lags: list[float] = []
+        scheduler = Scheduler()
+        if executor is None:
+            async def run() -> None:
+                job()
+
+            scheduler.schedule(0.2, run, name="job")
+        else:
+            scheduler.schedule(0.2, job, name="job", executor=executor)
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            start = time.monotonic()
+            await asyncio.sleep(0.01)
+            lags.append(time.monotonic() - start - 0.01)
+        scheduler.stop()
+        lags.sort()
+        return lags[len(lags) // 2], lags[-1]
+
+    return asyncio.run(main())
+
+
+@benchmark("lag")
+def bench_lag(sizes: Sequence[int]) -> None:
+    """Event loop lag while a blocking job runs on the loop, a thread or a process."""
+    print(f"{'seconds':>8} {'job':>4} {'executor':>9} {'p50 lag ms':>11} {'max lag ms':>11}")
+    for n in sizes:
+        for kind, job in (("cpu", _cpu_job), ("io", _io_job)):
+            for executor in (None, "thread", "process"):
+                p50, worst = _lag(n, job, executor)
+                print(
+                    f"{n:>8} {kind:>4} {executor or 'loop':>9} "
+                    f"{p50 * 1000:>11.2f} {worst * 1000:>11.2f}"
+                )
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("name", choices=sorted(BENCHMARKS))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.name](args.sizes)
+
+
+if __name__ == "__main__":
+    main()
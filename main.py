@@ -35,7 +35,8 @@ async def main() -> None:
     except KeyboardInterrupt:
         print("\nExiting...")
 
-    # Backup once more on exit
+    # Let an in-flight backup finish, then back up once more on exit
+    await scheduler.shutdown(timeout=30)
     await backup_manager.backup()
 
 
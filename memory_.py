@@ -19,13 +19,41 @@ Example
 """
 from __future__ import annotations
 
+import functools
+import heapq
+import logging
+import re
+import sys
+import threading
+from array import array
 from collections import Counter
 from difflib import SequenceMatcher
 from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Tuple
+from types import MappingProxyType
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Mapping, MutableMapping, Sequence, Set, Tuple, TypeVar,
+)
 
-from utils.json_handler import load_json, save_json
+from config.settings import settings
+from data.ann_index import HNSWIndex
+from data.cache_manager import CacheManager
+from data.eviction import ColdTier, PolicySpec, make_policy, policy_factory
+from data.memory_index import (
+    InvertedIndex,
+    MinHashLSH,
+    TokenVocabulary,
+    TrigramIndex,
+    regex_trigram_query,
+    trigram_count,
+)
+from data.memory_journal import MemoryJournal, journal_paths, meta_path, replay
+from data.memory_snapshot import MemorySnapshot, SnapshotEntries, SnapshotIndex, write_snapshot
+from data.sqlite_store import SQLiteStore
+from data.vector_engine import WEIGHTINGS, VectorEngine
+from utils.json_handler import iter_json_items, iter_jsonl, write_json_object, write_jsonl
+from utils.rw_lock import ReadWriteLock
 
 # Basic synonym mapping used by :meth:`search_synonyms` to broaden token
 # queries. This keeps the module self-contained while demonstrating how a more
@@ -39,6 +67,51 @@ SYNONYMS: dict[str, list[str]] = {
     "car": ["automobile", "vehicle"],
 }
 
+VOCABULARY = TokenVocabulary()
+"""Token ids of :class:`CompactEntry` itself; stores bind their own, see
+:meth:`CompactEntry.bind`."""
+
+# Rough cost of one posting slot in the inverted index, used by the
+# ``footprint`` estimates of the entry classes.
+_POSTING_BYTES = 100
+
+# File suffix selecting the memory-mapped snapshot format in save/load.
+SNAPSHOT_SUFFIX = ".mmap"
+
+# Namespace names double as file names in ``namespace_dir``.
+_NAMESPACE = re.compile(r"\w[\w.-]*")
+
+def _is_jsonl(path: Path) -> bool:
+    """Return whether *path* names a (possibly gzipped) JSON Lines file."""
+    return path.name.endswith((".jsonl", ".jsonl.gz"))
+
+
+def _record_text(record: Any) -> str:
+    """Return the entry text of a persisted *record*."""
+    return record["text"] if isinstance(record, dict) else record
+
+
+def _read_texts(path: Path) -> List[str]:
+    """Parse every entry text of the JSON or JSON Lines file at *path*.
+
+    Raises before returning anything when the file is missing, malformed or
+    holds a non-string text, so callers can parse before replacing data.
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"no memory file at {path}")
+    if _is_jsonl(path):
+        records = iter_jsonl(path)
+    else:
+        records = (v for _, v in iter_json_items(path))
+    texts = []
+    for record in records:
+        text = _record_text(record)
+        if not isinstance(text, str):
+            raise TypeError(f"entry text in {path} must be str, not {type(text).__name__}")
+        texts.append(text)
+    return texts
+
+
 @dataclass
 class MemoryEntry:
     """Represents a single memory record."""
@@ -49,6 +122,104 @@ class MemoryEntry:
     def __post_init__(self) -> None:
         self.tokens = Counter(self.text.lower().split())
 
+    def footprint(self) -> int:
+        """Return an estimate of the bytes held for this entry."""
+        tokens = self.tokens
+        return sys.getsizeof(self.text) + sys.getsizeof(tokens) + _POSTING_BYTES * len(tokens)
+
+
+class CompactEntry:
+    """Memory record storing its token counts as packed integer pairs.
+
+    Tokens are interned in the class's :attr:`vocabulary` and kept in one
+    ``array('I')`` of alternating token id / count values, avoiding the
+    per-entry ``__dict__`` and ``Counter`` of :class:`MemoryEntry`.
+    """
+
+    __slots__ = ("text", "_packed")
+
+    vocabulary: TokenVocabulary = VOCABULARY
+
+    @classmethod
+    def bind(cls, vocabulary: TokenVocabulary) -> type:
+        """Return a subclass interning its tokens in *vocabulary*.
+
+        Each compact :class:`Memory` binds a vocabulary of its own, so it is
+        released with the store instead of growing for the whole process.
+        """
+        return type(cls.__name__, (cls,), {"__slots__": (), "vocabulary": vocabulary})
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        packed = array("I")
+        intern = self.vocabulary.id
+        for token, count in Counter(text.lower().split()).items():
+            packed.append(intern(token))
+            packed.append(count)
+        self._packed = packed
+
+    @property
+    def tokens(self) -> Counter[str]:
+        """Decode the token counts into a :class:`~collections.Counter`."""
+        packed = self._packed
+        token = self.vocabulary.token
+        return Counter({token(packed[i]): packed[i + 1] for i in range(0, len(packed), 2)})
+
+    def footprint(self) -> int:
+        """Return an estimate of the bytes held for this entry."""
+        packed = self._packed
+        return sys.getsizeof(self.text) + sys.getsizeof(packed) + _POSTING_BYTES * (len(packed) // 2)
+
+
+_Method = TypeVar("_Method", bound=Callable[..., Any])
+
+
+def _reader(method: _Method) -> _Method:
+    """Run *method* holding the instance lock in shared mode."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.read():
+            return method(self, *args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+def _writer(method: _Method) -> _Method:
+    """Run *method* holding the instance lock exclusively."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.write():
+            try:
+                result = method(self, *args, **kwargs)
+            except BaseException:
+                if self._store is not None:
+                    self._store.rollback()
+                raise
+            if self._store is not None:
+                self._store.commit()
+            return result
+
+    return wrapper  # type: ignore[return-value]
+
+
+def _partitioned(method: _Method) -> _Method:
+    """Route calls passing ``namespace=`` to that namespace's :class:`Memory`.
+
+    The partition is resolved before any lock is taken, so namespaces never
+    contend on the default store's lock.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, namespace: str | None = None, **kwargs):
+        if namespace is not None:
+            return getattr(self.namespace(namespace), method.__name__)(*args, **kwargs)
+        return method(self, *args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
 class Memory:
     """Container for stored memory entries with optional autosave.
 
@@ -58,112 +229,636 @@ class Memory:
         When provided the memory contents will be written to this path every
         time an entry is changed.  This keeps disk state in sync with memory at
         the cost of extra I/O.
+    journal:
+        Autosave through an append-only :class:`~data.memory_journal.MemoryJournal`
+        next to *autosave_path* instead of rewriting the whole file.
+
+    compact:
+        Store entries as :class:`CompactEntry` objects to cut per-entry
+        memory; the public API is unchanged.
+    cache_size:
+        Number of :meth:`search`, :meth:`search_synonyms` and
+        :meth:`find_similar` results kept in an LRU cache; ``0`` disables it.
+    lsh_bands, lsh_rows:
+        Banding layout of the :class:`~data.memory_index.MinHashLSH` used by
+        :meth:`find_similar`.  More bands raise recall, more rows precision.
+    max_entries, max_bytes:
+        Capacity budget.  Once the entry count or the estimated footprint
+        (see :meth:`capacity_stats`) exceeds it, entries are evicted until it
+        fits again, never the one just written.  ``None`` means unbounded.
+    eviction:
+        ``"lru"`` (last read or search hit), ``"lfu"`` (search hit count),
+        ``"oldest"``, an :class:`~data.eviction.EvictionPolicy` instance, or
+        a policy class or factory.  Namespaces get their own policy: an
+        instance is copied empty for each of them.
+    cold_path:
+        Spill evicted entries to a :class:`~data.eviction.ColdTier` file
+        instead of dropping them; :meth:`get` and :meth:`search_cold` still
+        reach them there.  The file belongs to this store's contents: it is
+        kept when a SQLite database file is reopened (new ids then start past
+        the spilled ones) and reset otherwise, and by every load or restore.
+    embedder:
+        Callable turning text into a dense vector for :meth:`search_semantic`,
+        e.g. ``GGUFModel(path, embedding=True).embed``.  Defaults to
+        :func:`nlp.thought_vectorizer.hash_vectorize`.
+    backend, db_path:
+        ``"memory"`` keeps entries and indexes in Python structures,
+        ``"sqlite"`` in a :class:`~data.sqlite_store.SQLiteStore` at *db_path*
+        where token and regex searches run as SQL.  Every public mutation is
+        one committed transaction, and an existing database is reopened with
+        its entries.  Both default to :data:`config.settings.settings`
+        (``AIV1_MEMORY_BACKEND`` / ``AIV1_MEMORY_DB``).
+    namespace_dir, namespace_quota:
+        Directory holding one snapshot file per namespace, and the entry
+        quota enforced by eviction inside every namespace; see
+        :meth:`namespace`.
+
+    Token searches are served from an :class:`~data.memory_index.InvertedIndex`
+    kept in sync by every mutating method, so only entries sharing a token
+    with the query are scored.  The LSH index is built on the first
+    :meth:`find_similar` call and maintained incrementally afterwards.
+
+    Entries may be partitioned by passing ``namespace="name"`` to
+    :meth:`add`, :meth:`add_many`, :meth:`get`, :meth:`update`,
+    :meth:`remove`, :meth:`search`, :meth:`search_many` or
+    :meth:`search_regex`.  Each namespace is a separate :class:`Memory` with
+    its own ids, indexes and lock, so its queries never touch other
+    partitions.  Without ``namespace`` the calls act on the default store.
+
+    A :class:`~utils.rw_lock.ReadWriteLock` lets many threads search at once
+    while mutations run exclusively.  Code that needs to walk the whole store,
+    such as backups, should use :meth:`snapshot` rather than ``_entries``.
     """
 
-    def __init__(self, autosave_path: str | Path | None = None) -> None:
-        self._entries: Dict[int, MemoryEntry] = {}
+    def __init__(
+        self,
+        autosave_path: str | Path | None = None,
+        *,
+        journal: bool = False,
+        compact: bool = False,
+        cache_size: int = 256,
+        lsh_bands: int = 32,
+        lsh_rows: int = 2,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        eviction: PolicySpec = "lru",
+        cold_path: str | Path | None = None,
+        embedder: Callable[[str], Sequence[float]] | None = None,
+        backend: str | None = None,
+        db_path: str | Path | None = None,
+        namespace_dir: str | Path | None = None,
+        namespace_quota: int | None = None,
+    ) -> None:
+        self._entry_type = CompactEntry.bind(TokenVocabulary()) if compact else MemoryEntry
+        backend = backend or settings.memory_backend
+        self._store: SQLiteStore | None = None
+        if backend == "sqlite":
+            self._store = SQLiteStore(db_path or settings.memory_db)
+            self._entries = self._store.entries(self._entry_type)
+            self._index = self._store.index()
+        elif backend == "memory":
+            self._entries: Dict[int, MemoryEntry | CompactEntry] = {}
+            self._index = InvertedIndex()
+        else:
+            raise ValueError(f"unknown memory backend {backend!r}, expected 'memory' or 'sqlite'")
+        self._engine = VectorEngine(self._index)
+        self._generation = 0
+        self._lock = ReadWriteLock()
+        self._snapshot: Tuple[int, Mapping[int, str]] | None = None
+        self._cache = CacheManager(cache_size) if cache_size > 0 else None
+        self._cache_lock = threading.Lock()
+        self._lsh_params = (lsh_bands, lsh_rows)
+        self._lsh: MinHashLSH | None = None
+        self._trigrams: TrigramIndex | None = None
+        self._embedder = embedder
+        self._ann: HNSWIndex | None = None
+        # Serialises the lazy builds of the LSH, trigram and ANN indexes,
+        # which happen under the shared read lock.
+        self._build_lock = threading.Lock()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        bounded = max_entries is not None or max_bytes is not None
+        self._policy = make_policy(eviction) if bounded else None
+        self._policy_lock = threading.Lock()
+        self._cold = ColdTier(cold_path) if cold_path else None
+        self._bytes = 0
+        self._evictions = 0
+        self._spilled = 0
         self._next_id = 0
-        self._autosave: Path | None = Path(autosave_path) if autosave_path else None
+        if self._cold is not None and (self._store is None or not self._store.persistent):
+            self._cold.clear()  # spilled by an earlier store; ids would collide
+        if self._store is not None:
+            self._adopt_stored()
+        self._dirty: Set[int] | None = None  # see take_changes
+        self._namespaces: Dict[str, Memory] = {}
+        self._namespace_lock = threading.Lock()
+        self._namespace_dir = Path(namespace_dir) if namespace_dir else None
+        self._namespace_options = {
+            "compact": compact,
+            "cache_size": cache_size,
+            "lsh_bands": lsh_bands,
+            "lsh_rows": lsh_rows,
+            "max_entries": namespace_quota,
+            "eviction": policy_factory(eviction),
+            "embedder": embedder,
+            "backend": "memory",
+        }
+        self._autosave: Path | None = None
+        self._journal: MemoryJournal | None = None
+        if autosave_path:
+            self.enable_autosave(autosave_path, journal=journal)
 
+    @_partitioned
+    @_writer
     def add(self, text: str) -> int:
         """Add a new memory entry and return its identifier."""
-        entry = MemoryEntry(text)
         entry_id = self._next_id
-        self._entries[entry_id] = entry
+        self._insert(entry_id, text)
         self._next_id += 1
-        self._maybe_autosave()
+        self._evict(protect=entry_id)
+        self._changed("add", entry_id, text)
         return entry_id
 
+    @_partitioned
+    @_writer
+    def add_many(self, texts: Iterable[str]) -> range:
+        """Add every text of *texts* and return the block of assigned ids.
+
+        *texts* is consumed lazily and the store is persisted once at the end
+        rather than after every entry.
+        """
+        ids = self._ingest(texts)
+        if ids:
+            self._persist()
+        return ids
+
+    @_partitioned
+    @_reader
     def get(self, entry_id: int) -> str:
-        """Return the text for *entry_id* or raise ``KeyError``."""
-        return self._entries[entry_id].text
+        """Return the text for *entry_id* or raise ``KeyError``.
 
+        Entries evicted to the cold tier are read back from disk.
+        """
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            if self._cold is not None and entry_id in self._cold:
+                return self._cold.get(entry_id)
+            raise KeyError(entry_id)
+        self._touch((entry_id,))
+        return entry.text
+
+    @_partitioned
+    @_writer
     def update(self, entry_id: int, text: str) -> None:
         """Replace the text at *entry_id* with a new value."""
-        self._entries[entry_id] = MemoryEntry(text)
-        self._maybe_autosave()
+        entry = self._entry_type(text)  # fails before any index is touched
+        old = self._entries.get(entry_id)
+        if old is not None:
+            self._unindex(entry_id, old)
+        elif self._cold is not None:
+            self._cold.discard(entry_id)
+        self._insert(entry_id, text, entry)
+        self._evict(protect=entry_id)
+        self._changed("update", entry_id, text)
 
+    @_partitioned
+    @_writer
     def remove(self, entry_id: int) -> None:
         """Delete the entry identified by *entry_id* if present."""
-        self._entries.pop(entry_id, None)
-        self._maybe_autosave()
+        self._discard(entry_id)
+        self._changed("remove", entry_id)
 
+    @_writer
     def clear(self) -> None:
-        """Remove all stored entries."""
-        self._entries.clear()
-        self._next_id = 0
-        self._maybe_autosave()
+        """Remove all stored entries, including spilled ones."""
+        self._reset()
+        if self._cold is not None:
+            self._cold.clear()
+        self._changed("clear")
 
     # ------------------------------------------------------------------
     # Persistence helpers
     # ------------------------------------------------------------------
 
+    @_reader
     def save(self, path: str | Path) -> None:
-        """Serialise all entries to JSON at *path*."""
-        data = {eid: entry.text for eid, entry in self._entries.items()}
-        save_json(path, data)
+        """Stream all entries to *path* as one JSON object, atomically.
+
+        A ``.mmap`` suffix writes a binary :mod:`data.memory_snapshot` with
+        the token index included instead, and ``.jsonl`` / ``.jsonl.gz`` one
+        ``{"id": ..., "text": ...}`` record per line.
+        """
+        path = Path(path)
+        items = ((eid, entry.text) for eid, entry in self._entries.items())
+        if path.suffix == SNAPSHOT_SUFFIX:
+            write_snapshot(path, items, self._next_id)
+        elif _is_jsonl(path):
+            write_jsonl(path, ({"id": eid, "text": text} for eid, text in items))
+        else:
+            write_json_object(path, items)
 
+    @_writer
     def load(self, path: str | Path) -> None:
-        """Load entries from a JSON file."""
-        data = load_json(path)
-        self.clear()
-        for text in data.values():
-            self.add(text)
-
-    def enable_autosave(self, path: str | Path) -> None:
-        """Enable autosave to *path* for subsequent modifications."""
+        """Load entries from a JSON or JSON Lines file.
+
+        The file is parsed incrementally and bulk-inserted through the
+        :meth:`add_many` path, persisting once.  Parsing finishes before the
+        current contents are replaced, so a missing or malformed file raises
+        and leaves the store untouched.  ``.jsonl`` files, gzipped
+        when named ``.jsonl.gz``, hold one text (or ``{"text": ...}`` object)
+        per line.  When a journal, or the metadata of a folded one, exists
+        next to *path* the snapshot is replayed together with it, keeping
+        the original entry ids.
+
+        ``.mmap`` snapshots written by :meth:`save` are memory-mapped rather
+        than parsed: entries keep their ids and are decoded on first access,
+        so opening takes the same time whatever the store size.
+        """
+        path = Path(path)
+        if any(p.exists() for p in (*journal_paths(path), meta_path(path))):
+            self._replay(path)
+            return
+        if path.suffix == SNAPSHOT_SUFFIX:
+            self._open_snapshot(MemorySnapshot(path))
+            return
+        texts = _read_texts(path)
+        self._reset()
+        if self._cold is not None:
+            self._cold.clear()  # ids are reassigned below
+        if self._journal is not None:
+            self._journal.append("clear", sync=False)
+        self._ingest(texts)
+        self._persist()
+
+    @_writer
+    def restore(self, entries: Mapping[int, str], next_id: int | None = None) -> None:
+        """Replace the contents with *entries*, keeping their ids.
+
+        *next_id* defaults to one past the largest id.  This is how
+        :func:`backup.restore` rebuilds a store from backup segments.
+        """
+        if next_id is None:
+            next_id = max(entries, default=-1) + 1
+        self._restore(entries, next_id)
+
+    @_writer
+    def enable_autosave(self, path: str | Path, journal: bool = False) -> None:
+        """Enable autosave to *path* for subsequent modifications.
+
+        With ``journal=True`` modifications are appended to a write-ahead log
+        at ``<path>.wal`` that is periodically compacted into *path*.
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
         self._autosave = Path(path)
+        if journal:
+            self._journal = MemoryJournal(path)
+
+    def flush(self) -> None:
+        """Force pending journal records and transactions to disk."""
+        if self._journal is not None:
+            self._journal.sync()
+        if self._store is not None:
+            self._store.commit()
+
+    @_writer
+    def close(self) -> None:
+        """Flush the journal, wait for compaction and stop autosaving.
+
+        Loaded namespaces are paged out to ``namespace_dir`` when one is set.
+        """
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._autosave = None
+        if self._namespace_dir is not None:
+            for name in list(self._namespaces):
+                self.unload_namespace(name)
+
+    # ------------------------------------------------------------------
+    # Namespaces
+    # ------------------------------------------------------------------
+
+    def namespace(self, name: str) -> "Memory":
+        """Return the partition *name*, creating it on first use.
+
+        A partition paged out by :meth:`unload_namespace`, or left by an
+        earlier process, is mapped back in from its ``.mmap`` snapshot in
+        ``namespace_dir``.  Partitions share the constructor options of this
+        store except for persistence; ``namespace_quota`` becomes their
+        ``max_entries``.
+        """
+        path = self._namespace_path(name)
+        with self._namespace_lock:
+            child = self._namespaces.get(name)
+            if child is None:
+                child = Memory(**self._namespace_options)
+                if path is not None and path.exists():
+                    child.load(path)
+                self._namespaces[name] = child
+            return child
+
+    def namespaces(self) -> List[str]:
+        """Return the names of loaded and paged-out namespaces."""
+        names = set(self._namespaces)
+        if self._namespace_dir is not None and self._namespace_dir.is_dir():
+            names.update(p.stem for p in self._namespace_dir.glob(f"*{SNAPSHOT_SUFFIX}"))
+        return sorted(names)
+
+    def save_namespace(self, name: str, path: str | Path | None = None) -> None:
+        """Write namespace *name* to *path*, by default its ``namespace_dir`` file."""
+        target = path or self._namespace_path(name)
+        if target is None:
+            raise ValueError("no path given and namespace_dir is not set")
+        self.namespace(name).save(target)
 
-    def search_regex(self, pattern: str) -> List[int]:
-        """Return entry ids whose text matches the regex *pattern*."""
-        import re
+    def load_namespace(self, name: str, path: str | Path) -> None:
+        """Replace the contents of namespace *name* with the file at *path*."""
+        self.namespace(name).load(path)
 
+    def unload_namespace(self, name: str) -> None:
+        """Page namespace *name* out to ``namespace_dir`` and release it.
+
+        Callers must not keep using a :meth:`namespace` handle afterwards;
+        the next access maps the saved snapshot back in.
+        """
+        path = self._namespace_path(name)
+        if path is None:
+            raise ValueError("namespace_dir is not set")
+        with self._namespace_lock:
+            child = self._namespaces.pop(name, None)
+            if child is not None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                child.save(path)
+                child.close()
+
+    def drop_namespace(self, name: str) -> None:
+        """Delete namespace *name*, including its file in ``namespace_dir``."""
+        path = self._namespace_path(name)
+        with self._namespace_lock:
+            child = self._namespaces.pop(name, None)
+            if child is not None:
+                child.close()
+            if path is not None:
+                path.unlink(missing_ok=True)
+
+    def _namespace_path(self, name: str) -> Path | None:
+        if not _NAMESPACE.fullmatch(name):
+            raise ValueError(f"invalid namespace name {name!r}")
+        if self._namespace_dir is None:
+            return None
+        return self._namespace_dir / f"{name}{SNAPSHOT_SUFFIX}"
+
+    @_partitioned
+    @_reader
+    def search_regex(
+        self, pattern: str, *, with_stats: bool = False
+    ) -> List[int] | Tuple[List[int], Dict[str, Any]]:
+        """Return entry ids whose text matches the regex *pattern*.
+
+        Only entries containing every literal trigram the pattern requires
+        are matched.  With *with_stats* an ``(ids, stats)`` pair is returned
+        where ``stats`` tells how many entries that were: ``pattern``,
+        ``trigrams``, ``candidates``, ``entries``, ``selectivity`` and
+        ``full_scan``.
+        """
         regex = re.compile(pattern)
-        return [eid for eid, entry in self._entries.items() if regex.search(entry.text)]
+        candidates, stats = self._regex_candidates(regex)
+        if self._store is not None:
+            ids = self._store.filter_regex(pattern, candidates)
+        else:
+            scan = self._entries if candidates is None else candidates
+            ids = [eid for eid in scan if regex.search(self._entries[eid].text)]
+        self._touch(ids)
+        return (ids, stats) if with_stats else ids
 
-    def search(self, query: str, limit: int = 3) -> List[Tuple[int, float]]:
-        """Return entry ids sorted by similarity to the query."""
+    @_partitioned
+    @_reader
+    def search(
+        self, query: str, limit: int = 3, exhaustive: bool = False
+    ) -> List[Tuple[int, float]]:
+        """Return entry ids sorted by similarity to the query.
+
+        Entries without any shared token score ``0.0``; they only appear,
+        in insertion order, when fewer than *limit* entries match.  The top
+        entries are found with early-terminating MaxScore traversal;
+        ``exhaustive=True`` scores every matching entry instead and yields
+        the same ranking.
+        """
         query_tokens = Counter(query.lower().split())
-        scores = []
-        for entry_id, entry in self._entries.items():
-            score = self._jaccard(query_tokens, entry.tokens)
-            scores.append((entry_id, score))
-        return sorted(scores, key=lambda s: s[1], reverse=True)[:limit]
+        if exhaustive or limit < 0:
+            results = self._ranked(self._index.jaccard_scores(query_tokens), limit)
+        else:
+            results = self._cached(
+                ("search", tuple(sorted(query_tokens.elements())), limit),
+                lambda: self._ranked(dict(self._index.iter_top(query_tokens, limit)), limit),
+            )
+        self._touch_hits(results)
+        return results
 
+    def iter_search(self, query: str, limit: int = 3) -> Iterator[Tuple[int, float]]:
+        """Yield :meth:`search` results one by one as they are finalised.
+
+        Leading results are produced before the index traversal completes,
+        so callers that stop consuming early skip the remaining work.  The
+        read lock is taken for each step and released before yielding, so
+        the caller may write to the store while the generator is suspended;
+        a traversal invalidated by such a write is restarted, skipping the
+        ids already yielded.
+        """
+        query_tokens = Counter(query.lower().split())
+        emitted: Set[int] = set()
+        ranked: Iterator[Tuple[int, float]] | None = None
+        generation = -1
+        while len(emitted) < limit:
+            with self._lock.read():
+                if generation != self._generation:
+                    generation = self._generation
+                    ranked = self._index.iter_top(query_tokens, limit)
+                found = next((hit for hit in ranked if hit[0] not in emitted), None)
+                if found is None:
+                    zeros = (eid for eid in self._entries if eid not in emitted)
+                    rest = [(eid, 0.0) for eid in islice(zeros, limit - len(emitted))]
+                else:
+                    self._touch((found[0],))
+            if found is None:
+                yield from rest
+                return
+            emitted.add(found[0])
+            yield found
+
+    @_partitioned
+    @_reader
+    def search_many(
+        self, queries: Iterable[str], limit: int = 3, weighting: str = "jaccard"
+    ) -> List[List[Tuple[int, float]]]:
+        """Run :meth:`search` for every query of *queries* in one batch.
+
+        *weighting* is ``"jaccard"`` (the :meth:`search` score) or
+        ``"tfidf"`` (cosine of TF-IDF vectors).  With NumPy installed the
+        whole batch is scored by :class:`~data.vector_engine.VectorEngine`
+        array operations; otherwise each query takes the pure Python path.
+        """
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"unknown weighting {weighting!r}, expected one of {WEIGHTINGS}")
+        tokens = [Counter(query.lower().split()) for query in queries]
+        if self._engine.vectorized and self._store is None:
+            batch = self._engine.search_many(tokens, limit, weighting, self._generation)
+        elif weighting == "jaccard":
+            batch = [self._ranked(self._index.jaccard_scores(q), limit) for q in tokens]
+        else:
+            batch = [
+                self._ranked(self._engine.tfidf_scores(q, self._generation), limit) for q in tokens
+            ]
+        for results in batch:
+            self._touch_hits(results)
+        return batch
+
+    @_reader
     def search_synonyms(self, query: str, limit: int = 3) -> List[Tuple[int, float]]:
         """Search *query* expanding tokens with :data:`SYNONYMS`."""
         expanded = set(query.lower().split())
         for token in list(expanded):
             expanded.update(SYNONYMS.get(token, []))
-        scores: list[tuple[int, float]] = []
         query_tokens = Counter(expanded)
+        if limit < 0:
+            results = self._rank(self._index.jaccard_scores(query_tokens), limit)[:limit]
+        else:
+            results = self._cached(
+                ("synonyms", tuple(sorted(expanded)), limit),
+                lambda: list(self._index.iter_top(query_tokens, limit)),
+            )
+        self._touch_hits(results)
+        return results
+
+    @_reader
+    def find_similar(self, text: str, cutoff: float = 0.6, exact: bool = False) -> List[int]:
+        """Return ids of entries whose raw text is similar to ``text``.
+
+        Candidates come from the LSH index and are verified with the same
+        :class:`~difflib.SequenceMatcher` ratio *cutoff*.  ``exact=True``
+        compares against every entry instead, which is the reference for
+        measuring the recall of the index.
+        """
+        ids = self._cached(
+            ("similar", text.lower(), cutoff, exact),
+            lambda: self._find_similar(text, cutoff, exact),
+        )
+        self._touch(ids)
+        return ids
+
+    @_reader
+    def search_semantic(
+        self, query: str, limit: int = 3, ef: int | None = None
+    ) -> List[Tuple[int, float]]:
+        """Return ``(entry_id, cosine)`` pairs of entries closest in meaning.
+
+        Vectors come from the configured embedder and are searched with an
+        :class:`~data.ann_index.HNSWIndex` built on the first call and kept
+        in sync afterwards.  *ef* trades latency for recall; unlike
+        :meth:`search` results are not padded.
+        """
+        results = self._cached(
+            ("semantic", query, limit, ef),
+            lambda: self._semantic_index().search(self._embed(query), limit, ef),
+        )
+        self._touch(eid for eid, _ in results)
+        return results
+
+    @_reader
+    def save_semantic_index(self, path: str | Path) -> None:
+        """Persist the :meth:`search_semantic` graph to *path*."""
+        self._semantic_index().save(path)
+
+    @_writer
+    def load_semantic_index(self, path: str | Path) -> None:
+        """Restore a graph written by :meth:`save_semantic_index`.
+
+        Entries added or removed since it was saved are reconciled; texts
+        updated in place keep their saved vectors.
+        """
+        ann = HNSWIndex.load(path)
+        for entry_id in ann.ids():
+            if entry_id not in self._entries:
+                ann.remove(entry_id)
         for entry_id, entry in self._entries.items():
-            score = self._jaccard(query_tokens, entry.tokens)
-            if score:
-                scores.append((entry_id, score))
-        return sorted(scores, key=lambda s: s[1], reverse=True)[:limit]
+            if entry_id not in ann:
+                ann.add(entry_id, self._embed(entry.text))
+        self._ann = ann
+        self._generation += 1
+
+    def _embed(self, text: str) -> Sequence[float]:
+        if self._embedder is None:
+            from nlp.thought_vectorizer import hash_vectorize
+
+            self._embedder = hash_vectorize
+        return self._embedder(text)
+
+    def _semantic_index(self) -> HNSWIndex:
+        """Return the ANN index, building it on first use."""
+        if self._ann is None:
+            with self._build_lock:
+                if self._ann is None:
+                    ann = HNSWIndex()
+                    for eid, entry in self._entries.items():
+                        ann.add(eid, self._embed(entry.text))
+                    self._ann = ann
+        return self._ann
 
-    def find_similar(self, text: str, cutoff: float = 0.6) -> List[int]:
-        """Return ids of entries whose raw text is similar to ``text``."""
+    @_reader
+    def search_cold(self, query: str, limit: int = 3) -> List[Tuple[int, float]]:
+        """Search entries spilled to the cold tier by Jaccard similarity.
+
+        Only entries sharing a token with *query* are returned.  The cold
+        file is scanned sequentially, so this is much slower than
+        :meth:`search`.
+        """
+        if self._cold is None:
+            return []
+        return self._cold.search(Counter(query.lower().split()), limit)
+
+    def _find_similar(self, text: str, cutoff: float, exact: bool) -> List[int]:
+        if self._lsh is None and not exact:
+            with self._build_lock:
+                if self._lsh is None:
+                    # Built fully before publishing so concurrent readers
+                    # never see a half-filled index.
+                    lsh = MinHashLSH(*self._lsh_params)
+                    for eid, entry in self._entries.items():
+                        lsh.add(eid, entry.text)
+                    self._lsh = lsh
+        lsh = self._lsh
+        if exact or len(text) < lsh.shingle:
+            ids = list(self._entries)
+        else:
+            ids = sorted(lsh.candidates(text))
+        matcher = SequenceMatcher(None)
+        matcher.set_seq1(text.lower())
         result = []
-        for eid, entry in self._entries.items():
-            ratio = SequenceMatcher(None, text.lower(), entry.text.lower()).ratio()
-            if ratio >= cutoff:
+        for eid in ids:
+            matcher.set_seq2(self._entries[eid].text.lower())
+            if (
+                matcher.real_quick_ratio() >= cutoff
+                and matcher.quick_ratio() >= cutoff
+                and matcher.ratio() >= cutoff
+            ):
                 result.append(eid)
         return result
 
+    @_writer
     def remove_matching(self, pattern: str) -> int:
         """Remove all entries matching *pattern* and return the count."""
-        import re
-
-        regex = re.compile(pattern)
-        to_remove = [eid for eid, entry in self._entries.items() if regex.search(entry.text)]
+        to_remove = self.search_regex(pattern)
         for eid in to_remove:
-            self._entries.pop(eid, None)
-        if to_remove:
+            self._discard(eid)
+            if self._journal is not None:
+                self._journal.append("remove", eid)
+        if to_remove and self._journal is None:
             self._maybe_autosave()
         return len(to_remove)
 
+    @_reader
     def summarise(self, word_limit: int = 30) -> str:
         """Return a naive concatenated summary of stored entries."""
         pieces = []
@@ -184,13 +879,353 @@ class Memory:
 
     def __iter__(self):
         """Iterate over stored entry texts in insertion order."""
-        for entry_id in sorted(self._entries):
-            yield self._entries[entry_id].text
+        snapshot = self.snapshot()
+        for entry_id in sorted(snapshot):
+            yield snapshot[entry_id]
+
+    @_writer
+    def take_changes(self) -> Tuple[Dict[int, str | None] | None, int]:
+        """Return the entries changed since the previous call and reset them.
+
+        Returns ``(changes, next_id)``: *changes* maps every added, updated
+        or removed id to its current text, ``None`` once removed.  It is
+        ``None`` itself on the first call and after :meth:`clear` or
+        :meth:`load`, when only a full :meth:`snapshot` is accurate.
+        Tracking costs nothing until the first call, and the change set is
+        shared, so there should be a single consumer such as a backup job.
+        """
+        dirty = self._dirty
+        self._dirty = set()
+        if dirty is None:
+            return None, self._next_id
+        entries = self._entries
+        changes = {}
+        for entry_id in dirty:
+            entry = entries.get(entry_id)
+            changes[entry_id] = None if entry is None else entry.text
+        return changes, self._next_id
+
+    @_reader
+    def snapshot(self) -> Mapping[int, str]:
+        """Return an immutable ``{entry_id: text}`` view of the store.
+
+        Snapshots are copy-on-write per generation: the copy is taken once
+        after each batch of mutations and shared by every reader until the
+        next one, so iterating it never races with writers.
+        """
+        cached = self._snapshot
+        if cached is not None and cached[0] == self._generation:
+            return cached[1]
+        view = MappingProxyType({eid: entry.text for eid, entry in self._entries.items()})
+        self._snapshot = (self._generation, view)
+        return view
 
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
 
+    def capacity_stats(self) -> Dict[str, Any]:
+        """Return the capacity budget, footprint estimate and eviction counters.
+
+        ``bytes`` sums the :meth:`MemoryEntry.footprint` estimates of the
+        stored entries; it tracks growth rather than exact process memory.
+        """
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self._max_entries,
+            "max_bytes": self._max_bytes,
+            "evictions": self._evictions,
+            "spilled": self._spilled,
+            "cold_entries": len(self._cold) if self._cold is not None else 0,
+        }
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Return hit, miss and eviction counters of the result cache."""
+        if self._cache is None:
+            return {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "limit": 0}
+        with self._cache_lock:
+            return self._cache.stats()
+
+    def _cached(self, key: tuple, compute: Callable[[], list]) -> list:
+        """Return ``compute()`` memoised under *key* for this generation.
+
+        The store generation is part of the cache key, so any mutation makes
+        older results unreachable in O(1); they age out of the LRU naturally.
+        Callers get a copy so mutating a result cannot corrupt the cache.
+        """
+        cache = self._cache
+        if cache is None:
+            return compute()
+        key = (self._generation,) + key
+        with self._cache_lock:
+            result = cache.get(key)
+        if result is None:
+            result = compute()
+            with self._cache_lock:
+                cache.set(key, result)
+        return list(result)
+
+    def _ranked(self, scores: Dict[int, float], limit: int) -> List[Tuple[int, float]]:
+        """Rank *scores*, padding with zero-score entries up to *limit*."""
+        ranked = self._rank(scores, limit)
+        if limit < 0 or len(ranked) < limit:
+            zeros = ((eid, 0.0) for eid in self._entries if eid not in scores)
+            if limit < 0:
+                ranked.extend(zeros)
+            else:
+                ranked.extend(islice(zeros, limit - len(ranked)))
+        return ranked[:limit]
+
+    @staticmethod
+    def _rank(scores: Dict[int, float], limit: int) -> List[Tuple[int, float]]:
+        """Order *scores* by descending score, ties by ascending id.
+
+        Ids grow with insertion order, so the tie-break reproduces the stable
+        sort of a full scan over ``_entries``.
+        """
+        key = lambda s: (-s[1], s[0])  # noqa: E731
+        if 0 <= limit < len(scores):
+            return heapq.nsmallest(limit, scores.items(), key=key)
+        return sorted(scores.items(), key=key)
+
+    def _touch(self, ids: Iterable[int]) -> None:
+        """Report an access to *ids* to the eviction policy."""
+        policy = self._policy
+        if policy is not None:
+            with self._policy_lock:
+                for entry_id in ids:
+                    policy.touch(entry_id)
+
+    def _touch_hits(self, results: List[Tuple[int, float]]) -> None:
+        """Touch the entries of *results* that actually matched."""
+        if self._policy is not None:
+            self._touch(eid for eid, score in results if score > 0)
+
+    def _evict(self, protect: int | None = None) -> None:
+        """Evict entries other than *protect* until the budget is met.
+
+        Victims are spilled to the cold tier when one is configured and
+        journaled as removals, unsynced; the caller persists.
+        """
+        policy = self._policy
+        if policy is None:
+            return
+        while self._over_budget():
+            victim = policy.victim(protect)
+            if victim is None:
+                break
+            entry = self._entries.get(victim)
+            if entry is None:
+                continue
+            self._discard(victim)
+            self._evictions += 1
+            if self._cold is not None:
+                self._cold.append(victim, entry.text)
+                self._spilled += 1
+            if self._journal is not None:
+                self._journal.append("remove", victim, sync=False)
+
+    def _over_budget(self) -> bool:
+        if self._max_entries is not None and len(self._entries) > self._max_entries:
+            return True
+        return self._max_bytes is not None and self._bytes > self._max_bytes
+
+    def _discard(self, entry_id: int) -> None:
+        """Remove *entry_id* from storage and indexes without autosaving."""
+        entry = self._entries.pop(entry_id, None)
+        if entry is not None:
+            self._generation += 1
+            self._unindex(entry_id, entry)
+            if self._dirty is not None:
+                self._dirty.add(entry_id)
+            if self._policy is not None:
+                self._policy.remove(entry_id)
+        elif self._cold is not None:
+            self._cold.discard(entry_id)
+
+    def _unindex(self, entry_id: int, entry: MemoryEntry | CompactEntry) -> None:
+        """Remove *entry* from every index while leaving it stored."""
+        self._bytes -= entry.footprint()
+        self._index.remove(entry_id, entry.tokens)
+        if self._lsh is not None:
+            self._lsh.remove(entry_id)
+        if self._trigrams is not None:
+            self._trigrams.remove(entry_id, entry.text)
+        if self._ann is not None:
+            self._ann.remove(entry_id)
+
+    def _regex_candidates(self, regex: re.Pattern) -> Tuple[List[int] | None, Dict[str, Any]]:
+        """Return ids worth matching against *regex* and the scan stats.
+
+        The trigram index is built on first use.  Patterns without literal
+        trigrams (or bytes patterns) return ``None``, meaning every entry.
+        """
+        query = regex_trigram_query(regex.pattern, regex.flags) if isinstance(regex.pattern, str) else []
+        candidates = None
+        if query:
+            if self._trigrams is None:
+                with self._build_lock:
+                    if self._trigrams is None:
+                        if self._store is not None:
+                            trigrams = self._store.trigram_index()
+                        else:
+                            trigrams = TrigramIndex()
+                            for eid, entry in self._entries.items():
+                                trigrams.add(eid, entry.text)
+                        self._trigrams = trigrams
+            candidates = self._trigrams.evaluate(query)
+        ids = None if candidates is None else sorted(candidates)
+        total = len(self._entries)
+        scanned = total if ids is None else len(ids)
+        stats = {
+            "pattern": regex.pattern,
+            "trigrams": trigram_count(query),
+            "candidates": scanned,
+            "entries": total,
+            "selectivity": scanned / total if total else 0.0,
+            "full_scan": candidates is None,
+        }
+        logging.debug("Regex %r scans %d of %d entries", regex.pattern, scanned, total)
+        return ids, stats
+
+    def _adopt_stored(self) -> None:
+        """Account for entries already present in a reopened database."""
+        self._next_id = self._store.next_id()
+        if self._cold is not None:
+            self._next_id = max(self._next_id, self._cold.next_id)
+        for entry_id, entry in self._entries.items():
+            self._bytes += entry.footprint()
+            if self._policy is not None:
+                self._policy.add(entry_id)
+
+    def _open_snapshot(self, snapshot: MemorySnapshot) -> None:
+        """Serve entries from *snapshot*, keeping its ids.
+
+        The in-memory backend reads entries and postings straight from the
+        mapping; later changes live in an overlay.  ``capacity_stats()["bytes"]``
+        starts from the file size, since per-entry footprints would require
+        decoding every entry.
+        """
+        self._reset()
+        if self._cold is not None:
+            self._cold.clear()
+        if self._store is not None:
+            for entry_id, text in snapshot.items():
+                self._insert(entry_id, text)
+        else:
+            self._attach(SnapshotEntries(snapshot, self._entry_type), SnapshotIndex(snapshot))
+            self._bytes = snapshot.size
+            if self._policy is not None:
+                for entry_id in self._entries:
+                    self._policy.add(entry_id)
+        self._next_id = snapshot.next_id
+        self._evict()
+        if self._journal is not None:
+            self._journal.append("clear", sync=False)
+            for entry_id, entry in self._entries.items():
+                self._journal.append("add", entry_id, entry.text, sync=False)
+        self._persist()
+
+    def _attach(self, entries: MutableMapping[int, Any], index: Any) -> None:
+        """Swap the entry mapping and token index, e.g. for a snapshot overlay.
+
+        The lazy LSH, trigram and ANN indexes are dropped and rebuilt from
+        *entries* on first use.
+        """
+        self._entries = entries
+        self._index = index
+        self._engine.index = index
+        self._lsh = self._trigrams = self._ann = None
+
+    def _replay(self, path: str | Path) -> None:
+        """Restore snapshot plus journal at *path* without logging it again."""
+        entries, next_id = replay(path)
+        self._restore(entries, next_id, source=Path(path))
+
+    def _restore(self, entries: Mapping[int, str], next_id: int, source: Path | None = None) -> None:
+        """Replace the contents with *entries*, journaling unless read from *source*."""
+        self._reset()
+        if self._cold is not None:
+            self._cold.clear()
+        for entry_id in sorted(entries):
+            self._insert(entry_id, entries[entry_id])
+        self._next_id = next_id
+        self._evict()
+        if self._journal is not None and self._journal.path != source:
+            self._journal.append("clear", sync=False)
+            for entry_id in sorted(entries):
+                self._journal.append("add", entry_id, entries[entry_id], sync=False)
+            self._journal.sync()
+        elif self._journal is None:
+            self._maybe_autosave()
+
+    def _insert(
+        self, entry_id: int, text: str, entry: MemoryEntry | CompactEntry | None = None
+    ) -> MemoryEntry | CompactEntry:
+        """Store and index *text* (or its prebuilt *entry*) under *entry_id*
+        without persisting."""
+        self._generation += 1
+        entry = self._entries[entry_id] = entry if entry is not None else self._entry_type(text)
+        if self._dirty is not None:
+            self._dirty.add(entry_id)
+        self._bytes += entry.footprint()
+        if self._policy is not None:
+            self._policy.add(entry_id)
+        self._index.add(entry_id, entry.tokens)
+        if self._lsh is not None:
+            self._lsh.add(entry_id, text)
+        if self._trigrams is not None:
+            self._trigrams.add(entry_id, text)
+        if self._ann is not None:
+            self._ann.add(entry_id, self._embed(text))
+        return entry
+
+    def _ingest(self, texts: Iterable[str]) -> range:
+        """Insert *texts* under a contiguous id block, journaling unsynced."""
+        start = self._next_id
+        journal = self._journal
+        for text in texts:
+            entry_id = self._next_id
+            self._insert(entry_id, text)
+            self._next_id += 1
+            if journal is not None:
+                journal.append("add", entry_id, text, sync=False)
+            self._evict(protect=entry_id)
+        return range(start, self._next_id)
+
+    def _reset(self) -> None:
+        """Drop all entries and indexes without persisting.
+
+        The lazy indexes are released rather than emptied, so they are built
+        again from whatever the store holds next.
+        """
+        self._generation += 1
+        self._lsh = self._trigrams = self._ann = None
+        if isinstance(self._entries, SnapshotEntries):
+            self._attach({}, InvertedIndex())  # release the mapped snapshot
+        self._dirty = None  # everything changed; take_changes reports a full reset
+        self._entries.clear()
+        self._bytes = 0
+        if self._policy is not None:
+            self._policy.clear()
+        self._index.clear()
+        self._next_id = 0
+
+    def _persist(self) -> None:
+        """Sync the journal or write a full autosave, whichever is active."""
+        if self._journal is not None:
+            self._journal.sync()
+        else:
+            self._maybe_autosave()
+
+    def _changed(self, op: str, entry_id: int | None = None, text: str | None = None) -> None:
+        """Record a mutation in the journal or fall back to a full autosave."""
+        if self._journal is not None:
+            self._journal.append(op, entry_id, text)
+        else:
+            self._maybe_autosave()
+
     def _maybe_autosave(self) -> None:
         """Persist memory if autosave is enabled."""
         if self._autosave:
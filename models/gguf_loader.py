@@ -9,19 +9,23 @@ Example
 >>> from models.gguf_loader import GGUFModel
 >>> model = GGUFModel('model.gguf')
 >>> text = model.generate('Hello')
+
+Models loaded with ``embedding=True`` can also :meth:`GGUFModel.embed` text,
+e.g. as the embedder of :meth:`memory_.Memory.search_semantic`.
 """
 from __future__ import annotations
 
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 
 class GGUFModel:
     """Wrapper around ``llama_cpp.Llama`` for GGUF models."""
 
-    def __init__(self, path: str | Path) -> None:
+    def __init__(self, path: str | Path, embedding: bool = False) -> None:
         self.path = Path(path)
+        self.embedding = embedding
         self._llama = None
         logging.debug("GGUFModel created for %s", self.path)
 
@@ -34,7 +38,7 @@ class GGUFModel:
                 "llama_cpp package is required to load GGUF models"
             ) from exc
 
-        self._llama = Llama(model_path=str(self.path))
+        self._llama = Llama(model_path=str(self.path), embedding=self.embedding)
         logging.info("GGUF model loaded from %s", self.path)
 
     @property
@@ -48,3 +52,11 @@ class GGUFModel:
             self.load()
         result: Optional[dict] = self._llama(prompt, max_tokens=max_tokens)
         return result["choices"][0]["text"].strip()
+
+    def embed(self, text: str) -> List[float]:
+        """Return the embedding vector of *text*."""
+        if not self.embedding:
+            raise RuntimeError("model was not created with embedding=True")
+        if not self._llama:
+            self.load()
+        return list(self._llama.embed(text))
@@ -3,7 +3,7 @@
 - Görev ekleme, tamamlama, düzenleme, silme
 - Öncelik, açıklama, son tarih, etiket
 - Tamamlanan/tamamlanmayan filtreleme, özet, ilerleme yüzdesi
-- Export/import desteği (JSON)
+- Export/import desteği (JSON veya JSON Lines, ``.gz`` ile sıkıştırılmış)
 - Eski API ile tamamen uyumlu
 """
 
@@ -11,7 +11,8 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional
 from datetime import datetime
-import json
+
+from utils.json_handler import iter_json_items, iter_jsonl, write_json_array, write_jsonl
 
 @dataclass(order=True)
 class Task:
@@ -89,16 +90,26 @@ def progress() -> float:
     done = len([t for t in _TASKS.values() if t.done])
     return done / total * 100
 
+def _is_jsonl(filename: str) -> bool:
+    return str(filename).endswith((".jsonl", ".jsonl.gz"))
+
 def export_tasks(filename: str):
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump([t.to_dict() for t in _TASKS.values()], f, ensure_ascii=False, indent=2)
+    """Görevleri dosyaya akış halinde yaz (``.jsonl`` / ``.jsonl.gz`` veya JSON dizi)."""
+    records = (t.to_dict() for t in _TASKS.values())
+    if _is_jsonl(filename):
+        write_jsonl(filename, records)
+    else:
+        write_json_array(filename, records)
 
 def import_tasks(filename: str):
-    with open(filename, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        for d in data:
-            t = Task.from_dict(d)
-            _TASKS[t.title] = t
+    """Görevleri dosyadan teker teker oku; tüm dosya belleğe alınmaz."""
+    if _is_jsonl(filename):
+        records = iter_jsonl(filename)
+    else:
+        records = (d for _, d in iter_json_items(filename))
+    for d in records:
+        t = Task.from_dict(d)
+        _TASKS[t.title] = t
 
 def reset() -> None:
     _TASKS.clear()
@@ -9,10 +9,16 @@ Example
 >>> from nlp.thought_vectorizer import vectorize
 >>> vectorize("hello world", vocabulary=["hello", "world", "foo"])
 [1, 1, 0]
+
+:func:`hash_vectorize` needs no vocabulary and produces fixed-size dense
+vectors, which is what the ANN index of :meth:`memory_.Memory.search_semantic`
+consumes by default.
 """
 
 from __future__ import annotations
 
+import math
+import zlib
 from collections import Counter
 from typing import Iterable, List
 
@@ -23,3 +29,22 @@ def vectorize(text: str, vocabulary: Iterable[str]) -> List[int]:
     counts = Counter(text.lower().split())
     return [counts.get(word.lower(), 0) for word in vocabulary]
 
+
+def hash_vectorize(text: str, dim: int = 128) -> List[float]:
+    """Return an L2-normalised feature-hashed vector of *text*.
+
+    Words and their character trigrams are hashed into *dim* signed buckets,
+    so texts sharing word fragments (``"running"``/``"runner"``) end up close
+    even without a shared vocabulary.
+    """
+    vector = [0.0] * dim
+    for word, count in Counter(text.lower().split()).items():
+        features = [(word, 1.0)]
+        padded = f"#{word}#"
+        features.extend((padded[i : i + 3], 0.5) for i in range(len(padded) - 2))
+        for feature, weight in features:
+            digest = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % dim] += sign * weight * count
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else vector
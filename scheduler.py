@@ -1,64 +1,429 @@
-"""Gelişmiş asyncio tabanlı görev zamanlayıcı (Scheduler)."""
+"""Gelişmiş asyncio tabanlı görev zamanlayıcı (Scheduler).
+
+Tüm periyodik görevler tek bir dağıtıcı (dispatcher) coroutine tarafından
+yürütülür: bir sonraki çalışma zamanları ``time.monotonic()`` cinsinden bir
+min-heap'te tutulur, dağıtıcı en yakın zamana kadar uyur ve vadesi gelen
+görevleri çalıştırır.  Böylece binlerce görev binlerce uyuyan
+``asyncio.Task`` yerine tek bir zamanlayıcıyla yönetilir; ekleme O(log n),
+iptal ise tembel silme ile amortize O(log n)'dir.
+
+Varsayılan olarak görevler sabit hızda (fixed-rate) çalışır: son tarihler
+``başlangıç + k * interval`` ızgarasındadır, bu yüzden görevin çalışma süresi
+periyoda eklenip kaymaya (drift) yol açmaz.  Bir görev son tarihlerini
+kaçırdığında ne olacağını *misfire* politikası belirler:
+
+``"skip"``
+    Kaçırılan çalışmaları at, ızgaradaki bir sonraki son tarihi bekle.
+``"coalesce"``
+    Kaçırılanların yerine hemen bir kez çalış, sonra ızgaraya dön.
+``"catch_up"``
+    Kaçırılan her çalışmayı arka arkaya yap.
+
+*jitter* her çalışmayı ``[0, jitter)`` saniye rastgele geciktirerek aynı
+periyoda sahip görevlerin aynı anda tetiklenmesini önler; ızgarayı
+etkilemez.  Her çalışmanın planlanan zamandan sapması görevde tutulur.
+
+Bir görevin aynı anda en fazla *max_concurrency* çalışması olabilir.  Sınır
+doluyken gelen bir tetikleme (zamanı gelen çalışma ya da :meth:`trigger`)
+de misfire sayılır: ``"skip"`` onu atar, ``"coalesce"`` en fazla bir
+çalışmayı sıraya alır, ``"catch_up"`` hepsini sıraya alır.  *executor*
+``"thread"`` veya ``"process"`` ise iş olay döngüsü yerine bir iş
+parçacığında ya da ayrı bir süreçte çalışır; engelleyen G/Ç veya ağır
+hesaplama böylece diğer görevleri durdurmaz.
+
+:meth:`Scheduler.metrics` her görev için çalışma/hata sayılarını, süre ve
+başlama gecikmesi histogramlarını (p50/p95/p99) ve olay döngüsünün ne kadar
+geç uyandığını ölçen yoklayıcının (lag probe, ``Scheduler(lag_interval=...)``
+ile açılır) sonuçlarını döner.
+Histogramlar seyrek logaritmik kovalar kullanır (~%9 çözünürlük); özetleri
+yalnızca yeni ölçüm geldiğinde yeniden hesaplanır, bu yüzden anlık görüntü
+her saniye alınabilecek kadar ucuzdur.
+
+:meth:`Scheduler.run_forever` yoklama yapmaz; zamanlayıcı durduğunda ya da
+son görev iptal edildiğinde bir ``asyncio.Event`` ile uyanır.
+:meth:`Scheduler.shutdown` yeni çalışmaları durdurur, sürenleri verilen süre
+kadar bekler, kalanları iptal eder ve bir rapor döner.
+"""
 
 from __future__ import annotations
 import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import math
+import random
 import time
+from collections import deque
 from collections.abc import Awaitable, Callable
+from concurrent.futures import Executor, ProcessPoolExecutor
 from typing import Any, Optional
 
+MISFIRE_POLICIES = ("skip", "coalesce", "catch_up")
+EXECUTORS = (None, "thread", "process")
+
+
+class Histogram:
+    """Saniye cinsinden ölçümler için seyrek, logaritmik kovalı histogram."""
+
+    __slots__ = ("buckets", "count", "total", "max", "_summary")
+
+    MIN = 1e-6
+    BASE = 2 ** 0.125
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self):
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._summary: Optional[dict] = None
+
+    def record(self, value: float):
+        index = 0 if value <= self.MIN else math.ceil(math.log(value / self.MIN, self.BASE))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self._summary = None
+
+    def summary(self) -> dict:
+        """``count``, ``mean``, ``p50``, ``p95``, ``p99`` ve ``max`` değerleri."""
+        if self._summary is None:
+            summary = {"count": self.count, "mean": self.total / self.count if self.count else 0.0}
+            keys = iter(self.QUANTILES)
+            q = next(keys)
+            seen = 0
+            for index in sorted(self.buckets):
+                seen += self.buckets[index]
+                while q is not None and seen >= q * self.count:
+                    summary[f"p{round(q * 100)}"] = min(self.MIN * self.BASE**index, self.max)
+                    q = next(keys, None)
+            for q in self.QUANTILES:
+                summary.setdefault(f"p{round(q * 100)}", 0.0)
+            summary["max"] = self.max
+            self._summary = summary
+        return self._summary
+
+
+def _call(func: Callable[[], Any]) -> Any:
+    """*func*'u çağır; coroutine dönerse bu iş parçacığında sonuna kadar yürüt."""
+    result = func()
+    if inspect.isawaitable(result):
+        result = asyncio.run(result)
+    return result
+
+
 class ScheduledTask:
-    def __init__(self, name: str, interval: int, coro_func: Callable[[], Awaitable[Any]]):
+    def __init__(
+        self,
+        name: str,
+        interval: int,
+        coro_func: Callable[[], Awaitable[Any]],
+        *,
+        fixed_rate: bool = True,
+        misfire: str = "coalesce",
+        jitter: float = 0.0,
+        executor: str | None = None,
+        max_concurrency: int = 1,
+    ):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if misfire not in MISFIRE_POLICIES:
+            raise ValueError(f"Unknown misfire policy: {misfire!r}")
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor: {executor!r}")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
         self.name = name
         self.interval = interval
         self.coro_func = coro_func
-        self._task: Optional[asyncio.Task] = None
+        self.fixed_rate = fixed_rate
+        self.misfire = misfire
+        self.jitter = jitter
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.active: int = 0  # şu an süren çalışmalar
+        # Sınır yüzünden sırada bekleyen çalışmaların planlanan zamanları;
+        # binlerce görevde bellek harcamamak için ilk gerektiğinde kurulur.
+        self.pending: Optional[deque[float]] = None
+        self.in_heap: bool = False
         self.last_run: float = 0.0
         self.cancelled: bool = False
         self.last_exception: Optional[Exception] = None
+        # time.monotonic() cinsinden: ızgaradaki son tarih ve jitter
+        # eklenmiş planlanan çalışma zamanı (heap anahtarı).
+        self.deadline: float = 0.0
+        self.next_run: float = 0.0
+        self.deviation: float = 0.0
+        self.max_deviation: float = 0.0
+        self.missed: int = 0
+        self.runs: int = 0
+        self.failures: int = 0
+        self.durations = Histogram()
+        self.start_delays = Histogram()
+        self._metrics: tuple[tuple, dict] | None = None
 
-    async def _run(self):
-        while not self.cancelled:
-            try:
-                await self.coro_func()
-                self.last_run = time.time()
-            except Exception as e:
-                self.last_exception = e
-            await asyncio.sleep(self.interval)
+    def metrics(self) -> dict:
+        """Görevin ölçümleri; değişmediyse önceki sözlük döner."""
+        key = (self.runs, self.missed, self.active, len(self.pending or ()), self.start_delays.count)
+        if self._metrics is None or self._metrics[0] != key:
+            self._metrics = key, {
+                "runs": self.runs,
+                "failures": self.failures,
+                "missed": self.missed,
+                "active": self.active,
+                "pending": len(self.pending or ()),
+                "last_success": self.last_run or None,
+                "last_error": repr(self.last_exception) if self.last_exception else None,
+                "duration": self.durations.summary(),
+                "start_delay": self.start_delays.summary(),
+            }
+        return self._metrics[1]
+
+    def plan(self, deadline: float) -> float:
+        """Son tarihi *deadline* yap ve jitter ekleyip çalışma zamanını dön."""
+        self.deadline = deadline
+        if self.jitter:
+            deadline += random.uniform(0, self.jitter)
+        return deadline
+
+    def advance(self, now: float) -> float:
+        """*now* anından sonraki çalışma zamanı.
 
-    def start(self):
-        self._task = asyncio.create_task(self._run())
+        Sabit hızda görev tetiklenirken, sabit gecikmede ise çalışma
+        bittiğinde çağrılır.
+        """
+        if not self.fixed_rate:
+            return self.plan(now + self.interval)
+        deadline = self.deadline + self.interval
+        if deadline <= now and self.misfire != "catch_up":
+            # Kaçırılan ızgara noktalarının sayısı (deadline dahil).
+            late = int((now - deadline) // self.interval) + 1
+            if self.misfire == "skip":
+                self.missed += late
+                deadline += late * self.interval
+            else:
+                self.missed += late - 1
+                deadline += (late - 1) * self.interval
+        return self.plan(deadline)
+
+    def started(self, now: float):
+        """Planlanan zamandan sapmayı kaydet."""
+        self.deviation = now - self.next_run
+        self.max_deviation = max(self.max_deviation, self.deviation)
+
+    async def run_once(self, pool: Executor | None = None):
+        """Görevi bir kez çalıştır; sonucu ve hatayı kaydet.
+
+        *executor* ayarlıysa iş *pool* içinde (``None`` ise döngünün
+        varsayılan iş parçacığı havuzunda) yürütülür.
+        """
+        start = time.perf_counter()
+        try:
+            if self.executor is None:
+                await self.coro_func()
+            else:
+                await asyncio.get_running_loop().run_in_executor(pool, _call, self.coro_func)
+            self.last_run = time.time()
+        except Exception as e:
+            self.last_exception = e
+            self.failures += 1
+        finally:
+            self.runs += 1
+            self.durations.record(time.perf_counter() - start)
 
     def cancel(self):
         self.cancelled = True
-        if self._task:
-            self._task.cancel()
 
 class Scheduler:
     """Asenkron görev zamanlayıcı: periyodik ve yönetilebilir."""
 
-    def __init__(self):
+    def __init__(self, lag_interval: float | None = None):
+        """*lag_interval* verilirse görev varken bu aralıkla döngü gecikmesini ölç.
+
+        Yoklayıcı varsayılan olarak kapalıdır; açıkken de görev kalmayınca
+        durur, böylece boşta bekleyen zamanlayıcı hiç uyanmaz.
+        """
         self._tasks: dict[str, ScheduledTask] = {}
         self._is_running = True
+        # (next_run, sıra, görev) üçlülerinden min-heap; iptal edilen veya
+        # yeniden planlanan görevlerin eski kayıtları tembel olarak atılır.
+        self._heap: list[tuple[float, int, ScheduledTask]] = []
+        self._seq = itertools.count()
+        self._stale = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._running: dict[asyncio.Task, ScheduledTask] = {}
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.lag_interval = lag_interval
+        self.loop_lag = Histogram()
+        self.last_lag: float = 0.0
+        self._probe: Optional[asyncio.Task] = None
+        # Durunca ya da görev kalmayınca kurulur; run_forever bunu bekler.
+        self._idle = asyncio.Event()
 
     def schedule(
         self,
         interval: int,
-        coro_func: Callable[[], Awaitable[Any]],
+        coro_func: Callable[[], Any],
         *,
         name: str | None = None,
+        delay: float = 0.0,
+        fixed_rate: bool = True,
+        misfire: str = "coalesce",
+        jitter: float = 0.0,
+        executor: str | None = None,
+        max_concurrency: int = 1,
     ) -> ScheduledTask:
-        """Her interval saniyede bir *coro_func*’u çalıştır."""
+        """Her interval saniyede bir *coro_func*’u çalıştır.
+
+        İlk çalışma *delay* saniye sonra (varsayılan: hemen) yapılır.
+        ``fixed_rate=False`` eski davranışa döner: her çalışma bittikten
+        *interval* saniye sonra bir sonraki başlar.  *misfire*, *jitter*,
+        *executor* ve *max_concurrency* için modül belgesine bakın;
+        ``executor="process"`` ile *coro_func* pickle edilebilir olmalıdır.
+        """
         name = name or f"task-{len(self._tasks)}"
-        task = ScheduledTask(name, interval, coro_func)
+        task = ScheduledTask(
+            name,
+            interval,
+            coro_func,
+            fixed_rate=fixed_rate,
+            misfire=misfire,
+            jitter=jitter,
+            executor=executor,
+            max_concurrency=max_concurrency,
+        )
+        self.cancel(name)
         self._tasks[name] = task
-        task.start()
+        self._idle.clear()
+        self._push(task, task.plan(time.monotonic() + delay))
         return task
 
+    def _push(self, task: ScheduledTask, when: float):
+        """*task*'ı *when* anında çalışacak şekilde heap'e ekle."""
+        task.next_run = when
+        task.in_heap = True
+        earliest = not self._heap or when < self._heap[0][0]
+        heapq.heappush(self._heap, (when, next(self._seq), task))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        elif earliest:
+            self._wakeup.set()
+        if self.lag_interval and (self._probe is None or self._probe.done()):
+            self._probe = asyncio.create_task(self._probe_lag())
+
+    async def _dispatch(self):
+        """Vadesi gelen görevleri çalıştıran tek döngü."""
+        heap = self._heap
+        while self._is_running and heap:
+            when, _, task = heap[0]
+            if task.cancelled or task.next_run != when:
+                heapq.heappop(heap)
+                self._stale -= 1
+                continue
+            delay = when - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(heap)
+            task.in_heap = False
+            try:
+                now = time.monotonic()
+                task.started(now)
+                if task.fixed_rate:
+                    self._push(task, task.advance(now))
+                self._fire(task, when)
+            except Exception as e:
+                self._drop(task, e)
+
+    def _drop(self, task: ScheduledTask, error: Exception):
+        """Planlanamayan görevi kaydedip iptal et; diğer görevler sürsün."""
+        logging.exception("Scheduler: %r görevi planlanamadı, iptal ediliyor", task.name)
+        task.last_exception = error
+        if self._tasks.get(task.name) is task:
+            self.cancel(task.name)
+        else:
+            task.cancel()
+
+    async def _probe_lag(self):
+        """Döngünün istenen uyanma anından ne kadar geç uyandığını ölç."""
+        interval = self.lag_interval
+        while self._is_running and self._tasks:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            self.last_lag = max(time.monotonic() - start - interval, 0.0)
+            self.loop_lag.record(self.last_lag)
+
+    def _fire(self, task: ScheduledTask, planned: float):
+        """Görevi sınırı içinde başlat, sınır doluysa misfire politikasını uygula."""
+        if task.active < task.max_concurrency:
+            self._start(task, planned)
+        elif task.misfire == "skip" or (task.misfire == "coalesce" and task.pending):
+            task.missed += 1
+        else:
+            if task.pending is None:
+                task.pending = deque()
+            task.pending.append(planned)
+
+    def _start(self, task: ScheduledTask, planned: float):
+        task.start_delays.record(time.monotonic() - planned)
+        task.active += 1
+        pool = self._pool() if task.executor == "process" else None
+        run = asyncio.create_task(task.run_once(pool))
+        self._running[run] = task
+        run.add_done_callback(self._finished)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor()
+        return self._process_pool
+
+    def _finished(self, run: asyncio.Task):
+        """Çalışma bitince sıradakini başlat ya da bir sonrakini planla."""
+        task = self._running.pop(run)
+        task.active -= 1
+        if task.cancelled or not self._is_running:
+            return
+        if task.pending:
+            self._start(task, task.pending.popleft())
+        elif not task.fixed_rate and not task.active and not task.in_heap:
+            try:
+                self._push(task, task.advance(time.monotonic()))
+            except Exception as e:
+                self._drop(task, e)
+
     def cancel(self, name: str):
-        """Belirli bir görevi iptal et."""
-        if name in self._tasks:
-            self._tasks[name].cancel()
-            del self._tasks[name]
+        """Belirli bir görevi ve süren çalışmalarını iptal et."""
+        task = self._forget(name)
+        if task is None:
+            return
+        for run, owner in list(self._running.items()):
+            if owner is task:
+                run.cancel()
+
+    def _forget(self, name: str) -> Optional[ScheduledTask]:
+        """Görevi plandan çıkar; süren çalışmalarına dokunma."""
+        task = self._tasks.pop(name, None)
+        if task is None:
+            return None
+        task.cancel()
+        if task.in_heap:
+            self._stale += 1
+        if not self._tasks:
+            self._idle.set()
+        if self._stale > len(self._heap) // 2 + 64:
+            # Ölü kayıtlar heap'i şişirmesin diye yeniden kur.
+            self._heap[:] = [e for e in self._heap if not e[2].cancelled and e[2].next_run == e[0]]
+            heapq.heapify(self._heap)
+            self._stale = 0
+        return task
 
     def cancel_all(self):
         """Tüm görevleri iptal et."""
@@ -78,23 +443,88 @@ class Scheduler:
             "cancelled": t.cancelled,
             "exception": t.last_exception,
             "interval": t.interval,
+            "deviation": t.deviation,
+            "max_deviation": t.max_deviation,
+            "missed": t.missed,
+        }
+
+    def metrics(self) -> dict:
+        """Tüm görevlerin ve olay döngüsünün ölçümlerinin anlık görüntüsü.
+
+        Süreler saniye cinsindendir; ``last_success`` ``time.time()`` değeridir.
+        Değişmeyen görevlerin sözlükleri yeniden kullanılır, bu yüzden
+        dönen değer salt okunur kabul edilmelidir.
+        """
+        return {
+            "tasks": {name: t.metrics() for name, t in self._tasks.items()},
+            "loop_lag": {**self.loop_lag.summary(), "last": self.last_lag},
+            "scheduled": len(self._tasks),
+            "running": len(self._running),
         }
 
     def trigger(self, name: str):
-        """Bir görevi manuel (hemen) tetikle."""
+        """Bir görevi manuel (hemen) tetikle; eşzamanlılık sınırına uyar."""
         t = self._tasks.get(name)
         if t:
-            asyncio.create_task(t.coro_func())
+            self._fire(t, time.monotonic())
 
     def stop(self):
-        """Scheduler’ı tamamen durdur."""
+        """Scheduler’ı tamamen durdur ve süren çalışmaları iptal et.
+
+        Süren işlerin bitmesini beklemek için :meth:`shutdown` kullanın.
+        """
+        self._halt()
+        for run in list(self._running):
+            run.cancel()
+        self._close_pool()
+        self._idle.set()
+
+    def _halt(self) -> int:
+        """Yeni çalışmaları durdur; sıradan atılan çalışma sayısını dön."""
         self._is_running = False
-        self.cancel_all()
+        dropped = sum(len(t.pending or ()) for t in self._tasks.values())
+        for name in list(self._tasks):
+            self._forget(name)
+        for task in (self._dispatcher, self._probe):
+            if task is not None:
+                task.cancel()
+        return dropped
+
+    def _close_pool(self):
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    async def shutdown(self, timeout: float = 10.0) -> dict:
+        """Zamanlayıcıyı durdur; süren çalışmaları *timeout* saniye bekle.
+
+        Yeni çalışma başlatılmaz, sıradakiler atılır.  Süre dolunca hâlâ
+        süren çalışmalar iptal edilir (iş parçacığındaki bir iş kesilemez,
+        yalnızca beklenmez).  Dönen rapor: ``drained`` (bitmesi beklenen
+        görev isimleri), ``cancelled`` (iptal edilenler), ``dropped``
+        (sıradan atılan çalışma sayısı) ve ``seconds``.
+        """
+        start = time.monotonic()
+        dropped = self._halt()
+        runs = dict(self._running)
+        done, late = await asyncio.wait(runs, timeout=timeout) if runs else (set(), set())
+        for run in late:
+            run.cancel()
+        if late:
+            await asyncio.gather(*late, return_exceptions=True)
+        self._close_pool()
+        self._idle.set()
+        return {
+            "drained": sorted(runs[run].name for run in done),
+            "cancelled": sorted(runs[run].name for run in late),
+            "dropped": dropped,
+            "seconds": time.monotonic() - start,
+        }
 
     async def run_forever(self):
-        """Görevler arasında asenkron bekleme. (Hızlı test için override edilebilir)"""
+        """Zamanlayıcı durana ya da görev kalmayana kadar bekle."""
         while self._is_running and self._tasks:
-            await asyncio.sleep(1)
+            await self._idle.wait()
 
 # Kısa test
 if __name__ == "__main__":
@@ -1,6 +1,10 @@
+from core.action_scheduler import ActionScheduler
 from core.ai_core import AICore
-from scheduler import Scheduler
+from scheduler import Histogram, ScheduledTask, Scheduler
 import asyncio
+import pytest
+import threading
+import time
 
 def test_ai_core_interact():
     core = AICore()
@@ -41,3 +45,304 @@ def test_scheduler_manual_trigger():
 
         s.cancel_all()
     asyncio.run(runner())
+
+def _job(runs, name):
+    async def run():
+        runs.append(name)
+    return run
+
+def test_scheduler_heap_dispatch():
+    async def runner():
+        runs = []
+        s = Scheduler()
+        for i in range(200):
+            s.schedule(0.05, _job(runs, f"j{i}"), name=f"j{i}", delay=10)
+        s.schedule(0.05, _job(runs, "fast"), name="fast")
+        s.schedule(0.05, _job(runs, "late"), name="late", delay=0.08)
+        await asyncio.sleep(0.02)
+        assert runs == ["fast"]
+        await asyncio.sleep(0.1)
+        assert "late" in runs
+        s.stop()
+
+    asyncio.run(runner())
+
+def test_scheduler_cancel_rebuilds_heap():
+    async def runner():
+        s = Scheduler()
+        for i in range(200):
+            s.schedule(0.05, _job([], f"j{i}"), name=f"j{i}", delay=10)
+        # Tek dağıtıcı; iptaller heap'i yeniden kurar.
+        for i in range(200):
+            s.cancel(f"j{i}")
+        assert len(s._heap) < 200
+        s.stop()
+
+    asyncio.run(runner())
+
+def test_scheduler_reschedule_replaces_task():
+    async def runner():
+        runs = []
+        s = Scheduler()
+        s.schedule(0.05, _job(runs, "fast"), name="fast")
+        await asyncio.sleep(0.02)
+        # Aynı isimle yeniden planlamak eskisinin yerini alır.
+        s.schedule(0.05, _job(runs, "fast2"), name="fast")
+        await asyncio.sleep(0.2)
+        assert "fast2" in runs and runs.count("fast") == 1
+        s.stop()
+
+    asyncio.run(runner())
+
+async def _noop():
+    pass
+
+def _planned(**kwargs):
+    t = ScheduledTask("t", 10, _noop, **kwargs)
+    t.next_run = t.plan(0.0)
+    return t
+
+def test_scheduler_fixed_rate_ignores_run_time():
+    # Çalışma süresi periyoda eklenmez.
+    assert _planned().advance(3.0) == 10.0
+    assert _planned(fixed_rate=False).advance(3.0) == 13.0
+
+def test_scheduler_misfire_skip():
+    # 10, 20 ve 30 kaçırıldı.
+    t = _planned(misfire="skip")
+    assert t.advance(35.0) == 40.0 and t.missed == 3
+
+def test_scheduler_misfire_coalesce():
+    t = _planned(misfire="coalesce")
+    assert t.advance(35.0) == 30.0 and t.missed == 2
+    assert t.advance(36.0) == 40.0
+
+def test_scheduler_misfire_catch_up():
+    t = _planned(misfire="catch_up")
+    assert [t.advance(35.0) for _ in range(4)] == [10.0, 20.0, 30.0, 40.0]
+    assert t.missed == 0
+
+def test_scheduler_jitter_keeps_grid():
+    # Jitter çalışmayı geciktirir ama ızgarayı kaydırmaz.
+    t = _planned(jitter=2.0)
+    for i in range(1, 5):
+        when = t.advance(0.0)
+        assert t.deadline == 10.0 * i and t.deadline <= when < t.deadline + 2.0
+
+def test_scheduler_records_start_deviation():
+    t = _planned()
+    t.started(0.5)
+    assert t.deviation == 0.5 and t.max_deviation == 0.5
+
+@pytest.mark.parametrize(
+    "misfire, runs, missed", [("skip", 1, 2), ("coalesce", 2, 1), ("catch_up", 3, 0)]
+)
+def test_scheduler_concurrency_overflow_follows_misfire(misfire, runs, missed):
+    async def runner():
+        s = Scheduler()
+        gate = asyncio.Event()
+        started = []
+
+        async def slow():
+            started.append(1)
+            await gate.wait()
+
+        t = s.schedule(60, slow, name="slow", misfire=misfire, delay=60)
+        for _ in range(3):
+            s.trigger("slow")
+        await asyncio.sleep(0.01)
+        assert t.active == 1 and len(started) == 1
+        gate.set()
+        await asyncio.sleep(0.01)
+        assert len(started) == runs and t.missed == missed
+        s.stop()
+
+    asyncio.run(runner())
+
+def test_scheduler_thread_executor():
+    async def runner():
+        s = Scheduler()
+        # Engelleyen iş iş parçacığında çalışır; döngü beklemez.
+        threads = []
+
+        def blocking():
+            threads.append(threading.current_thread())
+            time.sleep(0.2)
+
+        t = s.schedule(60, blocking, name="blocking", executor="thread")
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        assert time.perf_counter() - start < 0.1
+        await asyncio.sleep(0.3)
+        assert threads and threads[0] is not threading.main_thread()
+        assert t.last_run and t.last_exception is None
+        s.stop()
+
+    asyncio.run(runner())
+
+def test_histogram_percentiles():
+    h = Histogram()
+    for ms in range(1, 101):
+        h.record(ms / 1000)
+    summary = h.summary()
+    assert summary["count"] == 100 and summary["max"] == 0.1
+    for q in (50, 95, 99):
+        assert abs(summary[f"p{q}"] - q / 1000) <= q / 1000 * 0.1
+    assert h.summary() is summary  # yeni ölçüm yoksa önbellekten
+
+def test_scheduler_metrics():
+    async def runner():
+        s = Scheduler(lag_interval=0.01)
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        s.schedule(0.02, _noop, name="ok")
+        s.schedule(0.02, fail, name="fail")
+        await asyncio.sleep(0.05)
+        time.sleep(0.05)  # döngüyü engelle
+        await asyncio.sleep(0.03)
+        m = s.metrics()
+        s.stop()
+        ok_m, fail_m = m["tasks"]["ok"], m["tasks"]["fail"]
+        assert ok_m["runs"] >= 2 and ok_m["failures"] == 0 and ok_m["last_success"]
+        assert ok_m["duration"]["count"] == ok_m["runs"]
+        assert ok_m["start_delay"]["max"] >= 0.03
+        assert fail_m["failures"] == fail_m["runs"] >= 2
+        assert fail_m["last_success"] is None and "boom" in fail_m["last_error"]
+        assert m["loop_lag"]["max"] >= 0.03
+
+    asyncio.run(runner())
+
+def test_scheduler_shutdown():
+    async def runner():
+        s = ActionScheduler(lag_interval=None)
+        finished = []
+
+        async def job(name, seconds):
+            await asyncio.sleep(seconds)
+            finished.append(name)
+
+        s.schedule_action("short", 60, lambda: job("short", 0.05))
+        s.schedule_action("long", 60, lambda: job("long", 5))
+        s.schedule_action("later", 60, lambda: job("later", 0), delay=60)
+        s.trigger("short")  # sırada bekler, atılır
+        forever = asyncio.create_task(s.run_forever())
+        await asyncio.sleep(0.01)
+        assert not forever.done()
+
+        report = await s.shutdown(timeout=0.2)
+        assert report["drained"] == ["short"]
+        assert report["cancelled"] == ["long"]
+        assert report["dropped"] == 1
+        assert report["seconds"] < 1
+        assert finished == ["short"]
+        await asyncio.wait_for(forever, 0.1)
+        assert not s.tasks() and not s._running
+
+    asyncio.run(runner())
+
+def test_scheduler_run_forever_returns_after_last_cancel():
+    async def runner():
+        # Son görev iptal edilince run_forever hemen döner.
+        s = Scheduler(lag_interval=None)
+        s.schedule(60, _noop, name="x", delay=60)
+        forever = asyncio.create_task(s.run_forever())
+        await asyncio.sleep(0.01)
+        s.cancel("x")
+        await asyncio.wait_for(forever, 0.1)
+
+    asyncio.run(runner())
+
+def _hanging(started, cancelled):
+    async def run():
+        started.append(1)
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+    return run
+
+def test_scheduler_cancel_stops_running_job():
+    async def runner():
+        started, cancelled = [], []
+        s = Scheduler()
+        s.schedule(60, _hanging(started, cancelled), name="hang")
+        s.schedule(60, _hanging([], []), name="other")
+        await asyncio.sleep(0.01)
+        s.cancel("hang")
+        await asyncio.sleep(0.01)
+        assert started and cancelled and len(s._running) == 1
+        s.stop()
+
+    asyncio.run(runner())
+
+def test_scheduler_stop_cancels_running_jobs():
+    async def runner():
+        started, cancelled = [], []
+        s = Scheduler()
+        for name in ("a", "b"):
+            s.schedule(60, _hanging(started, cancelled), name=name)
+        await asyncio.sleep(0.01)
+        s.stop()
+        await asyncio.sleep(0.01)
+        assert len(started) == len(cancelled) == 2 and not s._running
+
+    asyncio.run(runner())
+
+def test_scheduler_rejects_non_positive_interval():
+    s = Scheduler(lag_interval=None)
+    for interval in (0, -1):
+        with pytest.raises(ValueError):
+            s.schedule(interval, _noop, name="bad")
+    assert s.tasks() == []
+
+def test_scheduler_survives_a_failing_task():
+    async def runner():
+        runs = []
+
+        async def ok():
+            runs.append(1)
+
+        async def boom():
+            raise ZeroDivisionError("boom")
+
+        s = Scheduler(lag_interval=None)
+        bad = s.schedule(0.01, boom, name="bad")
+        s.schedule(0.01, ok, name="ok")
+        await asyncio.sleep(0.1)
+        assert s.tasks() == ["bad", "ok"] and s._dispatcher and not s._dispatcher.done()
+        assert isinstance(bad.last_exception, ZeroDivisionError) and bad.failures > 5
+        assert len(runs) > 5
+        s.stop()
+
+    asyncio.run(runner())
+
+def test_scheduler_lag_probe_is_opt_in():
+    async def runner():
+        s = Scheduler()
+        s.schedule(60, _noop, name="x")
+        await asyncio.sleep(0.03)
+        assert s._probe is None and s.metrics()["loop_lag"]["count"] == 0
+        s.stop()
+
+    asyncio.run(runner())
+
+def test_scheduler_lag_probe_parks_when_idle():
+    async def runner():
+        s = Scheduler(lag_interval=0.01)
+        s.schedule(60, _noop, name="x")
+        await asyncio.sleep(0.03)
+        s.cancel("x")
+        await asyncio.sleep(0.02)
+        samples = s.loop_lag.count
+        assert samples and s._probe.done()
+        await asyncio.sleep(0.05)
+        assert s.loop_lag.count == samples
+        s.schedule(60, _noop, name="y")
+        await asyncio.sleep(0.03)
+        assert s.loop_lag.count > samples
+        s.stop()
+
+    asyncio.run(runner())
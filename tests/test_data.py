@@ -1,6 +1,14 @@
 from data.data_cleaner import clean
 from core.data_manager import DataManager
+from backup import (
+    BackupManager, list_segments, missing_segments, open_segment, restore, verify_backups,
+    verify_segment,
+)
+from memory_ import Memory
+import asyncio
+import json
 import os
+import pytest
 
 
 def test_clean():
@@ -12,3 +20,141 @@ def test_data_manager(tmp_path):
     dm.save({'a': 1})
     assert dm.load() == {'a': 1}
 
+
+def _run(manager):
+    return asyncio.run(manager.backup())
+
+
+@pytest.fixture
+def backed_up(tmp_path):
+    memory = Memory()
+    memory.add_many(["alpha", "beta", "gamma"])
+    manager = BackupManager(memory, tmp_path, full_every=3, compression="zlib")
+    assert _run(manager)["kind"] == "full"
+    return memory, manager
+
+
+def test_backup_skips_when_unchanged(backed_up):
+    _, manager = backed_up
+    assert _run(manager)["kind"] == "skipped"
+
+
+def test_backup_diff_records_changes(backed_up):
+    memory, manager = backed_up
+    memory.update(1, "beta two")
+    memory.remove(2)
+    diff = _run(manager)
+    assert (diff["kind"], diff["entries"]) == ("diff", 2)
+    with open_segment(diff["path"]) as f:
+        lines = [json.loads(line) for line in f]
+    assert lines[0]["kind"] == "diff" and lines[0]["next_id"] == 3
+    assert lines[1:] == [{"op": "add", "id": 1, "text": "beta two"}, {"op": "remove", "id": 2}]
+
+
+def test_backup_starts_new_chain_every_full_every(tmp_path, backed_up):
+    memory, manager = backed_up
+    for text in ("delta", "epsilon", "zeta"):
+        memory.add(text)
+        _run(manager)
+    kinds = [kind for _, kind, _ in list_segments(tmp_path / "backups")]
+    assert kinds == ["full", "diff", "diff", "full"]
+    assert not list((tmp_path / "backups").glob("*.tmp"))
+
+
+@pytest.fixture
+def history(tmp_path):
+    memory = Memory()
+    memory.add_many(["alpha", "beta", "gamma"])
+    manager = BackupManager(memory, tmp_path, full_every=5)
+    reports = [_run(manager)]
+    memory.remove(0)
+    memory.update(2, "gamma two")
+    reports.append(_run(manager))
+    memory.add("delta")
+    reports.append(_run(manager))
+    return memory, reports
+
+
+def test_backup_restore_latest(tmp_path, history):
+    memory, _ = history
+    restored, report = restore(tmp_path)
+    assert dict(restored.snapshot()) == dict(memory.snapshot())
+    assert restored.add("next") == 4
+    assert (report["segments"], report["records"]) == (3, 6)
+
+
+def test_backup_restore_point_in_time(tmp_path, history):
+    _, reports = history
+    with open_segment(reports[1]["path"]) as f:
+        created = json.loads(next(iter(f)))["created"]
+    earlier, _ = restore(tmp_path, until=created)
+    assert dict(earlier.snapshot()) == {1: "beta", 2: "gamma two"}
+
+
+def test_backup_restore_rejects_corrupt_segment(tmp_path, history):
+    _, reports = history
+    with open(reports[-1]["path"], "r+b") as f:
+        f.seek(-4, 2)
+        f.write(b"XXXX")
+    assert list(verify_backups(tmp_path).values()) == [True, True, False]
+    target = Memory()
+    with pytest.raises(ValueError):
+        restore(tmp_path, memory=target)
+    assert len(target) == 0
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zlib", "none"])
+def test_backup_restore_rejects_corrupt_header(tmp_path, compression):
+    memory = Memory()
+    memory.add("alpha")
+    report = _run(BackupManager(memory, tmp_path, compression=compression))
+    with open(report["path"], "r+b") as f:
+        f.write(b"\xff" * 8)
+    with pytest.raises(ValueError):
+        restore(tmp_path)
+
+
+def test_backup_restore_rejects_broken_chain(tmp_path):
+    memory = Memory()
+    manager = BackupManager(memory, tmp_path, full_every=10)
+    reports = []
+    for text in ("alpha", "beta", "gamma", "delta"):
+        memory.add(text)
+        reports.append(_run(manager))
+    os.remove(reports[1]["path"])
+    assert missing_segments(tmp_path) == [reports[1]["seq"]]
+    assert list(verify_backups(tmp_path).values()) == [True, False, False]
+    with pytest.raises(ValueError, match=str([reports[1]["seq"]])):
+        restore(tmp_path)
+
+
+def test_backup_reports_measured_loop_lag(tmp_path):
+    memory = Memory()
+    memory.add_many(f"entry {i}" for i in range(2000))
+    report = _run(BackupManager(memory, tmp_path))
+    assert "blocked" not in report
+    assert 0.0 <= report["loop_lag"] < report["seconds"]
+
+
+def test_concurrent_backups_do_not_share_temp_files(tmp_path):
+    managers = []
+    for _ in range(2):
+        memory = Memory()
+        memory.add_many(f"entry {i}" for i in range(5000))
+        managers.append(BackupManager(memory, tmp_path))
+
+    async def both():
+        return await asyncio.gather(*(m.backup() for m in managers))
+
+    reports = asyncio.run(both())
+    assert reports[0]["path"] == reports[1]["path"]
+    assert verify_segment(reports[0]["path"])
+    assert sorted(p.name for p in managers[0].directory.iterdir()) == [
+        "00000001-full.jsonl.gz", "00000001-full.jsonl.gz.sha256",
+    ]
+
+
+def test_backup_manager_path_is_deprecated(tmp_path):
+    manager = BackupManager(Memory(), tmp_path)
+    with pytest.deprecated_call():
+        assert manager.path == manager.directory
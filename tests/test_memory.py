@@ -1,3 +1,17 @@
+import json
+import random
+import re
+import threading
+from collections import Counter
+
+import pytest
+
+import memory_
+from data.ann_index import HNSWIndex
+from data.eviction import ColdTier, LRUPolicy
+from data.memory_index import TokenVocabulary
+from data.memory_journal import journal_paths
+from data.sharded_memory import ShardedMemory
 from memory_ import Memory
 
 def test_add_and_search():
@@ -63,3 +77,713 @@ def test_remove_and_summary():
         assert removed == 1 and len(m) == 1
         summary = m.summarise()
         assert "first entry" in summary
+
+def _scan_search(m, query, limit=3):
+    query_tokens = Counter(query.lower().split())
+    scores = [(eid, m._jaccard(query_tokens, e.tokens)) for eid, e in m._entries.items()]
+    return sorted(scores, key=lambda s: s[1], reverse=True)[:limit]
+
+def _random_texts(seed, words, count, longest):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(1, longest))) for _ in range(count)]
+
+def test_index_matches_full_scan():
+    rng = random.Random(7)
+    words = ["alpha", "beta", "gamma", "delta", "eps", "zeta", "eta"]
+    m = Memory()
+    m.add_many(_random_texts(7, words, 200, 6))
+    for eid in range(0, 200, 7):
+        m.update(eid, " ".join(rng.choice(words) for _ in range(3)))
+    for eid in range(0, 200, 11):
+        m.remove(eid)
+    m.remove_matching("^eta")
+    for query in ["alpha", "beta beta gamma", "missing", "", "eta zeta alpha"]:
+        for limit in (1, 3, 50, 500):
+            assert m.search(query, limit) == _scan_search(m, query, limit)
+
+def test_search_after_clear_pads_with_zero_scores():
+    m = Memory()
+    m.add_many(["alpha", "beta"])
+    m.clear()
+    m.add("alpha")
+    assert m.search("beta") == [(0, 0.0)]
+
+def test_find_similar_lsh_matches_exact():
+    m = Memory()
+    texts = ["the quick brown fox", "the quick brown foxes", "a lazy dog sleeps",
+             "lazy dogs sleep", "completely unrelated text", "quick brown fox jumps"]
+    m.add_many(texts)
+    for query in ["the quick brown fox", "lazy dog sleeping"]:
+        assert m.find_similar(query) == m.find_similar(query, exact=True)
+
+def test_find_similar_follows_updates():
+    m = Memory()
+    m.add_many(["the quick brown fox", "a lazy dog sleeps", "completely unrelated text"])
+    m.update(2, "the quick brown fax")
+    m.remove(0)
+    assert 2 in m.find_similar("the quick brown fox")
+    assert 0 not in m.find_similar("the quick brown fox")
+
+def test_journal_autosave_and_replay(tmp_path):
+    path = tmp_path / "mem.json"
+    m = Memory(path, journal=True)
+    a = m.add("alpha one")
+    b = m.add("beta two")
+    m.update(a, "alpha uno")
+    m.remove(b)
+    c = m.add("gamma three")
+    m.flush()
+    assert not path.exists()
+    with open(str(path) + ".wal", "ab") as f:
+        f.write(b'{"op":"add","id":9,"te')  # torn record from a crash
+    restored = Memory()
+    restored.load(path)
+    assert list(restored) == ["alpha uno", "gamma three"]
+    assert restored.get(c) == "gamma three"
+    assert restored.add("delta") == c + 1
+
+def test_journal_compaction(tmp_path):
+    path = tmp_path / "mem.json"
+    m = Memory(path, journal=True)
+    for i in range(10):
+        m.add(f"entry {i}")
+    m.remove(3)
+    m._journal.compact()
+    m.add("after compaction")
+    m.flush()
+    assert path.exists()
+    restored = Memory(path, journal=True)
+    restored.load(path)
+    assert len(restored) == 10 and "after compaction" in list(restored)
+
+def test_journal_compaction_keeps_next_id(tmp_path):
+    path = tmp_path / "mem.json"
+    m = Memory(path, journal=True)
+    for i in range(5):
+        m.add(f"entry {i}")
+    m.remove(4)
+    m.remove(3)
+    m._journal.compact()
+    m.close()
+    for journal in journal_paths(path):
+        journal.unlink(missing_ok=True)
+    restored = Memory()
+    restored.load(path)
+    assert restored.add("fresh") == 5
+
+def test_add_many_assigns_consecutive_ids():
+    m = Memory()
+    ids = m.add_many(f"entry {i}" for i in range(5))
+    assert list(ids) == [0, 1, 2, 3, 4] and m.search("entry 3")[0][0] == 3
+
+def test_load_json_saves_once(tmp_path, monkeypatch):
+    path = tmp_path / "mem.json"
+    m = Memory()
+    m.add_many(f"entry {i}" for i in range(5))
+    m.save(path)
+    assert json.loads(path.read_text())["4"] == "entry 4"
+    saves = []
+    target = Memory(tmp_path / "auto.json")
+    monkeypatch.setattr(target, "save", saves.append)
+    target.load(path)
+    assert list(target) == [f"entry {i}" for i in range(5)] and len(saves) == 1
+
+def test_load_jsonl_accepts_plain_and_object_lines(tmp_path):
+    path = tmp_path / "mem.jsonl"
+    path.write_text('"plain"\n{"id": 7, "text": "object form"}\n\n', encoding="utf-8")
+    m = Memory()
+    m.load(path)
+    assert list(m) == ["plain", "object form"]
+
+@pytest.mark.parametrize("name", ["missing.json", "missing.jsonl"])
+def test_load_missing_file_keeps_store(tmp_path, name):
+    m = Memory()
+    m.add("kept")
+    with pytest.raises(FileNotFoundError):
+        m.load(tmp_path / name)
+    assert list(m) == ["kept"]
+
+@pytest.mark.parametrize("content", ['{"0": "new", "1": ', '{"0": "new", "1": 5}'])
+def test_load_malformed_file_keeps_store(tmp_path, content):
+    path = tmp_path / "bad.json"
+    path.write_text(content, encoding="utf-8")
+    m = Memory()
+    m.add("kept")
+    with pytest.raises((ValueError, TypeError)):
+        m.load(path)
+    assert list(m) == ["kept"]
+
+def test_failed_load_is_not_journaled(tmp_path):
+    path = tmp_path / "mem.json"
+    bad = tmp_path / "bad.json"
+    bad.write_text('{"0": "new", ', encoding="utf-8")
+    m = Memory(path, journal=True)
+    m.add("kept")
+    with pytest.raises(ValueError):
+        m.load(bad)
+    m.close()
+    restored = Memory()
+    restored.load(path)
+    assert list(restored) == ["kept"]
+
+def test_sharded_memory_load_missing_file_keeps_contents(tmp_path):
+    with ShardedMemory(shards=2) as sharded:
+        sharded.add_many(["alpha", "beta"])
+        with pytest.raises(FileNotFoundError):
+            sharded.load(tmp_path / "missing.json")
+        assert list(sharded) == ["alpha", "beta"]
+
+def test_search_many_matches_search():
+    m = Memory()
+    m.add_many(["red apple pie", "green apple", "red car", "blue sky", "apple apple tree"])
+    queries = ["apple", "red", "red apple", "nothing here"]
+    assert m.search_many(queries) == [m.search(q) for q in queries]
+    m.remove(4)
+    assert m.search_many(["apple"], limit=5) == [m.search("apple", limit=5)]
+
+def test_search_many_tfidf():
+    m = Memory()
+    m.add_many(["red apple pie", "green apple", "red car", "blue sky", "apple apple tree"])
+    tfidf = m.search_many(["red", "nothing here"], limit=2, weighting="tfidf")
+    assert {eid for eid, _ in tfidf[0]} == {0, 2}
+    assert tfidf[1] == [(0, 0.0), (1, 0.0)]
+
+def test_compact_entries_match_default():
+    texts = ["Hello world hello", "goodbye world", "car automobile", "hello there"]
+    plain, compact = Memory(), Memory(compact=True)
+    plain.add_many(texts)
+    compact.add_many(texts)
+    compact.update(3, "hello again")
+    plain.update(3, "hello again")
+    assert not hasattr(compact._entries[0], "__dict__")
+    assert compact._entries[0].tokens == plain._entries[0].tokens
+    for query in ["hello", "world car", "hi"]:
+        assert compact.search(query) == plain.search(query)
+        assert compact.search_synonyms(query) == plain.search_synonyms(query)
+    assert list(compact) == list(plain)
+
+def test_compact_stores_have_their_own_vocabulary():
+    first, second = Memory(compact=True), Memory(compact=True)
+    first.add("alpha beta")
+    second.add("gamma")
+    assert first._entry_type.vocabulary is not second._entry_type.vocabulary
+    assert len(second._entry_type.vocabulary) == 1
+    assert second.search("gamma") == [(0, 1.0)]
+
+def test_token_vocabulary_assigns_unique_ids_across_threads():
+    vocabulary = TokenVocabulary()
+    barrier = threading.Barrier(4)
+
+    def intern():
+        barrier.wait()
+        for i in range(2000):
+            vocabulary.id(f"token{i}")
+
+    threads = [threading.Thread(target=intern) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(vocabulary) == 2000
+    assert [vocabulary.token(vocabulary.id(f"token{i}")) for i in range(2000)] == [
+        f"token{i}" for i in range(2000)
+    ]
+
+_LOG_WORDS = ["error", "warning", "info", "disk", "Full", "net", "down", "retry"]
+
+@pytest.mark.parametrize(
+    "pattern", ["disk full", "(?i)disk full", "err(or|and) disk", "net|down", "^info", r"\w+", "ful+"]
+)
+def test_regex_trigram_index_matches_re(pattern):
+    m = Memory()
+    m.add_many(_random_texts(5, _LOG_WORDS, 300, 4))
+    m.update(3, "ERROR disk full")
+    expected = [eid for eid in sorted(m._entries) if re.search(pattern, m.get(eid))]
+    assert m.search_regex(pattern) == expected
+
+def test_regex_stats_report_pruning():
+    m = Memory()
+    m.add_many(_random_texts(5, _LOG_WORDS, 300, 4))
+    ids, stats = m.search_regex("Full net", with_stats=True)
+    assert ids == m.search_regex("Full net")
+    assert not stats["full_scan"] and stats["candidates"] < stats["entries"]
+    assert m.search_regex(r"\d+", with_stats=True)[1]["full_scan"]
+
+def test_remove_matching_updates_trigram_index():
+    m = Memory()
+    m.add_many(_random_texts(5, _LOG_WORDS, 300, 4))
+    m.search_regex("warning")
+    before = len(m)
+    removed = m.remove_matching("warning")
+    assert len(m) == before - removed and m.search_regex("warning") == []
+
+_LETTERS = ["a", "b", "c", "d", "e", "f", "g", "h", "i", "j"]
+
+def _top_k_store():
+    rng = random.Random(11)
+    m = Memory()
+    m.add_many(_random_texts(11, _LETTERS, 500, 8))
+    for eid in range(0, 500, 9):
+        m.update(eid, " ".join(rng.choice(_LETTERS) for _ in range(rng.randint(1, 4))))
+    return m
+
+def _top_k_queries():
+    rng = random.Random(12)
+    return [" ".join(rng.choice(_LETTERS + ["zz"]) for _ in range(rng.randint(1, 5))) for _ in range(100)]
+
+def test_top_k_matches_exhaustive():
+    m = _top_k_store()
+    for query in _top_k_queries():
+        for limit in (0, 1, 3, 10, 600):
+            assert m.search(query, limit) == m.search(query, limit, exhaustive=True)
+
+def test_iter_search_matches_exhaustive():
+    m = _top_k_store()
+    for query in _top_k_queries()[:20]:
+        for limit in (0, 1, 3, 600):
+            assert list(m.iter_search(query, limit)) == m.search(query, limit, exhaustive=True)
+
+def test_iter_search_is_lazy():
+    m = _top_k_store()
+    stream = m.iter_search("a b c", limit=1000)
+    assert next(stream) == m.search("a b c", 1)[0]
+
+def test_concurrent_readers_and_writer():
+    m = Memory()
+    m.add_many(f"id{i} rev0 seed" for i in range(200))
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        try:
+            while not stop.is_set():
+                snap = m.snapshot()
+                for eid, text in snap.items():
+                    assert text.startswith(f"id{eid} "), text
+                m.search("rev1 seed", limit=5)
+                m.search_regex("rev[0-9]+ seed")
+                m.search_synonyms("hello")
+                assert len(list(m)) >= 0
+        except Exception as exc:  # pragma: no cover - reported below
+            errors.append(exc)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for t in readers:
+        t.start()
+    for r in range(1, 300):
+        m.add(f"id{199 + r} rev{r} seed")
+        m.update(r % 150, f"id{r % 150} rev{r} seed")
+        m.remove((r * 7) % 200)
+    stop.set()
+    for t in readers:
+        t.join()
+    assert not errors
+
+def test_result_cache_hits_normalised_queries():
+    m = Memory(cache_size=2)
+    m.add("hello world")
+    assert m.search("hello world") == m.search("world  HELLO")
+    assert m.cache_stats()["hits"] == 1 and m.cache_stats()["misses"] == 1
+
+def test_result_cache_returns_copies():
+    m = Memory(cache_size=2)
+    first = m.add("hello world")
+    m.search("hello world").append("junk")
+    assert m.search("hello world") == [(first, 1.0)]
+
+def test_result_cache_invalidated_by_writes():
+    m = Memory(cache_size=2)
+    m.add("hello world")
+    m.search("hello there")
+    second = m.add("hello there")
+    assert m.search("hello there")[0][0] == second
+
+def test_result_cache_evicts_past_limit():
+    m = Memory(cache_size=2)
+    m.add("hello world")
+    m.search("hello world")
+    m.find_similar("hello world")
+    m.search_synonyms("hi")
+    stats = m.cache_stats()
+    assert stats["evictions"] >= 1 and stats["size"] == 2
+    assert Memory(cache_size=0).cache_stats()["limit"] == 0
+
+def test_lru_eviction_keeps_recently_read():
+    m = Memory(max_entries=3, eviction="lru")
+    ids = [m.add(f"entry {i}") for i in range(3)]
+    m.get(ids[0])
+    m.add("entry 3")
+    assert ids[1] not in m.snapshot() and ids[0] in m.snapshot()
+    assert m.search("entry", limit=10)[0][0] != ids[1]
+
+def test_lfu_eviction_keeps_frequent_hits():
+    m = Memory(max_entries=2, eviction="lfu")
+    a = m.add("apple pie")
+    m.add("banana split")
+    m.search("apple")
+    m.search("apple")
+    c = m.add("cherry tart")
+    assert set(m.snapshot()) == {a, c}
+
+def test_evicted_entries_spill_to_cold_tier(tmp_path):
+    m = Memory(max_entries=2, eviction="oldest", cold_path=tmp_path / "cold.jsonl")
+    first = m.add("alpha beta")
+    m.get(first)
+    m.add("gamma delta")
+    m.add("epsilon zeta")
+    assert len(m) == 2 and first not in m.snapshot()
+    assert m.search("alpha") == [(1, 0.0), (2, 0.0)]
+    assert m.get(first) == "alpha beta"
+    assert m.search_cold("alpha") == [(first, 0.5)]
+    stats = m.capacity_stats()
+    assert stats["evictions"] == 1 and stats["spilled"] == 1 and stats["cold_entries"] == 1
+    m.remove(first)
+    with pytest.raises(KeyError):
+        m.get(first)
+
+def test_max_bytes_evicts_and_unindexes():
+    m = Memory(max_bytes=2000)
+    m.add_many(f"word{i} filler text" for i in range(100))
+    stats = m.capacity_stats()
+    assert 0 < stats["bytes"] <= 2000 and stats["evictions"] == 100 - len(m)
+    assert m._index.candidates(["word0"]) == set()
+
+def test_unknown_eviction_policy():
+    with pytest.raises(ValueError):
+        Memory(max_entries=1, eviction="random")
+
+@pytest.fixture
+def sharded_pair():
+    texts = _random_texts(3, ["a", "b", "c", "d", "e", "f", "g", "h"], 200, 6)
+    single = Memory()
+    single.add_many(texts)
+    with ShardedMemory(shards=3) as sharded:
+        assert sharded.add_many(texts[:150]) == range(150)
+        assert [sharded.add(t) for t in texts[150:]] == list(range(150, 200))
+        for eid in range(0, 200, 9):
+            single.update(eid, "x " + texts[eid])
+            sharded.update(eid, "x " + texts[eid])
+        single.remove(4)
+        sharded.remove(4)
+        yield single, sharded
+
+def test_sharded_memory_search_matches_single_store(sharded_pair):
+    single, sharded = sharded_pair
+    for query in ("a b", "x", "c c d", "zz"):
+        for limit in (0, 1, 3, 250):
+            assert sharded.search(query, limit) == single.search(query, limit)
+    assert sharded.search_many(["a", "x b"], 4) == single.search_many(["a", "x b"], 4)
+
+def test_sharded_memory_regex_and_similar_match_single_store(sharded_pair):
+    single, sharded = sharded_pair
+    assert sharded.search_regex("^x [ab]") == single.search_regex("^x [ab]")
+    text = single.get(7)
+    assert sharded.find_similar(text) == sorted(single.find_similar(text))
+
+def test_sharded_memory_contents_match_single_store(sharded_pair):
+    single, sharded = sharded_pair
+    assert list(sharded) == list(single) and len(sharded) == len(single)
+    with pytest.raises(KeyError):
+        sharded.get(4)
+    assert sharded.remove_matching("^x") == single.remove_matching("^x")
+    assert dict(sharded.snapshot()) == dict(single.snapshot())
+
+def _semantic_store():
+    m = Memory()
+    m.add("the runner was running fast")
+    m.add("cooking pasta for dinner")
+    m.add_many(f"note {i} about topic{i}" for i in range(50))
+    return m
+
+def test_semantic_search_finds_related_words():
+    m = _semantic_store()
+    assert m.search_semantic("runners run", limit=1)[0][0] == 0
+    assert m.search("runners run", limit=1)[0][1] == 0.0  # no lexical overlap
+
+def test_semantic_search_follows_updates():
+    m = _semantic_store()
+    m.remove(0)
+    assert 0 not in [eid for eid, _ in m.search_semantic("runners run", limit=5)]
+    m.update(1, "a runner running")
+    assert m.search_semantic("runners run", limit=1)[0][0] == 1
+
+def test_semantic_index_reconciled_on_load(tmp_path):
+    m = _semantic_store()
+    path = tmp_path / "memory.hnsw"
+    m.save_semantic_index(path)
+    assert len(HNSWIndex.load(path)) == 52
+    restored = _semantic_store()
+    restored.remove(1)
+    late = restored.add("dinner pasta cooking")
+    restored.load_semantic_index(path)
+    assert 1 not in [eid for eid, _ in restored.search_semantic("cooking pasta", limit=3)]
+    assert late in [eid for eid, _ in restored.search_semantic("dinner pasta", limit=3)]
+    assert restored.search_semantic("topic7 note", limit=3) == m.search_semantic("topic7 note", limit=3)
+
+def test_semantic_search_with_custom_embedder():
+    m = Memory(embedder=lambda text: [float(len(text)), 1.0])
+    m.add("aa")
+    assert m.search_semantic("bb", limit=1) == [(0, pytest.approx(1.0))]
+
+_SQL_WORDS = ["alpha", "beta", "gamma,", "delta", "Eps", "zeta"]
+
+@pytest.fixture
+def sqlite_pair(tmp_path):
+    texts = _random_texts(11, _SQL_WORDS, 200, 6)
+    plain = Memory(backend="memory")
+    stored = Memory(backend="sqlite", db_path=tmp_path / "memory.db")
+    for m in (plain, stored):
+        m.add_many(texts)
+        m.update(5, "gamma, gamma, alpha")
+        m.remove(9)
+    return plain, stored
+
+def test_sqlite_backend_search_matches_memory(sqlite_pair):
+    plain, stored = sqlite_pair
+    for query in ("alpha", "gamma, beta", "gamma", "eps eps", "nothing"):
+        for limit in (1, 3, 250):
+            assert stored.search(query, limit) == plain.search(query, limit)
+            assert stored.search(query, limit, exhaustive=True) == plain.search(query, limit)
+    assert stored.search_many(["alpha beta"], 5, weighting="tfidf") == plain.search_many(
+        ["alpha beta"], 5, weighting="tfidf"
+    )
+
+def test_sqlite_backend_regex_matches_memory(sqlite_pair):
+    plain, stored = sqlite_pair
+    for pattern in ("gamma, gam", "(?i)EPS", r"^\w+$"):
+        assert stored.search_regex(pattern) == plain.search_regex(pattern)
+
+def test_sqlite_backend_reopens(tmp_path, sqlite_pair):
+    plain, _ = sqlite_pair
+    reopened = Memory(backend="sqlite", db_path=tmp_path / "memory.db")
+    assert dict(reopened.snapshot()) == dict(plain.snapshot())
+    assert reopened.add("new entry") == 200
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        Memory(backend="redis")
+
+@pytest.fixture
+def mmap_pair(tmp_path):
+    plain = Memory()
+    plain.add_many(_random_texts(5, ["red", "green", "blue", "Blue", "grün", "cyan"], 120, 5))
+    plain.remove(7)
+    path = tmp_path / "memory.mmap"
+    plain.save(path)
+    mapped = Memory()
+    mapped.load(path)
+    return plain, mapped, path
+
+def test_mmap_snapshot_round_trip(mmap_pair):
+    plain, mapped, _ = mmap_pair
+    assert dict(mapped.snapshot()) == dict(plain.snapshot())
+    for query in ("blue", "grün red", "cyan cyan", "nothing"):
+        assert mapped.search(query, 5) == plain.search(query, 5)
+
+def test_mmap_snapshot_accepts_writes(mmap_pair):
+    plain, mapped, _ = mmap_pair
+    for m in (plain, mapped):
+        m.update(3, "blue blue cyan")
+        m.remove(11)
+        m.add("grün red")
+    assert list(mapped) == list(plain)
+    for query in ("blue", "grün red", "cyan cyan"):
+        assert mapped.search(query, 5, exhaustive=True) == plain.search(query, 5)
+    assert mapped.search_many(["red blue"], 4, weighting="tfidf") == plain.search_many(
+        ["red blue"], 4, weighting="tfidf"
+    )
+    assert mapped.search_regex("(?i)blue c") == plain.search_regex("(?i)blue c")
+
+def test_mmap_snapshot_overwritten_while_mapped(mmap_pair):
+    plain, mapped, path = mmap_pair
+    mapped.save(path)
+    reopened = Memory(backend="sqlite")
+    reopened.load(path)
+    assert dict(reopened.snapshot()) == dict(plain.snapshot())
+    assert reopened.add("new") == plain.add("new")
+    mapped.clear()
+    assert len(mapped) == 0 and mapped.search("blue", 1) == []
+
+def test_mmap_snapshot_loaded_into_used_store(tmp_path):
+    path = tmp_path / "memory.mmap"
+    source = Memory()
+    source.add("the quick brown fox")
+    source.save(path)
+    m = Memory()
+    m.add_many(["unrelated words", "other text"])
+    m.find_similar("unrelated words")
+    m.search_regex("other text")
+    m.search_semantic("unrelated", limit=1)
+    m.load(path)
+    assert m.find_similar("the quick brown fox") == [0]
+    assert m.search_regex("quick brown") == [0]
+    assert m.search_semantic("quick brown fox", limit=1)[0][0] == 0
+
+@pytest.fixture
+def namespaced(tmp_path):
+    m = Memory(namespace_dir=tmp_path, namespace_quota=3, eviction="oldest")
+    m.add("shared hello")
+    for i in range(5):
+        m.add(f"alice hello {i}", namespace="alice")
+    assert m.add_many(["bob hello", "bob bye"], namespace="bob") == range(0, 2)
+    return m
+
+def test_namespaces_partition_and_quota(namespaced):
+    m = namespaced
+    assert m.search("hello", 5) == [(0, 0.5)]
+    assert [eid for eid, _ in m.search("hello", 5, namespace="alice")] == [2, 3, 4]
+    assert m.get(1, namespace="bob") == "bob bye"
+    m.update(1, "bob hello again", namespace="bob")
+    assert m.search_regex("again", namespace="bob") == [1]
+
+def test_unloaded_namespace_reloads_on_demand(namespaced):
+    m = namespaced
+    m.unload_namespace("alice")
+    assert m.namespaces() == ["alice", "bob"]
+    assert "alice" not in m._namespaces
+    assert m.search("alice hello 4", 1, namespace="alice") == [(4, 1.0)]
+
+def test_namespaces_persist_and_drop(tmp_path, namespaced):
+    namespaced.close()
+    reopened = Memory(namespace_dir=tmp_path)
+    assert dict(reopened.namespace("bob").snapshot()) == {0: "bob hello", 1: "bob bye"}
+    reopened.drop_namespace("bob")
+    assert reopened.namespaces() == ["alice"]
+
+def test_namespace_names_cannot_escape(tmp_path):
+    m = Memory(namespace_dir=tmp_path)
+    with pytest.raises(ValueError):
+        m.add("x", namespace="../escape")
+
+@pytest.mark.parametrize("eviction", [LRUPolicy(), LRUPolicy, "lru"])
+def test_namespaces_get_their_own_policy(eviction):
+    m = Memory(namespace_quota=3, eviction=eviction)
+    for i in range(30):
+        m.add(f"note {i}", namespace=f"ns{i % 3}")
+    assert [len(m.namespace(f"ns{i}")) for i in range(3)] == [3, 3, 3]
+    assert m.namespace("ns0")._policy is not m.namespace("ns1")._policy
+
+def test_iter_search_releases_lock_between_results():
+    m = Memory()
+    m.add_many(["x a", "x b", "x c", "y"])
+    stream = m.iter_search("x", 3)
+    first = next(stream)
+    m.add("x")
+    m.remove(1)
+    rest = list(stream)
+    assert first == (0, 0.5)
+    assert rest == [(4, 1.0), (2, 0.5)]
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_failed_update_leaves_entry_indexed(backend):
+    m = Memory(backend=backend)
+    m.add("hello world")
+    with pytest.raises(AttributeError):
+        m.update(0, None)
+    assert m.get(0) == "hello world"
+    assert m.search("hello world", 1) == [(0, 1.0)]
+
+def test_sqlite_write_rolls_back_on_error(tmp_path, monkeypatch):
+    db = tmp_path / "memory.db"
+    m = Memory(backend="sqlite", db_path=db)
+    m.add("kept")
+
+    def fail(**kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(m, "_evict", fail)
+    with pytest.raises(RuntimeError):
+        m.add("lost")
+    assert dict(Memory(backend="sqlite", db_path=db).snapshot()) == {0: "kept"}
+
+def test_lazy_indexes_are_built_once_under_concurrent_readers(monkeypatch):
+    m = Memory()
+    m.add_many(f"entry number {i}" for i in range(300))
+    built = []
+    real = memory_.TrigramIndex
+
+    class CountingTrigramIndex(real):
+        def __init__(self):
+            built.append(1)
+            super().__init__()
+
+    monkeypatch.setattr(memory_, "TrigramIndex", CountingTrigramIndex)
+    barrier = threading.Barrier(6)
+    results = []
+
+    def reader():
+        barrier.wait()
+        results.append(m.search_regex("number 1", with_stats=True))
+
+    threads = [threading.Thread(target=reader) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(built) == 1
+    assert all(r == results[0] for r in results) and results[0][1]["pattern"] == "number 1"
+
+def test_cold_tier_belongs_to_its_store(tmp_path):
+    cold = tmp_path / "cold.jsonl"
+    db = tmp_path / "memory.db"
+    m = Memory(backend="sqlite", db_path=db, max_entries=1, cold_path=cold)
+    m.add_many(["alpha", "beta", "gamma"])
+    m.update(1, "beta two")  # spills 2, the largest id
+    m.flush()
+    reopened = Memory(backend="sqlite", db_path=db, max_entries=1, cold_path=cold)
+    assert [reopened.get(i) for i in range(3)] == ["alpha", "beta two", "gamma"]
+    assert reopened.add("delta") == 3
+
+    fresh = Memory(max_entries=1, cold_path=cold)
+    assert fresh.capacity_stats()["cold_entries"] == 0
+    assert fresh.add("epsilon") == 0
+    with pytest.raises(KeyError):
+        fresh.get(1)
+
+def test_cold_tier_truncates_torn_line(tmp_path):
+    path = tmp_path / "cold.jsonl"
+    tier = ColdTier(path)
+    tier.append(0, "alpha")
+    with open(path, "ab") as f:
+        f.write(b'{"id": 1, "te')
+    tier = ColdTier(path)
+    assert list(tier.items()) == [(0, "alpha")] and tier.next_id == 1
+    tier.append(2, "gamma")
+    assert list(ColdTier(path).items()) == [(0, "alpha"), (2, "gamma")]
+
+def test_cold_tier_removal_survives_reopen(tmp_path):
+    cold = tmp_path / "cold.jsonl"
+    db = tmp_path / "memory.db"
+    m = Memory(backend="sqlite", db_path=db, max_entries=1, eviction="oldest", cold_path=cold)
+    m.add_many(["alpha", "beta", "gamma"])
+    m.remove(0)
+    m.flush()
+    reopened = Memory(backend="sqlite", db_path=db, max_entries=1, eviction="oldest", cold_path=cold)
+    with pytest.raises(KeyError):
+        reopened.get(0)
+    assert reopened.get(1) == "beta"
+    assert reopened.search_cold("alpha") == []
+
+def test_cold_tier_reset_for_in_memory_database(tmp_path):
+    cold = tmp_path / "cold.jsonl"
+    m = Memory(max_entries=1, cold_path=cold)
+    m.add_many(["alpha", "beta", "gamma"])
+    fresh = Memory(backend="sqlite", max_entries=1, cold_path=cold)
+    assert fresh.capacity_stats()["cold_entries"] == 0
+
+def test_sharded_memory_concurrent_adds_get_unique_ids():
+    with ShardedMemory(shards=2) as sharded:
+        ids = []
+
+        def writer(n):
+            ids.extend(sharded.add(f"writer{n} note{i}") for i in range(25))
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sorted(ids) == list(range(100))
+        assert all(sharded.get(eid).startswith("writer") for eid in ids)
+        snapshot = dict(sharded.snapshot())
+        assert len(set(snapshot.values())) == 100
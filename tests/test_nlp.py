@@ -6,6 +6,7 @@ from nlp.sarcasm_detector import detect_sarcasm
 from nlp.sentence_analyzer import classify_sentence
 from nlp.translation_module import translate
 from nlp.response_generator import generate_response
+from nlp.thought_vectorizer import hash_vectorize
 
 
 def test_intent():
@@ -42,3 +43,11 @@ def test_translation():
 
 def test_response_generation():
     assert generate_response("hi") == "Hello!"
+
+
+def test_hash_vectorize():
+    vector = hash_vectorize("Running fast", dim=64)
+    assert len(vector) == 64
+    assert abs(sum(v * v for v in vector) - 1.0) < 1e-9
+    assert hash_vectorize("running FAST", dim=64) == vector
+    assert hash_vectorize("", dim=8) == [0.0] * 8
@@ -1,5 +1,16 @@
+from data.log_collector import LogCollector
+from modules import productivity_booster as tasks
 from utils.encryption import encrypt, decrypt
+from utils.json_handler import (
+    CODECS, atomic_write, get_codec, iter_json_items, iter_jsonl, load_json, save_json,
+    write_json_array, write_json_object, write_jsonl,
+)
 from utils.time_tools import now_ms
+import json
+import os
+import pytest
+import threading
+import tracemalloc
 
 
 def test_encrypt_decrypt():
@@ -10,3 +21,119 @@ def test_encrypt_decrypt():
 def test_now_ms():
     assert isinstance(now_ms(), int)
 
+
+@pytest.mark.parametrize("name", CODECS)
+def test_json_codecs_round_trip(tmp_path, name):
+    path = tmp_path / "doc.json"
+    save_json(path, {"a": [1, "ü"]}, codec=name)
+    assert load_json(path) == {"a": [1, "ü"]}
+    assert dict(iter_json_items(path)) == {"a": [1, "ü"]}
+
+
+def test_json_codec_lookup():
+    assert get_codec("auto").name in CODECS
+    with pytest.raises(ValueError):
+        get_codec("pickle")
+
+
+def test_write_json_array_streams(tmp_path):
+    path = tmp_path / "doc.json"
+    write_json_array(path, (i * i for i in range(5000)))
+    assert json.loads(path.read_text()) == [i * i for i in range(5000)]
+    write_json_array(path, [])
+    assert load_json(path) == []
+    assert [p.name for p in tmp_path.iterdir()] == ["doc.json"]
+
+
+def test_write_json_object_streams(tmp_path):
+    path = tmp_path / "doc.json"
+    write_json_object(path, ((i, str(i)) for i in range(3)))
+    assert list(iter_json_items(path)) == [("0", "0"), ("1", "1"), ("2", "2")]
+
+
+def test_iter_json_items_streams_large_object(tmp_path):
+    path = tmp_path / "doc.json"
+    write_json_object(path, ((i, f"entry number {i}") for i in range(50_000)))
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in iter_json_items(path, chunk_size=4096))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert count == 50_000
+    assert peak < path.stat().st_size // 10
+
+
+@pytest.mark.parametrize("name", ["records.jsonl", "records.jsonl.gz"])
+def test_jsonl_append_and_resume(tmp_path, name):
+    path = tmp_path / name
+    assert write_jsonl(path, ({"n": i} for i in range(2500)), batch=100) == 2500
+    write_jsonl(path, [{"n": -1}], append=True)
+    seen = list(iter_jsonl(path, with_offsets=True))
+    assert [v["n"] for _, v in seen[-2:]] == [2499, -1]
+    assert next(iter_jsonl(path, seen[9][0])) == {"n": 10}
+
+
+def test_jsonl_stops_at_torn_line(tmp_path):
+    path = tmp_path / "torn.jsonl"
+    path.write_text('{"n": 1}\n\n{"n": 2')
+    assert list(iter_jsonl(path)) == [{"n": 1}]
+
+
+def test_log_collector_batches_to_jsonl(tmp_path):
+    logs = LogCollector(tmp_path / "log.jsonl.gz", batch=2)
+    for entry in ("a", "b", "c"):
+        logs.add(entry)
+    assert logs.logs == ["c"]
+    first = list(logs.read())
+    logs.flush()
+    assert [e for _, e in logs.read(first[-1][0])] == ["c"]
+
+
+@pytest.mark.parametrize("name", ["tasks.json", "tasks.jsonl.gz"])
+def test_task_export_round_trip(tmp_path, name):
+    tasks.reset()
+    tasks.add_task("write", priority=2, due="2025-07-01", tags=["dev"])
+    tasks.export_tasks(str(tmp_path / name))
+    tasks.reset()
+    tasks.import_tasks(str(tmp_path / name))
+    assert [t.title for t in tasks.list_tasks()] == ["write"]
+    tasks.reset()
+
+
+def test_atomic_write_concurrent_writers(tmp_path):
+    path = tmp_path / "doc.bin"
+    blobs = [bytes([i]) * 200_000 for i in range(8)]
+    threads = [
+        threading.Thread(target=atomic_write, args=(path, [blob[:100_000], blob[100_000:]]))
+        for blob in blobs
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert path.read_bytes() in blobs
+    assert [p.name for p in tmp_path.iterdir()] == ["doc.bin"]
+
+
+def test_atomic_write_cleans_up_on_failure(tmp_path):
+    path = tmp_path / "doc.bin"
+    path.write_bytes(b"old")
+
+    def chunks():
+        yield b"new"
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        atomic_write(path, chunks())
+    assert path.read_bytes() == b"old"
+    assert [p.name for p in tmp_path.iterdir()] == ["doc.bin"]
+
+
+def test_atomic_write_applies_umask(tmp_path):
+    old = os.umask(0o027)
+    try:
+        atomic_write(tmp_path / "doc.bin", [b"data"])
+    finally:
+        os.umask(old)
+    assert (tmp_path / "doc.bin").stat().st_mode & 0o777 == 0o640
@@ -1,19 +1,390 @@
-"""Simple JSON read/write helpers."""
+"""JSON read/write helpers with pluggable codecs and incremental I/O.
+
+Documents are encoded by a :class:`Codec` from :data:`CODECS`: compact
+stdlib ``json`` is always available, ``orjson`` and ``msgpack`` are
+registered when installed.  The ``AIV1_JSON_CODEC`` setting (see
+:data:`config.settings.settings`) picks the codec used by :func:`save_json`
+for every caller; ``"auto"`` prefers orjson.  :func:`load_json` recognises
+JSON and MessagePack files by their first byte, so files stay readable when
+the setting changes.
+
+Every write goes to a temporary file that is fsynced and renamed over the
+target, so readers see either the old or the new document.  Large arrays and
+objects are streamed element by element with :func:`write_json_array` and
+:func:`write_json_object`, and read back with :func:`iter_json_items`.
+Record streams use JSON Lines through :func:`write_jsonl` and
+:func:`iter_jsonl`, optionally gzip compressed, with byte offsets that let a
+reader resume where it stopped.
+
+Example
+-------
+>>> save_json("prefs.json", {"theme": "dark"})
+>>> load_json("prefs.json")
+{'theme': 'dark'}
+"""
 
 from __future__ import annotations
 
+import gzip
 import json
+import logging
+import os
+import secrets
+import zlib
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, Tuple
+
+from config.settings import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None  # type: ignore
+
+# Bytes buffered by the streaming writers between writes.
+_BUFFER = 1 << 16
+
+# Records joined into one write by :func:`write_jsonl`.
+_BATCH = 1000
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+# First bytes a JSON document can start with (after whitespace).
+_JSON_START = frozenset(b'{["-0123456789tfn')
+
+
+@dataclass(frozen=True)
+class Codec:
+    """A named document encoding.
+
+    ``json`` marks codecs producing JSON text, which the streaming helpers
+    and :func:`iter_json_items` can work with.
+    """
+
+    name: str
+    dumps: Callable[[Any], bytes]
+    loads: Callable[[bytes], Any]
+    json: bool = True
+
+
+CODECS: Dict[str, Codec] = {}
+"""Registered codecs by name."""
+
+
+def register_codec(codec: Codec) -> None:
+    """Make *codec* selectable by name, replacing one of the same name."""
+    CODECS[codec.name] = codec
+
+
+register_codec(Codec(
+    "json",
+    lambda data: json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+    json.loads,
+))
+if orjson is not None:
+    register_codec(Codec(
+        "orjson", lambda data: orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS), orjson.loads
+    ))
+if msgpack is not None:
+    register_codec(Codec(
+        "msgpack",
+        lambda data: msgpack.packb(data, use_bin_type=True),
+        lambda raw: msgpack.unpackb(raw, raw=False, strict_map_key=False),
+        json=False,
+    ))
+
+
+def get_codec(name: str | None = None) -> Codec:
+    """Return the codec called *name*, by default the configured one.
+
+    ``"auto"`` picks orjson when installed.  A known codec whose package is
+    missing falls back to stdlib ``json`` with a warning.
+    """
+    name = name or settings.json_codec
+    if name == "auto":
+        name = "orjson" if "orjson" in CODECS else "json"
+    codec = CODECS.get(name)
+    if codec is None:
+        if name not in ("orjson", "msgpack"):
+            raise ValueError(f"unknown codec {name!r}, expected one of {sorted(CODECS)}")
+        logging.warning("Codec %r is not installed, using compact json", name)
+        codec = CODECS["json"]
+    return codec
+
+
+def _json_codec(codec: Codec | None) -> Codec:
+    """Return *codec* if it writes JSON, else the fastest JSON codec."""
+    codec = codec or get_codec()
+    if codec.json:
+        return codec
+    return CODECS.get("orjson") or CODECS["json"]
+
+
+def _is_json(head: bytes) -> bool:
+    head = head.lstrip()
+    return not head or head[0] in _JSON_START
+
+
+def _create_temp(path: Path) -> Tuple[int, Path]:
+    """Exclusively create a uniquely named temporary file next to *path*.
+
+    Unlike :func:`tempfile.mkstemp` the file is created with mode ``0o666``
+    and the kernel applies the process umask, so it ends up with the
+    permissions a plain ``open()`` would give it.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        tmp = path.with_name(f".{path.name}.{secrets.token_hex(8)}.tmp")
+        try:
+            return os.open(tmp, flags, 0o666), tmp
+        except FileExistsError:
+            continue
 
 
-def load_json(path: str | Path) -> Any:
-    """Load JSON data from a file."""
+def atomic_write(path: str | Path, chunks: Iterable[bytes]) -> None:
+    """Write *chunks* to a temporary file, fsync it and rename it to *path*.
+
+    Each call gets its own temporary file next to *path*, so concurrent
+    writers to the same target never share one; the last rename wins and
+    readers only ever see a complete file.
+    """
+    path = Path(path)
+    fd, tmp = _create_temp(path)
+    try:
+        with open(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_json(path: str | Path, codec: str | None = None) -> Any:
+    """Load a document written by :func:`save_json`.
+
+    Without *codec* the format is detected from the file itself.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    if codec is not None:
+        return get_codec(codec).loads(raw)
+    if _is_json(raw[:64]):
+        return _json_codec(None).loads(raw)
+    return get_codec("msgpack").loads(raw)
+
+
+def save_json(path: str | Path, data: Any, codec: str | None = None) -> None:
+    """Atomically write *data* to *path* with *codec* (default: the setting)."""
+    atomic_write(path, (get_codec(codec).dumps(data),))
+
+
+def _stream(open_: bytes, close: bytes, pieces: Iterable[bytes]) -> Iterator[bytes]:
+    """Join *pieces* with commas between *open_* and *close* in large chunks."""
+    buf = bytearray(open_)
+    first = True
+    for piece in pieces:
+        if not first:
+            buf += b","
+        first = False
+        buf += piece
+        if len(buf) >= _BUFFER:
+            yield bytes(buf)
+            buf.clear()
+    buf += close
+    yield bytes(buf)
+
+
+def write_json_array(path: str | Path, values: Iterable[Any], codec: str | None = None) -> None:
+    """Atomically stream *values* to *path* as one JSON array.
+
+    Only one element is encoded at a time.  Non-JSON codecs fall back to the
+    fastest JSON one, since the array length is not known up front.
+    """
+    dumps = _json_codec(get_codec(codec)).dumps
+    atomic_write(path, _stream(b"[", b"]", map(dumps, values)))
+
+
+def write_json_object(
+    path: str | Path, items: Iterable[Tuple[Any, Any]], codec: str | None = None
+) -> None:
+    """Atomically stream ``(key, value)`` *items* to *path* as one JSON object."""
+    dumps = _json_codec(get_codec(codec)).dumps
+    atomic_write(
+        path,
+        _stream(b"{", b"}", (dumps(str(key)) + b":" + dumps(value) for key, value in items)),
+    )
+
+
+def iter_json_items(path: str | Path, chunk_size: int = 1 << 16) -> Iterator[Tuple[Any, Any]]:
+    """Incrementally yield the members of a top-level JSON object or array.
+
+    Objects produce ``(key, value)`` pairs and arrays ``(index, value)``
+    pairs.  The file is read in *chunk_size* pieces so only one member needs
+    to be held in memory at a time.  Binary documents, such as MessagePack
+    written through :func:`save_json`, are decoded whole instead.
+    """
+    with open(path, "rb") as f:
+        binary = not _is_json(f.read(64))
+    if binary:
+        data = load_json(path)
+        yield from (data.items() if isinstance(data, dict) else enumerate(data))
+        return
+    decoder = json.JSONDecoder()
     with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+        buf = ""
+        pos = 0
+        eof = False
+
+        def skip() -> str:
+            """Skip whitespace and return the next character ('' at EOF)."""
+            nonlocal buf, pos, eof
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buf) or eof:
+                    return buf[pos] if pos < len(buf) else ""
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+
+        def decode(delimiters: str = " \t\r\n,]}") -> Any:
+            """Decode one value, reading more input while it is incomplete."""
+            nonlocal buf, pos, eof
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                else:
+                    # A number cut by the buffer edge still decodes, so only
+                    # trust a value once the delimiter after it is buffered.
+                    if eof or (end < len(buf) and buf[end] in delimiters):
+                        pos = end
+                        return value
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+
+        def expect(chars: str) -> str:
+            nonlocal pos
+            char = skip()
+            if not char or char not in chars:
+                raise ValueError(f"expected one of {chars!r} in {path}, got {char!r}")
+            pos += 1
+            return char
+
+        opening = expect("{[")
+        closing = "}" if opening == "{" else "]"
+        index = 0
+        if skip() == closing:
+            return
+        while True:
+            skip()
+            if opening == "{":
+                key = decode(" \t\r\n:")
+                expect(":")
+                skip()
+            else:
+                key = index
+            yield key, decode()
+            index += 1
+            if expect("," + closing) == closing:
+                return
+
+
+def _gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compress *chunks* into a single gzip member on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _line_batches(records: Iterable[Any], batch: int, counter: list) -> Iterator[bytes]:
+    dumps = _json_codec(None).dumps
+    lines = []
+    for record in records:
+        lines.append(dumps(record))
+        if len(lines) >= batch:
+            counter[0] += len(lines)
+            yield b"\n".join(lines) + b"\n"
+            lines.clear()
+    if lines:
+        counter[0] += len(lines)
+        yield b"\n".join(lines) + b"\n"
+
+
+def write_jsonl(
+    path: str | Path,
+    records: Iterable[Any],
+    *,
+    append: bool = False,
+    compress: bool | None = None,
+    batch: int = _BATCH,
+) -> int:
+    """Stream *records* to *path*, one JSON value per line; return the count.
+
+    *records* is consumed lazily and written *batch* lines at a time.  A new
+    file is written atomically; ``append=True`` adds to the existing file
+    instead (for gzip as a further member, which readers handle
+    transparently).  *compress* defaults to gzip for a ``.gz`` suffix.
+    """
+    path = Path(path)
+    if compress is None:
+        compress = path.suffix == ".gz"
+    counter = [0]
+    chunks = _line_batches(records, batch, counter)
+    if compress:
+        chunks = _gzip_stream(chunks)
+    if append:
+        with open(path, "ab") as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    else:
+        atomic_write(path, chunks)
+    return counter[0]
+
+
+def _open_lines(path: Path) -> BinaryIO:
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    return gzip.open(path, "rb") if magic == _GZIP_MAGIC else open(path, "rb")
+
 
+def iter_jsonl(path: str | Path, offset: int = 0, *, with_offsets: bool = False) -> Iterator[Any]:
+    """Lazily yield the JSON value on each non-blank line of *path*.
 
-def save_json(path: str | Path, data: Any) -> None:
-    """Write JSON data to a file."""
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    Reading starts at byte *offset*.  With ``with_offsets=True`` items are
+    ``(next_offset, value)`` pairs; passing a ``next_offset`` back as
+    *offset* resumes right after that value.  A trailing line without its
+    newline, as left by a writer still appending, is not yielded.  Gzip
+    files are detected automatically and their offsets count uncompressed
+    bytes, so resuming one decompresses up to the offset again.
+    """
+    path = Path(path)
+    if not path.exists() or path.stat().st_size == 0:
+        return
+    loads = _json_codec(None).loads
+    with _open_lines(path) as f:
+        if offset:
+            f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            offset += len(line)
+            if line.strip():
+                value = loads(line)
+                yield (offset, value) if with_offsets else value